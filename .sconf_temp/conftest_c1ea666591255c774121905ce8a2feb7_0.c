@@ -0,0 +1,8 @@
+
+
+#include "fftw3.h"
+
+int main(void) {
+  
+return 0;
+}
@@ -12,6 +12,42 @@ import sys
 from setuptools import setup, find_packages
 
 
+class BuildCLibraries(distutils.cmd.Command):
+    """
+    Compile the C libraries (Linux / OS-X). Windows uses the pre-compiled DLLs
+    in storm_control/c_libraries.
+    """
+    description = "build the C libraries"
+    user_options = []
+
+    def initialize_options(self):
+        pass
+
+    def finalize_options(self):
+        pass
+
+    def run(self):
+        if (platform.system() == "Windows"):
+            return
+        
+        import storm_control.c_libraries.loadclib as loadclib
+        for library_name in sorted(loadclib.c_libraries):
+            try:
+                loadclib.buildCLibrary(library_name)
+            except OSError as exception:
+                print("Warning!", exception)
+
+
+class BuildPy(setuptools.command.build_py.build_py):
+    """
+    Build the C libraries before copying the Python files so that they
+    are included in the package.
+    """
+    def run(self):
+        self.run_command("build_c")
+        super().run()
+
+        
 version = "2.0"
 description = "STORM microscope control code."
 long_description = ""
@@ -28,7 +64,10 @@ setup(
     zip_safe=False,
     packages=find_packages(),
 
-    package_data={},
+    cmdclass={"build_c" : BuildCLibraries,
+              "build_py" : BuildPy},
+
+    package_data={"storm_control.c_libraries" : ["*.dll", "*.dylib", "*.so"]},
     exclude_package_data={},
     include_package_data=True,
 
@@ -2,16 +2,121 @@
 """
 Handle loading C libraries.
 
+On Windows we use the pre-compiled DLLs. On other platforms the libraries
+are compiled from source, either by 'python setup.py build_c' or on demand
+the first time that they are loaded (or if the source has changed).
+
 Hazen 03/18
 """
 
 import ctypes
+import subprocess
 import sys
 import os
 import re
+import tempfile
 
 import storm_control
 
+
+#
+# The C libraries, their sources (relative to the storm_control directory),
+# the libraries that they need to link against and whether or not they
+# should be compiled with OpenMP.
+#
+c_libraries = {"af_lock" : {"sources" : ["sc_hardware/utility/af_lock.c"],
+                            "libs" : ["fftw3", "m"],
+                            "openmp" : False},
+               "c_image_manipulation" : {"sources" : ["hal4000/halLib/c_image_manipulation.c"],
+                                         "libs" : [],
+                                         "openmp" : True},
+               "corr_2d_gauss" : {"sources" : ["sc_hardware/utility/corr_2d_gauss.c"],
+                                  "libs" : ["m"],
+                                  "openmp" : False},
+               "focus_quality" : {"sources" : ["hal4000/focusLock/focus_quality.c"],
+                                  "libs" : [],
+                                  "openmp" : False},
+               "LMMoment" : {"sources" : ["hal4000/spotCounter/LMMoment.c"],
+                             "libs" : ["m"],
+                             "openmp" : False}}
+
+
+def buildCLibrary(library_name, verbose = True):
+    """
+    Compile a C library (Linux / OS-X only). The compiler can be specified
+    with the CC environment variable, the default is 'cc'.
+
+    Raises OSError if the library could not be built.
+    """
+    if not library_name in c_libraries:
+        raise OSError("No sources for C library '" + library_name + "'")
+
+    lib_info = c_libraries[library_name]
+    sc_path = os.path.dirname(os.path.abspath(storm_control.__file__))
+    sources = list(map(lambda x: os.path.join(sc_path, x), lib_info["sources"]))
+
+    cmd = [os.environ.get("CC", "cc"), "-O3", "-Wall", "-fPIC", "-shared"]
+    if lib_info["openmp"] and (sys.platform != "darwin"):
+        cmd.append("-fopenmp")
+
+    # Build to a temporary file first so that other processes that are trying
+    # to load the library at the same time never see a partial library.
+    lib_path = cLibraryPath(library_name)
+    [fd, tmp_path] = tempfile.mkstemp(dir = os.path.dirname(lib_path), suffix = ".tmp")
+    os.close(fd)
+    
+    cmd += ["-o", tmp_path] + sources + list(map(lambda x: "-l" + x, lib_info["libs"]))
+    if verbose:
+        print("Building", library_name, ":", " ".join(cmd))
+        
+    try:
+        result = subprocess.run(cmd, stdout = subprocess.PIPE, stderr = subprocess.STDOUT)
+        if (result.returncode != 0):
+            raise OSError("Building C library '" + library_name + "' failed:\n" + result.stdout.decode(errors = "replace"))
+        os.replace(tmp_path, lib_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    
+def cLibraryPath(library_name):
+    """
+    Return the full path to the platform specific version of a C library.
+    """
+    #
+    # c_lib_path is something like:
+    #    /usr/lib/python3.5/site-packages/storm_control
+    #
+    c_lib_path = os.path.dirname(os.path.abspath(storm_control.__file__))
+
+    # All the C libraries are in the c_libraries directory.
+    c_lib_path = os.path.join(c_lib_path, "c_libraries")
+    
+    if (sys.platform == "win32"):
+        return os.path.join(c_lib_path, library_name + ".dll")
+    elif (sys.platform == "darwin"):
+        return os.path.join(c_lib_path, "lib" + library_name + ".dylib")
+    else:
+        return os.path.join(c_lib_path, "lib" + library_name + ".so")
+
+
+def needsBuild(library_name):
+    """
+    Returns True if the library does not exist or is older than its sources.
+    """
+    lib_path = cLibraryPath(library_name)
+    if not os.path.exists(lib_path):
+        return True
+
+    sc_path = os.path.dirname(os.path.abspath(storm_control.__file__))
+    lib_time = os.path.getmtime(lib_path)
+    for source in c_libraries[library_name]["sources"]:
+        source = os.path.join(sc_path, source)
+        if os.path.exists(source) and (os.path.getmtime(source) > lib_time):
+            return True
+    return False
+
+    
 def loadCLibrary(library_filename):
 
     #
@@ -48,17 +153,20 @@ def loadCLibrary(library_filename):
 
             return c_lib
 
-    # OS-X.
-    elif (sys.platform == "darwin"):
-        library_filename = 'lib' + library_filename
-        library_filename += '.dylib'
-        return ctypes.cdll.LoadLibrary(os.path.join(c_lib_path, library_filename))
-        
-    # Linux.
+    # OS-X and Linux.
     else:
-        library_filename = 'lib' + library_filename
-        library_filename += '.so'
-        return ctypes.cdll.LoadLibrary(os.path.join(c_lib_path, library_filename))
+
+        # Compile the library if necessary.
+        if (library_filename in c_libraries) and needsBuild(library_filename):
+            try:
+                buildCLibrary(library_filename)
+            except OSError as exception:
+                # Use the existing library if there is one.
+                if not os.path.exists(cLibraryPath(library_filename)):
+                    raise
+                print("Using old version of '" + library_filename + "',", exception)
+        
+        return ctypes.cdll.LoadLibrary(cLibraryPath(library_filename))
 
 
 #
@@ -11,6 +11,7 @@
 #
 
 # Common
+import functools
 import os
 import sys
 import traceback
@@ -27,6 +28,9 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 import storm_control.sc_library.hdebug as hdebug
 
 # General
+import storm_control.dave.daveHistory as daveHistory
+import storm_control.dave.daveScheduler as daveScheduler
+import storm_control.dave.daveValidation as daveValidation
 import storm_control.dave.notifications as notifications
 import storm_control.dave.sequenceGenerator as sequenceGenerator
 import storm_control.dave.sequenceViewer as sequenceViewer
@@ -43,10 +47,13 @@ import storm_control.sc_library.parameters as params
 
 ## CommandEngine
 #
-# This class handles the execution of commands that can be given to Dave
+# This class handles the execution of commands that can be given to Dave. While
+# the current command is running the engine looks ahead at the next commands
+# and starts any that do not use the same resources (see daveScheduler).
 #
 class CommandEngine(QtCore.QObject):
     done = QtCore.pyqtSignal()
+    measured = QtCore.pyqtSignal(object, float)
     paused = QtCore.pyqtSignal()
     problem = QtCore.pyqtSignal(object)
     warning = QtCore.pyqtSignal(object)
@@ -61,6 +68,10 @@ class CommandEngine(QtCore.QObject):
 
         # Set defaults
         self.command = None
+        self.lookahead = []         # The commands that will be run after the current command.
+        self.lookahead_size = 5
+        self.overlapped = {}        # Commands that were started early : None or [signal name, message] once done.
+        self.start_times = {}       # HAL and Kilroy commands that are running : the time they were started.
         
         self.test_mode = False
         
@@ -80,40 +91,159 @@ class CommandEngine(QtCore.QObject):
     #
     @hdebug.debug
     def abort(self):
+        self.start_times = {}
+        for command in list(self.overlapped):
+            self.forgetOverlapped(command, abort = True)
         self.command.abort()
 
+    ## disconnectCommand
+    #
+    # @param command The command (DaveAction) to disconnect the signals of.
+    #
+    def disconnectCommand(self, command):
+        command.complete_signal.disconnect()
+        command.error_signal.disconnect()
+        command.warning_signal.disconnect()
+
+    ## forgetOverlapped
+    #
+    # Stop tracking a command that was started early.
+    #
+    # @param command The command (DaveAction).
+    # @param abort (Optional) Abort the command if it is still running, defaults to False.
+    #
+    def forgetOverlapped(self, command, abort = False):
+        running = self.overlapped.pop(command) is None
+        self.disconnectCommand(command)
+        if running and abort:
+            command.abort()
+        command.cleanUp()
+
+    ## handleOverlappedDone
+    #
+    # Record the result of a command that was started early, it is
+    # handled once the command becomes the current command.
+    #
+    # @param command The command (DaveAction).
+    # @param signal_name The name of the signal that the command emitted.
+    # @param message The message from the command.
+    #
+    def handleOverlappedDone(self, command, signal_name, message):
+        if command in self.overlapped:
+            self.measure(command, message)
+            self.overlapped[command] = [signal_name, message]
+            self.startOverlapped()
+
+    ## measure
+    #
+    # Emit the measured duration of a command that finished without an error.
+    #
+    # @param command The command (DaveAction).
+    # @param message The message from the command.
+    #
+    def measure(self, command, message):
+        start_time = self.start_times.pop(command, None)
+        if (start_time is not None) and not message.hasError():
+            self.measured.emit(command, time.time() - start_time)
+
     ## startCommand
     #
     # Start a command or command sequence
     #
     # @param command The command (DaveAction) to start.
     # @param test_mode (Optional) Run the command in test mode.
+    # @param lookahead (Optional) A list of the commands that will be run after this command.
     #
-    def startCommand(self, command, test_mode = False):
+    def startCommand(self, command, test_mode = False, lookahead = None):
         self.command = command
+        self.lookahead = lookahead if lookahead is not None else []
+        self.test_mode = test_mode
+
+        # Forget finished commands that are no longer coming up, this happens
+        # if the user changes the current command while Dave is paused.
+        for dave_action in list(self.overlapped):
+            if (dave_action is not command) and not (dave_action in self.lookahead):
+                if self.overlapped[dave_action] is not None:
+                    self.forgetOverlapped(dave_action)
+
+        # Check if the command was started early.
+        result = None
+        started = (command in self.overlapped)
+        if started:
+            result = self.overlapped.pop(command)
+            self.disconnectCommand(command)
 
         # Connect signals.
         self.command.complete_signal.connect(self.handleActionComplete)
         self.command.error_signal.connect(self.handleErrorSignal)
         self.command.warning_signal.connect(self.handleWarningSignal)
-        
+
         # Start command.
-        if (self.command.getActionType() == "hal"):
-            self.command.start(self.HALClient, test_mode)
-        elif (self.command.getActionType() == "kilroy"):
-            self.command.start(self.kilroyClient, test_mode)
-        elif (self.command.getActionType() == "dave"):
-            self.dave_action.emit(self.command.getMessage())
-        elif (self.command.getActionType() == "NA"):
-            self.command.start(False, test_mode)
+        if started:
+            if result is not None:
+                [signal_name, message] = result
+                QtCore.QTimer.singleShot(0, lambda : getattr(command, signal_name).emit(message))
+        else:
+            self.startDaveAction(self.command, test_mode)
+
+        self.startOverlapped()
+
+    ## startDaveAction
+    #
+    # @param command The command (DaveAction) to start.
+    # @param test_mode Run the command in test mode.
+    #
+    def startDaveAction(self, command, test_mode):
+        if not test_mode and (command.getActionType() in ["hal", "kilroy"]):
+            self.start_times[command] = time.time()
+
+        if (command.getActionType() == "hal"):
+            command.start(self.HALClient, test_mode)
+        elif (command.getActionType() == "kilroy"):
+            command.start(self.kilroyClient, test_mode)
+        elif (command.getActionType() == "dave"):
+            self.dave_action.emit(command.getMessage())
+        elif (command.getActionType() == "NA"):
+            command.start(False, test_mode)
         else:
-            raise Exception("No TCPClient for " + self.command.getActionType())
+            raise Exception("No TCPClient for " + command.getActionType())
+
+    ## startOverlapped
+    #
+    # Start as many of the upcoming commands as possible without
+    # waiting for the current command to finish.
+    #
+    def startOverlapped(self):
+        if self.test_mode or self.command.shouldPause():
+            return
+
+        busy = self.command.getResources()
+        if busy is None:
+            return
+
+        for command in self.lookahead:
+            if command in self.overlapped:
+                if self.overlapped[command] is None:
+                    busy = busy | command.getResources()
+                if command.shouldPause():
+                    return
+                continue
+
+            if not daveScheduler.canOverlap(command, busy):
+                return
+
+            self.overlapped[command] = None
+            for signal_name in ["complete_signal", "error_signal", "warning_signal"]:
+                getattr(command, signal_name).connect(functools.partial(self.handleOverlappedDone, command, signal_name))
+            self.startDaveAction(command, False)
+            busy = busy | command.getResources()
 
     ## handleActionComplete
     #
     # Handle the completion of the previous action
     #
     def handleActionComplete(self, message):
+        self.measure(self.command, message)
         self.command.cleanUp()
         self.command.complete_signal.disconnect()
         self.command.error_signal.disconnect()
@@ -167,9 +297,17 @@ class Dave(QtWidgets.QMainWindow):
         self.sequence_filename = ""
         self.sequence_validated = False
         self.test_mode = False
-        self.skip_warning = False
         self.needs_hal = False
         self.needs_kilroy = False
+        self.max_schedule_rows = 1000
+        self.running_items = {}     # DaveAction : DaveActionStandardItem for the commands that may be running.
+        self.schedule_duration = 0
+        self.schedule_starts = {}   # Action index : predicted start time.
+        self.schedule_update_interval = 60.0
+        self.schedule_update_time = 0
+
+        # The measured durations of the commands.
+        self.history = daveHistory.DurationHistory(parameters.get("history_file", ""))
 
         # UI setup.
         self.ui = daveUi.Ui_MainWindow()
@@ -202,6 +340,7 @@ class Dave(QtWidgets.QMainWindow):
         self.ui.actionQuit.triggered.connect(self.quit)
         self.ui.actionGenerateXML.triggered.connect(self.handleGenerateXML)
         self.ui.actionSendTestEmail.triggered.connect(self.handleSendTestEmail)
+        self.ui.actionShowSchedule.triggered.connect(self.handleShowSchedule)
         self.ui.commandSequenceTreeView.update.connect(self.handleDetailsUpdate)
         self.ui.fromAddressLineEdit.textChanged.connect(self.handleNotifierChange)
         self.ui.fromPasswordLineEdit.textChanged.connect(self.handleNotifierChange)
@@ -237,11 +376,20 @@ class Dave(QtWidgets.QMainWindow):
         # Command engine.
         self.command_engine = CommandEngine()
         self.command_engine.done.connect(self.handleDone)
+        self.command_engine.measured.connect(self.handleMeasured)
         self.command_engine.problem.connect(self.handleProblem)
         self.command_engine.paused.connect(self.handlePauseFromCommandEngine)
         self.command_engine.warning.connect(self.handleWarning)
         self.command_engine.dave_action.connect(self.handleDaveAction)
 
+        # Validation engine.
+        self.validation_engine = daveValidation.ValidationEngine({"hal" : self.command_engine.HALClient,
+                                                                  "kilroy" : self.command_engine.kilroyClient})
+        self.validation_engine.done.connect(self.handleValidationDone)
+        self.validation_engine.problem.connect(self.handleValidationProblem)
+        self.validation_engine.progress.connect(self.ui.progressBar.setValue)
+        self.validation_problems = []
+
     ## cleanUp
     #
     # Saves (most of) the notification settings at program exit.
@@ -256,6 +404,8 @@ class Dave(QtWidgets.QMainWindow):
         for [elt, name] in self.noti_settings:
             self.settings.setValue(name, elt.text())
 
+        self.history.save()
+
     ## closeEvent
     #
     # Handles the PyQt close event.
@@ -331,12 +481,8 @@ class Dave(QtWidgets.QMainWindow):
             
             self.test_mode = False
             self.sequence_validated = False
-            self.ui.commandSequenceTreeView.setTestMode(False)
-            
-            if (self.running):
-                self.command_engine.abort()
-            else:
-                self.handleDone()
+            self.validation_engine.abort()
+            self.handleValidationDone()
 
     ## handleClearWarnings
     #
@@ -404,10 +550,6 @@ class Dave(QtWidgets.QMainWindow):
     #
     @hdebug.debug
     def handleDone(self):
-        # Handle updating usage information if in test mode
-        if self.test_mode:
-            self.ui.commandSequenceTreeView.updateEstimates()
-
         # Increment command to the next valid command / action.
         next_command = self.ui.commandSequenceTreeView.getNextItem()
 
@@ -420,29 +562,26 @@ class Dave(QtWidgets.QMainWindow):
             self.ui.commandSequenceTreeView.resetItemIndex()
             
             self.running = False
-            if self.test_mode:
-                self.sequence_validated = True
-                self.test_mode = False
-                self.ui.commandSequenceTreeView.setTestMode(False)
-                self.updateEstimates()
 
             # Stop TCP communication
-            if self.needs_hal:
-                self.command_engine.HALClient.stopCommunication()
-            if self.needs_kilroy:
-                self.command_engine.kilroyClient.stopCommunication()
+            self.stopTCP()
+
+            self.history.save()
 
         # Continue with next command.
         else: 
             
-            # Update time remaining time estimate.
-            est_time = self.ui.commandSequenceTreeView.getRemainingTime()
+            # Update time remaining time estimate, the schedule is updated
+            # now and then as more commands are measured.
+            if ((time.time() - self.schedule_update_time) > self.schedule_update_interval):
+                self.updateSchedule()
+            start_time = self.schedule_starts.get(next_command.getActionIndex(), 0)
+            est_time = max(0, self.schedule_duration - start_time)
             self.ui.remainingLabel.setText("Time Remaining: " + str(datetime.timedelta(seconds = est_time))[0:8])
 
             # Check for requested pause.
             if self.running: 
-                self.command_engine.startCommand(next_command.getDaveAction(), 
-                                                 self.test_mode)
+                self.startCurrentCommand()
             else: 
                 self.handlePause()
 
@@ -488,6 +627,29 @@ class Dave(QtWidgets.QMainWindow):
                     self.directory = os.path.dirname(recipe_xml_file)
                     self.newSequence(generated_xml_file)
 
+    ## handleMeasured
+    #
+    # Handles the measured signal from the command engine. The duration is added
+    # to the history and a warning is added if the command was unusually slow.
+    #
+    # @param command The DaveAction.
+    # @param seconds How long the command took.
+    #
+    @hdebug.debug
+    def handleMeasured(self, command, seconds):
+        action_type = type(command).__name__
+        predicted = self.history.predict(action_type, command.getID(), command.getDuration())
+        if self.history.addMeasurement(action_type, command.getID(), command.getDuration(), seconds):
+            message_str = command.getDescriptor() + "\n"
+            message_str += "Took {0:.1f} seconds, expected {1:.1f} seconds.".format(seconds, predicted)
+            print("Slow command: " + message_str)
+            item = self.running_items.get(command)
+            if item is not None:
+                num_warnings = self.ui.currentWarnings.count()
+                self.ui.currentWarnings.addWarning(item,
+                                                   message_str = message_str,
+                                                   descriptor = "Slow command " + str(num_warnings+1))
+
     ## handleNewSequenceFile
     #
     # Opens the dialog box that lets the user specify a sequence file.
@@ -558,41 +720,19 @@ class Dave(QtWidgets.QMainWindow):
         if not message_str:
             message_str = current_item.getDaveAction().getDescriptor() + "\n" + message.getErrorMessage()
 
-        if not self.test_mode:
-
-            # Pause Dave.
-            self.handlePause()
+        # Pause Dave.
+        self.handlePause()
 
-            # Stop TCP communication.
-            if self.needs_hal:
-                self.command_engine.HALClient.stopCommunication()
-            if self.needs_kilroy:
-                self.command_engine.kilroyClient.stopCommunication()
+        # Stop TCP communication.
+        self.stopTCP()
             
-            # Display errors.
-            if (self.ui.errorMsgCheckBox.isChecked()):
-                self.notifier.sendMessage("Acquisition Problem",
+        # Display errors.
+        if (self.ui.errorMsgCheckBox.isChecked()):
+            self.notifier.sendMessage("Acquisition Problem",
+                                      message_str)
+        QtWidgets.QMessageBox.information(self,
+                                          "Acquisition Problem",
                                           message_str)
-            QtWidgets.QMessageBox.information(self,
-                                              "Acquisition Problem",
-                                              message_str)
-
-        else: # Test mode
-            self.ui.commandSequenceTreeView.setCurrentItemValid(False)
-            message_str += "\nSuppress remaining warnings?"
-            if not self.skip_warning:
-                messageBox = QtWidgets.QMessageBox(parent = self)
-                messageBox.setWindowTitle("Invalid Command")
-                messageBox.setText(message_str)
-                messageBox.setStandardButtons(QtWidgets.QMessageBox.No |
-                                              QtWidgets.QMessageBox.YesToAll)
-                messageBox.setIcon(QtWidgets.QMessageBox.Warning)
-                messageBox.setDefaultButton(QtWidgets.QMessageBox.YesToAll)
-                button_ID = messageBox.exec_()
-                if button_ID == QtWidgets.QMessageBox.YesToAll:
-                    self.skip_warning = True # Skip additional warnings
-
-            print("Invalid command: " + current_item.getDaveAction().getDescriptor())
 
     ## handleRunButton
     #
@@ -647,8 +787,7 @@ class Dave(QtWidgets.QMainWindow):
             self.ui.validateSequenceButton.setEnabled(False)
             self.running = True
             self.updateRunStatusDisplay()
-            self.command_engine.startCommand(self.ui.commandSequenceTreeView.getCurrentItem().getDaveAction(),
-                                             self.test_mode)
+            self.startCurrentCommand()
 
     ## handleSendTestEmail
     #
@@ -660,6 +799,34 @@ class Dave(QtWidgets.QMainWindow):
     def handleSendTestEmail(self, boolean):
         self.notifier.sendMessage("Notifier Test", "Open the pod bay doors, HAL")
 
+    ## handleShowSchedule
+    #
+    # Show the predicted schedule (a dry run of the command engine) in the command
+    # details table. This uses the duration estimates from validation. Only the
+    # next max_schedule_rows commands are shown.
+    #
+    # @param boolean Dummy parameter.
+    #
+    @hdebug.debug
+    def handleShowSchedule(self, boolean):
+        [entries, schedule] = self.predictSchedule()
+
+        def toStr(seconds):
+            return str(datetime.timedelta(seconds = seconds))[0:8]
+
+        details = [["start", "end", "overlapped", "command"]]
+        current_index = self.ui.commandSequenceTreeView.getCurrentIndex()
+        finished = 0
+        for [entry, [start, end]] in zip(entries, schedule):
+            if (entry[0] >= current_index) and (len(details) <= self.max_schedule_rows):
+                dave_action = self.ui.commandSequenceTreeView.getItem(entry[0]).getDaveAction()
+                details.append([toStr(start),
+                                toStr(end),
+                                "yes" if (start < finished) else "",
+                                dave_action.getDescriptor()])
+            finished = max(finished, end)
+        self.handleDetailsUpdate(details)
+
     ## handleValidateCommandSequence
     #
     # Start the validation process for a command sequence
@@ -678,25 +845,73 @@ class Dave(QtWidgets.QMainWindow):
             self.ui.runButton.setEnabled(False)
             self.ui.abortButton.setEnabled(True)
             self.ui.validateSequenceButton.setEnabled(False)
-            self.skip_warning = False
+            self.validation_problems = []
             
             # Reset command properties.
             self.ui.commandSequenceTreeView.setAllValid(True)
-            
-            # Place commandSequence into test mode.
             self.ui.commandSequenceTreeView.resetItemIndex()
-            self.updateRunStatusDisplay()
-            self.ui.commandSequenceTreeView.setTestMode(True)
 
-            # Send first command.
-            self.command_engine.startCommand(self.ui.commandSequenceTreeView.getCurrentItem().getDaveAction(),
-                                             self.test_mode)
+            # Validate each group of identical commands once.
+            groups = self.ui.commandSequenceTreeView.getValidationGroups()
+            self.ui.progressBar.setMaximum(max(1, len(groups)))
+            self.ui.progressBar.setValue(0)
+            self.validation_engine.start(self.ui.commandSequenceTreeView.getModel(), groups)
 
         # Mark all commands as invalid
         else: 
             self.ui.commandSequenceTreeView.setAllValid(False)
             self.updateEstimates()
 
+    ## handleValidationDone
+    #
+    # Handles completion (or abort) of sequence validation.
+    #
+    @hdebug.debug
+    def handleValidationDone(self):
+        if self.test_mode:
+            self.sequence_validated = True
+            self.test_mode = False
+
+        self.running = False
+        self.ui.runButton.setText("Start")
+        self.ui.runButton.setEnabled(True)
+        self.ui.abortButton.setEnabled(False)
+        self.ui.validateSequenceButton.setEnabled(True)
+        self.ui.progressBar.setMaximum(self.ui.commandSequenceTreeView.getNumberItems())
+        self.ui.commandSequenceTreeView.resetItemIndex()
+        self.updateRunStatusDisplay()
+        self.updateEstimates()
+
+        # Stop TCP communication
+        self.stopTCP()
+
+        # Report invalid commands.
+        if self.sequence_validated and (len(self.validation_problems) > 0):
+            message_str = str(len(self.validation_problems)) + " invalid command(s)."
+            for problem in self.validation_problems[:10]:
+                message_str += "\n\n" + problem
+            if (len(self.validation_problems) > 10):
+                message_str += "\n\n.."
+            messageBox = QtWidgets.QMessageBox(parent = self)
+            messageBox.setWindowTitle("Invalid Commands")
+            messageBox.setText(message_str)
+            messageBox.setIcon(QtWidgets.QMessageBox.Warning)
+            messageBox.exec_()
+
+    ## handleValidationProblem
+    #
+    # Handles the problem signal from the validation engine. The problems are
+    # reported together once validation is complete.
+    #
+    # @param item The first DaveActionStandardItem of the group that is not valid.
+    # @param message The test message with the error.
+    #
+    @hdebug.debug
+    def handleValidationProblem(self, item, message):
+        message_str = item.getDaveAction().getDescriptor() + "\n" + message.getErrorMessage()
+        self.validation_problems.append(message_str)
+        print("Invalid command: " + item.getDaveAction().getDescriptor())
+
     ## handleWarning
     #
     # Handles the warning signal from the command engine and determines if Dave should pause
@@ -704,31 +919,24 @@ class Dave(QtWidgets.QMainWindow):
     #
     @hdebug.debug
     def handleWarning(self, message):
-        # Determine if Dave is in test mode, and use handleProblem if it is
-        if self.test_mode:
-            self.handleProblem(message)
-        else:
-            # Get information on the item that generated the warning
-            current_item = self.ui.commandSequenceTreeView.getCurrentItem()
-            message_str = current_item.getDaveAction().getDescriptor() + "\n" + message.getErrorMessage()
+        # Get information on the item that generated the warning
+        current_item = self.ui.commandSequenceTreeView.getCurrentItem()
+        message_str = current_item.getDaveAction().getDescriptor() + "\n" + message.getErrorMessage()
             
-            # Generate a warning
-            num_warnings = self.ui.currentWarnings.count()
-            self.ui.currentWarnings.addWarning(current_item,
-                                               message_str = message_str,
-                                               descriptor = "Warning " + str(num_warnings+1))
-
-            # Check to see if the number of warnings is larger than the allowed number
-            if self.ui.currentWarnings.count() >= self.ui.numWarningsToPause.value():
-                # Update Error Message
-                message_str = self.ui.currentWarnings.getSummaryMessage()
-                print(message_str)
+        # Generate a warning
+        num_warnings = self.ui.currentWarnings.count()
+        self.ui.currentWarnings.addWarning(current_item,
+                                           message_str = message_str,
+                                           descriptor = "Warning " + str(num_warnings+1))
+
+        # Check to see if the number of warnings is larger than the allowed number
+        if self.ui.currentWarnings.count() >= self.ui.numWarningsToPause.value():
+            # Update Error Message
+            message_str = self.ui.currentWarnings.getSummaryMessage()
+            print(message_str)
                 
-                # Handle problem and specify the message
-                self.handleProblem(message, message_str = message_str)
-            else:
-                pass
-                # Nothing needs to be done here, Dave should continue running.
+            # Handle problem and specify the message
+            self.handleProblem(message, message_str = message_str)
 
     ## handleWarningsDoubleClick
     #
@@ -782,8 +990,8 @@ class Dave(QtWidgets.QMainWindow):
                     no_error = False
             if no_error:
                 self.ui.commandSequenceTreeView.setModel(model)
-                self.ui.commandSequenceTreeView.setTestMode(False)
-                self.skip_warning = False #Enable warnings for invalid commands
+                self.schedule_duration = 0
+                self.schedule_starts = {}
                 self.sequence_validated = False #Mark sequence as unvalidated
                 self.ui.sequenceLabel.setText(sequence_filename)
                 self.ui.progressBar.setMaximum(self.ui.commandSequenceTreeView.getNumberItems())
@@ -795,13 +1003,59 @@ class Dave(QtWidgets.QMainWindow):
                 self.ui.abortButton.setEnabled(False)
                 self.ui.validateSequenceButton.setEnabled(True)
 
+    ## predictSchedule
+    #
+    # A dry run of the command engine using the durations predicted from
+    # the validation estimates and the history of measured durations.
+    #
+    # @return [entries, schedule], see DaveStandardItemModel.getScheduleEntries() and daveScheduler.predictSchedule().
+    #
+    def predictSchedule(self):
+        entries = self.ui.commandSequenceTreeView.getScheduleEntries(self.history.predict)
+        schedule = daveScheduler.predictSchedule(list(map(lambda x: x[1:], entries)),
+                                                 self.command_engine.lookahead_size)
+        return [entries, schedule]
+
+    ## startCurrentCommand
+    #
+    # Start the current command, the command engine also gets the next commands
+    # so that it can start them early if possible.
+    #
+    def startCurrentCommand(self):
+        current_item = self.ui.commandSequenceTreeView.getCurrentItem()
+        upcoming_items = self.ui.commandSequenceTreeView.getUpcomingItems(self.command_engine.lookahead_size)
+
+        # Remember the items of the commands that may be running for warnings.
+        self.running_items = {}
+        for item in [current_item] + upcoming_items:
+            self.running_items[item.getDaveAction()] = item
+
+        self.command_engine.startCommand(current_item.getDaveAction(),
+                                         self.test_mode,
+                                         lookahead = list(map(lambda x: x.getDaveAction(), upcoming_items)))
+
+    ## stopTCP
+    #
+    # Stop the TCP communications that were started by validateAndStartTCP.
+    #
+    def stopTCP(self):
+        if self.needs_hal:
+            self.command_engine.HALClient.stopCommunication()
+        if self.needs_kilroy:
+            self.command_engine.kilroyClient.stopCommunication()
+
     ## updateEstimates
     #
     # Update disk and duration estimates
     #
     @hdebug.debug
     def updateEstimates(self):
-        [est_time, est_space] = self.ui.commandSequenceTreeView.getEstimates()
+        est_space = self.ui.commandSequenceTreeView.getEstimates()[1]
+
+        # Some commands run at the same time, so use the predicted schedule
+        # for the duration instead of the sum of the command durations.
+        self.updateSchedule()
+        est_time = self.schedule_duration
             
         self.ui.timeLabel.setText("Run Duration: " + str(datetime.timedelta(seconds=est_time))[0:8])
         self.ui.remainingLabel.setText("Time Remaining: " + str(datetime.timedelta(seconds=est_time))[0:8])
@@ -812,6 +1066,16 @@ class Dave(QtWidgets.QMainWindow):
         else: # Bigger than 1 TB
             self.ui.spaceLabel.setText("Run Size: {0:.2f} TB ".format(est_space/2**20))
 
+    ## updateSchedule
+    #
+    # Update the predicted schedule that is used for the remaining time estimate.
+    #
+    def updateSchedule(self):
+        [entries, schedule] = self.predictSchedule()
+        self.schedule_duration = daveScheduler.scheduleDuration(schedule)
+        self.schedule_starts = dict(zip(map(lambda x: x[0], entries), map(lambda x: x[0], schedule)))
+        self.schedule_update_time = time.time()
+
     ## updateRunStatusDisplay
     #
     # Update the GUI.
@@ -52,17 +52,18 @@ class DaveAction(QtCore.QObject):
         self.id = None
         self.tcp_client = None
         self.message = None
+        self.resources = None  # The resources that the action uses, None means all of them
         self.valid = True
+        self.waiting = False   # Waiting for a reply
 
         # Define pause behaviors
         self.should_pause = False            # Pause after completion
         self.should_pause_default = False    # Default pause state for reset
         self.should_pause_after_error = True # Pause after an error
                 
-        # Initialize internal timer
-        self.lost_message_timer = QtCore.QTimer(self)
-        self.lost_message_timer.setSingleShot(True)
-        self.lost_message_timer.timeout.connect(self.handleTimerDone)
+        # The internal timer is only created if the action is started, as
+        # there is one action for every command in the sequence.
+        self.lost_message_timer = None
         self.lost_message_delay = 2000 # Wait for a test message to be returned before issuing an error
         self.lost_message_should_use = False # Use the lost message timer when submitting real (not test) action
 
@@ -71,6 +72,7 @@ class DaveAction(QtCore.QObject):
     # Handle an external abort call
     #
     def abort(self):
+        self.waiting = False
         self.completeAction(self.message)
 
     ## cleanUp
@@ -78,7 +80,7 @@ class DaveAction(QtCore.QObject):
     # Handle clean up of the action
     #
     def cleanUp(self):
-        self.tcp_client.messageReceived.disconnect()
+        self.waiting = False
         self.resetPause() # Allow a paused action to be rerun without a pause
 
     ## createETree
@@ -185,6 +187,15 @@ class DaveAction(QtCore.QObject):
     def getMessage(self):
         return self.message
 
+    ## getResources
+    #
+    # Actions that use different resources can run at the same time.
+    #
+    # @return A set of resource names (i.e. "stage", "parameters"), or None if the action needs all of them.
+    #
+    def getResources(self):
+        return self.resources
+
     ## getUsage
     #
     # @return Disk usage.
@@ -201,8 +212,14 @@ class DaveAction(QtCore.QObject):
     #
     def handleReply(self, message, warning = False):
 
+        # Ignore replies that arrive after the action was aborted or timed out.
+        if not self.waiting:
+            return
+        self.waiting = False
+
         # Stop lost message timer
-        self.lost_message_timer.stop()
+        if self.lost_message_timer is not None:
+            self.lost_message_timer.stop()
 
         # Check to see if the same message got returned
         if not (message.getID() == self.message.getID()):
@@ -221,6 +238,7 @@ class DaveAction(QtCore.QObject):
     # Handle a timer done signal
     #
     def handleTimerDone(self):
+        self.waiting = False
         error_str = "A message of type " + self.message.getType() + " was not returned.\n"
         if self.message.isTest():
             error_str += "Perhaps a module is missing?"
@@ -302,11 +320,30 @@ class DaveAction(QtCore.QObject):
     def start(self, tcp_client, test_mode):
         self.tcp_client = tcp_client
         self.message.setTestMode(test_mode)
+        self.waiting = True
 
-        self.tcp_client.messageReceived.connect(self.handleReply)
+        # The reply is matched to this action by message ID, so other
+        # actions can use the same client at the same time.
         if self.message.isTest() or self.lost_message_should_use:
+            if self.lost_message_timer is None:
+                self.lost_message_timer = QtCore.QTimer(self)
+                self.lost_message_timer.setSingleShot(True)
+                self.lost_message_timer.timeout.connect(self.handleTimerDone)
             self.lost_message_timer.start(self.lost_message_delay)
-        self.tcp_client.sendMessage(self.message)
+        self.tcp_client.sendMessage(self.message, response_fn = self.handleReply)
+
+    ## validate
+    #
+    # Send the action in test mode without waiting for the response, this
+    # lets several actions be validated at the same time.
+    #
+    # @param tcp_client The TCP client to use for communication.
+    # @param response_fn The function to call with the response.
+    #
+    def validate(self, tcp_client, response_fn):
+        self.tcp_client = tcp_client
+        self.message.setTestMode(True)
+        self.tcp_client.sendMessage(self.message, response_fn = response_fn)
 
 # 
 # Specific Actions
@@ -324,6 +361,7 @@ class DACheckFocus(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "hal"
+        self.resources = {"focus", "parameters", "stage"}
         self.num_focus_checks = 10 # A default number of focus checks
         self.focus_scan = False # The default is to not scan for focus
         self.scan_range = False # The range to scan for focus in microns
@@ -630,6 +668,7 @@ class DAFindSum(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "hal"
+        self.resources = {"focus", "parameters", "stage"}
         self.min_sum = None
     ## createETree
     #
@@ -694,6 +733,7 @@ class DAMoveStage(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "hal"
+        self.resources = {"stage"}
 
     ## createETree
     #
@@ -730,10 +770,9 @@ class DAMoveStage(DaveAction):
                                              message_data = {"stage_x" : self.stage_x,
                                                              "stage_y" : self.stage_y})
 
-        # Create id to indicate required validation
-        self.id = self.message.getType() + " "
-        self.id += "stage_x: " + str(self.stage_x) + " "
-        self.id += "stage_y: " + str(self.stage_y)
+        # Require validation. HAL's response does not depend on the
+        # position so all the stage moves can share one validation.
+        self.id = self.message.getType()
 
 ## DAPause
 #
@@ -817,6 +856,7 @@ class DARecenterPiezo(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "hal"
+        self.resources = {"focus"}
 
     ## createETree
     #
@@ -858,6 +898,7 @@ class DASetDirectory(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "hal"
+        self.resources = {"directory"}
 
     ## createETree
     #
@@ -906,6 +947,7 @@ class DASetFocusLockTarget(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "hal"
+        self.resources = {"focus"}
 
     ## createETree
     #
@@ -951,6 +993,7 @@ class DASetParameters(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "hal"
+        self.resources = {"parameters"}
 
         # Allow for a longer delay in case the parameters need to be initialized
         self.lost_message_delay = 15000
@@ -1006,6 +1049,7 @@ class DASetProgression(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "hal"
+        self.resources = {"progression"}
 
     ## createETree
     #
@@ -1085,6 +1129,7 @@ class DATakeMovie(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "hal"
+        self.resources = {"camera", "directory", "focus", "parameters", "progression", "sample", "stage"}
         self.properties = {"name" : None,
                            "length" : None,
                            "min_spots" : None,
@@ -1200,14 +1245,12 @@ class DATakeMovie(DaveAction):
         self.message = tcpMessage.TCPMessage(message_type = "Take Movie",
                                              message_data = message_data)
 
-        # Require validation.
-        #
-        # FIXME: This should be '+=' not '='?
-        #
+        # Require validation. Movies with the same parameters, length
+        # and directory will have the same size and duration.
         self.id = self.message.getType() + " "
-        self.id = str(self.length) + " "
-        if message_data["parameters"] is not None:
-            self.id = str(message_data["parameters"])
+        self.id += "parameters: " + str(message_data["parameters"]) + " "
+        self.id += "length: " + str(self.length) + " "
+        self.id += "directory: " + str(message_data.get("directory"))
 
 ## DAValveProtocol
 #
@@ -1223,6 +1266,7 @@ class DAValveProtocol(DaveAction):
         DaveAction.__init__(self)
 
         self.action_type = "kilroy"
+        self.resources = {"fluidics", "sample"}
         self.properties = {"name" : None}
 
     ## createETree
@@ -1236,6 +1280,8 @@ class DAValveProtocol(DaveAction):
         if (name is not None):
             node = ElementTree.Element(str(type(self).__name__))
             node.text = name
+            if dictionary.get("overlap") is not None:
+                node.set("overlap", str(dictionary.get("overlap")))
             return node
         else:
             return None
@@ -1257,15 +1303,17 @@ class DAValveProtocol(DaveAction):
         self.protocol_name = node.text
         self.protocol_is_running = False
 
+        # Protocols with overlap="True" do not change the sample that is
+        # being imaged, so they can run at the same time as a movie.
+        if (node.get("overlap", "False").lower() == "true"):
+            self.resources = {"fluidics"}
+
         self.message = tcpMessage.TCPMessage(message_type = "Kilroy Protocol",
                                              message_data = {"name": self.protocol_name})
 
         # Require validation.
-        #
-        # FIXME: This should be '+=' not '='?
-        #
         self.id = self.message.getType() + " "
-        self.id = self.protocol_name        
+        self.id += self.protocol_name
 
 #
 # The MIT License
@@ -0,0 +1,213 @@
+#!/usr/bin/python
+#
+## @file
+#
+# Records how long DaveActions actually take. The durations that HAL and
+# Kilroy return in test mode do not include overheads like setting up the
+# camera, checking the focus lock, waiting for the stage to settle or
+# closing the film, and fluidics steps vary. Dave uses the measured
+# durations to correct the estimates and to warn about actions that take
+# much longer than they usually do.
+#
+
+import json
+import os
+
+
+## median
+#
+# @param values A list of numbers.
+#
+# @return The median of the numbers.
+#
+def median(values):
+    values = sorted(values)
+    n = len(values)
+    if ((n % 2) == 1):
+        return values[n//2]
+    else:
+        return 0.5 * (values[n//2 - 1] + values[n//2])
+
+
+## DurationHistory
+#
+# The measured durations are stored by action type (i.e. "DATakeMovie")
+# and action ID (which includes the parameters, the movie length, ..).
+# The prediction for an action uses the median overhead of earlier
+# actions with the same ID, or a linear fit of the measured duration
+# against the estimated duration for all the actions of the same type.
+#
+class DurationHistory(object):
+
+    ## __init__
+    #
+    # @param filename (Optional) The JSON file to load and save the history, defaults to no file.
+    # @param max_samples (Optional) The number of measurements to keep for each action ID, defaults to 50.
+    # @param min_samples (Optional) The number of measurements needed for a prediction, defaults to 3.
+    #
+    def __init__(self, filename = None, max_samples = 50, min_samples = 3):
+        self.filename = filename
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+
+        # Measurements are slow if the overhead is more than this many
+        # (robust) standard deviations and seconds above the usual overhead.
+        self.min_slow_samples = 5
+        self.slow_margin = 2.0
+        self.slow_sigmas = 4.0
+
+        self.fits = {}          # Action type : [offset, slope] or None.
+        self.overheads = {}     # [Action type, action ID] : median overhead or None.
+        self.samples = {}       # Action type : {action ID : [[estimate, measured], ..]}
+
+        if self.filename and os.path.exists(self.filename):
+            self.load()
+
+    ## addMeasurement
+    #
+    # @param action_type The action type.
+    # @param action_id The action ID, this can be None.
+    # @param estimate The estimated duration in seconds.
+    # @param measured The measured duration in seconds.
+    #
+    # @return True/False if the action was unusually slow.
+    #
+    def addMeasurement(self, action_type, action_id, estimate, measured):
+        slow = self.isSlow(action_type, action_id, estimate, measured)
+
+        if action_id is None:
+            action_id = action_type
+        samples = self.samples.setdefault(action_type, {}).setdefault(action_id, [])
+        samples.append([estimate, measured])
+        if (len(samples) > self.max_samples):
+            del samples[0]
+
+        self.fits.pop(action_type, None)
+        self.overheads.pop((action_type, action_id), None)
+        return slow
+
+    ## fitType
+    #
+    # Least squares fit of measured = offset + slope * estimate for all the
+    # actions of this type. If the estimates are all the same this is just
+    # the median overhead.
+    #
+    # @param action_type The action type.
+    #
+    # @return [offset, slope] or None if there are not enough measurements.
+    #
+    def fitType(self, action_type):
+        if not action_type in self.fits:
+            samples = []
+            for id_samples in self.samples.get(action_type, {}).values():
+                samples.extend(id_samples)
+
+            fit = None
+            if (len(samples) >= self.min_samples):
+                n = len(samples)
+                mean_x = sum(map(lambda x: x[0], samples))/n
+                mean_y = sum(map(lambda x: x[1], samples))/n
+                sxx = sum(map(lambda x: (x[0] - mean_x)**2, samples))
+                sxy = sum(map(lambda x: (x[0] - mean_x) * (x[1] - mean_y), samples))
+                if (sxx > 1.0e-6 * n):
+                    slope = sxy/sxx
+                    fit = [mean_y - slope * mean_x, slope]
+                else:
+                    fit = [median(list(map(lambda x: x[1] - x[0], samples))), 1.0]
+            self.fits[action_type] = fit
+        return self.fits[action_type]
+
+    ## getOverhead
+    #
+    # @param action_type The action type.
+    # @param action_id The action ID.
+    #
+    # @return The median overhead of the action ID or None if there are not enough measurements.
+    #
+    def getOverhead(self, action_type, action_id):
+        if not (action_type, action_id) in self.overheads:
+            samples = self.getSamples(action_type, action_id)
+            overhead = None
+            if (len(samples) >= self.min_samples):
+                overhead = median(list(map(lambda x: x[1] - x[0], samples)))
+            self.overheads[(action_type, action_id)] = overhead
+        return self.overheads[(action_type, action_id)]
+
+    ## getSamples
+    #
+    # @param action_type The action type.
+    # @param action_id The action ID, this can be None.
+    #
+    # @return A list of [estimate, measured] for the action ID.
+    #
+    def getSamples(self, action_type, action_id):
+        if action_id is None:
+            action_id = action_type
+        return self.samples.get(action_type, {}).get(action_id, [])
+
+    ## isSlow
+    #
+    # @param action_type The action type.
+    # @param action_id The action ID, this can be None.
+    # @param estimate The estimated duration in seconds.
+    # @param measured The measured duration in seconds.
+    #
+    # @return True/False if the overhead is much larger than usual for this action ID.
+    #
+    def isSlow(self, action_type, action_id, estimate, measured):
+        samples = self.getSamples(action_type, action_id)
+        if (len(samples) < self.min_slow_samples):
+            return False
+
+        overheads = list(map(lambda x: x[1] - x[0], samples))
+        usual = median(overheads)
+        sigma = 1.4826 * median(list(map(lambda x: abs(x - usual), overheads)))
+        return ((measured - estimate) > (usual + max(self.slow_sigmas * sigma, self.slow_margin)))
+
+    ## load
+    #
+    # Load the history from the file.
+    #
+    def load(self):
+        try:
+            with open(self.filename) as fp:
+                self.samples = json.load(fp)
+        except (OSError, ValueError) as error:
+            print("Could not load action history from", self.filename, error)
+            self.samples = {}
+        self.fits = {}
+        self.overheads = {}
+
+    ## predict
+    #
+    # @param action_type The action type.
+    # @param action_id The action ID, this can be None.
+    # @param estimate The estimated duration in seconds.
+    #
+    # @return The predicted duration in seconds.
+    #
+    def predict(self, action_type, action_id, estimate):
+        if action_id is None:
+            action_id = action_type
+        overhead = self.getOverhead(action_type, action_id)
+        if overhead is not None:
+            return max(0, estimate + overhead)
+
+        fit = self.fitType(action_type)
+        if fit is not None:
+            return max(0, fit[0] + fit[1] * estimate)
+        return estimate
+
+    ## save
+    #
+    # Save the history to the file (if there is one).
+    #
+    def save(self):
+        if not self.filename:
+            return
+        try:
+            with open(self.filename + ".tmp", "w") as fp:
+                json.dump(self.samples, fp)
+            os.replace(self.filename + ".tmp", self.filename)
+        except OSError as error:
+            print("Could not save action history to", self.filename, error)
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+#
+## @file
+#
+# Decides which DaveActions can run at the same time. Each action lists
+# the resources that it uses (the stage, the parameters, the sample, ..)
+# and an upcoming action can start while the earlier actions are still
+# running if it does not use any of their resources. Actions are always
+# started in order, and actions that use all the resources (pauses,
+# delays, emails, ..) are never overlapped with anything.
+#
+
+
+## canOverlap
+#
+# @param dave_action The DaveAction that we would like to start.
+# @param busy A set of the resources in use by the running actions, or None if they are all in use.
+#
+# @return True/False if the action can be started now.
+#
+def canOverlap(dave_action, busy):
+    resources = dave_action.getResources()
+    if (resources is None) or (busy is None):
+        return False
+    return resources.isdisjoint(busy)
+
+## predictSchedule
+#
+# A dry run of the command engine, this uses the (validated) duration
+# estimates of the actions. The actions are described by their resources
+# and durations so that the DaveActions do not have to be created.
+#
+# @param entries A list of [resources, duration] for each action in the order that they will be run.
+# @param lookahead (Optional) How many actions past the current action can be started, defaults to 5.
+#
+# @return A list of [start time, end time] (in seconds) for each action.
+#
+def predictSchedule(entries, lookahead = 5):
+    schedule = []
+    barrier_end = 0     # When the last action that uses all the resources finishes.
+    finished = []       # finished[i] is when all the actions up to i have finished.
+    resource_end = {}   # When the last action using each resource finishes.
+    for i, [resources, duration] in enumerate(entries):
+
+        # Actions are started in order.
+        start = barrier_end
+        if (i > 0):
+            start = max(start, schedule[i-1][0])
+
+        # The current action (the oldest action that is not finished)
+        # has to be within lookahead of this action.
+        if (i > lookahead):
+            start = max(start, finished[i-lookahead-1])
+
+        # Wait for earlier actions that use the same resources.
+        if resources is None:
+            if (i > 0):
+                start = max(start, finished[i-1])
+        else:
+            for resource in resources:
+                start = max(start, resource_end.get(resource, 0))
+
+        end = start + duration
+        schedule.append([start, end])
+
+        if resources is None:
+            barrier_end = end
+        else:
+            for resource in resources:
+                resource_end[resource] = end
+        if (i > 0):
+            finished.append(max(finished[i-1], end))
+        else:
+            finished.append(end)
+
+    return schedule
+
+## scheduleDuration
+#
+# @param schedule A schedule from predictSchedule().
+#
+# @return The total duration of the schedule in seconds.
+#
+def scheduleDuration(schedule):
+    if (len(schedule) == 0):
+        return 0
+    return max(map(lambda x: x[1], schedule))
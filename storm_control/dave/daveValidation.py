@@ -0,0 +1,174 @@
+#!/usr/bin/python
+#
+## @file
+#
+# Validation of a command sequence. Actions that will get the same
+# response from HAL or Kilroy in test mode have the same ID, so only
+# one action for each ID is sent. Several test messages are sent at
+# the same time instead of waiting for the response to each one, and
+# the run size and duration totals are then calculated by Dave from
+# the estimates of each group.
+#
+
+from PyQt5 import QtCore
+
+
+## ValidationEngine
+#
+# Sends test mode messages and records the results.
+#
+class ValidationEngine(QtCore.QObject):
+    done = QtCore.pyqtSignal()
+    problem = QtCore.pyqtSignal(object, object)
+    progress = QtCore.pyqtSignal(int)
+
+    ## __init__
+    #
+    # @param clients A dictionary of TCP clients keyed by action type (i.e. "hal" or "kilroy").
+    # @param max_in_flight (Optional) The maximum number of test messages to have in flight, defaults to 20.
+    # @param parent (Optional) The PyQt parent of this object.
+    #
+    def __init__(self, clients, max_in_flight = 20, parent = None):
+        QtCore.QObject.__init__(self, parent)
+
+        self.clients = clients
+        self.dv_model = None
+        self.in_flight = {}   # Message ID : [action ID, action indices] for the messages we are waiting for.
+        self.max_in_flight = max_in_flight
+        self.n_validated = 0
+        self.pending = []     # [action ID, action indices] that have not been sent yet.
+        self.running = False
+
+        # This is the same as DaveAction's lost message timer, except that it
+        # is restarted every time a response arrives as the later messages
+        # have to wait for the earlier ones.
+        self.lost_message_timer = QtCore.QTimer(self)
+        self.lost_message_timer.setSingleShot(True)
+        self.lost_message_timer.timeout.connect(self.handleTimerDone)
+        self.lost_message_delay = 2000
+
+    ## abort
+    #
+    # Stop validating, any responses that arrive later are ignored.
+    #
+    def abort(self):
+        self.lost_message_timer.stop()
+        self.in_flight = {}
+        self.pending = []
+        self.running = False
+
+    ## finish
+    #
+    # Called when all the groups have been validated.
+    #
+    def finish(self):
+        self.lost_message_timer.stop()
+        self.running = False
+        self.done.emit()
+
+    ## getNumberValidated
+    #
+    # @return The number of groups that have been validated.
+    #
+    def getNumberValidated(self):
+        return self.n_validated
+
+    ## handleResponse
+    #
+    # Handle the response to a test message.
+    #
+    # @param message A TCP message object.
+    #
+    def handleResponse(self, message):
+        if not message.getID() in self.in_flight:
+            return
+        [action_id, indices] = self.in_flight.pop(message.getID())
+        self.setResult(indices, message)
+        self.sendPending()
+
+    ## handleTimerDone
+    #
+    # None of the messages in flight were returned in time.
+    #
+    def handleTimerDone(self):
+        in_flight = self.in_flight
+        self.in_flight = {}
+        for [action_id, indices] in in_flight.values():
+            message = self.dv_model.getItem(indices[0]).getDaveAction().getMessage()
+            error_str = "A message of type " + message.getType() + " was not returned.\n"
+            error_str += "Perhaps a module is missing?"
+            message.setError(True, error_str)
+            self.setResult(indices, message)
+        self.sendPending()
+
+    ## isRunning
+    #
+    # @return True/False if a validation is in progress.
+    #
+    def isRunning(self):
+        return self.running
+
+    ## sendPending
+    #
+    # Send as many of the pending test messages as we can.
+    #
+    def sendPending(self):
+        if not self.running:
+            return
+
+        while (len(self.pending) > 0) and (len(self.in_flight) < self.max_in_flight):
+            [action_id, indices] = self.pending.pop(0)
+            dave_action = self.dv_model.getItem(indices[0]).getDaveAction()
+
+            # Actions that Dave handles itself are always valid.
+            tcp_client = self.clients.get(dave_action.getActionType())
+            if tcp_client is None:
+                self.setResult(indices, None)
+                continue
+
+            self.in_flight[dave_action.getMessage().getID()] = [action_id, indices]
+            dave_action.validate(tcp_client, self.handleResponse)
+
+        if (len(self.in_flight) > 0):
+            self.lost_message_timer.start(self.lost_message_delay)
+        elif (len(self.pending) == 0):
+            self.finish()
+
+    ## setResult
+    #
+    # Update all the actions in a group with the response to the test message.
+    #
+    # @param indices The indices of the actions in the group.
+    # @param message A TCP message object or None.
+    #
+    def setResult(self, indices, message):
+        self.n_validated += 1
+        if message is not None:
+            if message.hasError():
+                for i in indices:
+                    self.dv_model.setValid(i, False)
+                self.problem.emit(self.dv_model.getItem(indices[0]), message)
+            else:
+                disk_usage = message.getResponse("disk_usage")
+                duration = message.getResponse("duration")
+                for i in indices:
+                    self.dv_model.setUsageEstimates(i,
+                                                    disk_usage if disk_usage is not None else 0,
+                                                    duration if duration is not None else 0)
+        self.progress.emit(self.n_validated)
+
+    ## start
+    #
+    # Start validating.
+    #
+    # @param dv_model The DaveStandardItemModel with the actions.
+    # @param groups A list of [action ID, action indices] with one entry for each action ID.
+    #
+    def start(self, dv_model, groups):
+        self.dv_model = dv_model
+        self.in_flight = {}
+        self.n_validated = 0
+        self.pending = list(groups)
+        self.running = True
+        self.sendPending()
+
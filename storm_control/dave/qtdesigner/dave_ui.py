@@ -217,7 +217,10 @@ class Ui_MainWindow(object):
         self.actionGenerateXML.setObjectName("actionGenerateXML")
         self.actionSendTestEmail = QtWidgets.QAction(MainWindow)
         self.actionSendTestEmail.setObjectName("actionSendTestEmail")
+        self.actionShowSchedule = QtWidgets.QAction(MainWindow)
+        self.actionShowSchedule.setObjectName("actionShowSchedule")
         self.menuFile.addAction(self.actionNew_Sequence)
+        self.menuFile.addAction(self.actionShowSchedule)
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionQuit)
         self.menuXML.addAction(self.actionGenerateXML)
@@ -263,6 +266,7 @@ class Ui_MainWindow(object):
         self.actionGenerate.setText(_translate("MainWindow", "Generate (Version 1.0)"))
         self.actionGenerateXML.setText(_translate("MainWindow", "&Generate XML"))
         self.actionSendTestEmail.setText(_translate("MainWindow", "&Send Test Email"))
+        self.actionShowSchedule.setText(_translate("MainWindow", "Show &Schedule"))
 
 from storm_control.dave.daveWarnings import DaveWarningsViewer
 from storm_control.dave.sequenceViewer import DaveCommandTreeViewer
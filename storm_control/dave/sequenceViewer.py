@@ -17,22 +17,38 @@ DaveActionType = QtGui.QStandardItem.UserType
 
 ## DaveActionStandardItem
 #
-# A QStandardItem specialized to hold a DaveAction.
+# A QStandardItem specialized to hold a DaveAction. The items are only created
+# when they are needed, so the validity and the usage estimates of the actions
+# are stored in the model.
 #
 class DaveActionStandardItem(QtGui.QStandardItem):
 
     ## __init__
     #
     # @param node A XML node describing the DaveAction.
+    # @param dv_model The DaveStandardItemModel that the item belongs to.
+    # @param action_index The index of the DaveAction in the model.
     #
-    def __init__(self, node):
+    def __init__(self, node, dv_model, action_index):
         dave_action_class = getattr(daveActions, node.tag)
         self.dave_action = dave_action_class()
         self.dave_action.setup(node)
-        self.valid = True
+        self.dave_action.setDiskUsage(dv_model.disk_usage[action_index])
+        self.dave_action.setDuration(dv_model.duration[action_index])
+        self.action_index = action_index
+        self.dv_model = dv_model
 
         QtGui.QStandardItem.__init__(self, self.dave_action.getDescriptor())
         self.setFlags(QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled)
+        if not self.isValid():
+            self.updateBackground()
+
+    ## getActionIndex
+    #
+    # @return The index of the DaveAction in the model.
+    #
+    def getActionIndex(self):
+        return self.action_index
 
     ## getDaveAction
     #
@@ -53,7 +69,7 @@ class DaveActionStandardItem(QtGui.QStandardItem):
     # @return True/False if the command is valid.
     #
     def isValid(self):
-        return self.valid
+        return self.dv_model.valid[self.action_index]
 
     ## setUsageEstimates
     #
@@ -61,19 +77,14 @@ class DaveActionStandardItem(QtGui.QStandardItem):
     # @param duration The estimated duration of the action
     #
     def setUsageEstimates(self, disk_usage, duration):
-        self.dave_action.setDiskUsage(disk_usage)
-        self.dave_action.setDuration(duration)
+        self.dv_model.setUsageEstimates(self.action_index, disk_usage, duration)
 
     ## setValid
     #
     # @param valid True/False if the DaveAction associated with this item is valid.
     #
     def setValid(self, valid):
-        self.valid = valid
-        if self.valid:
-            self.setBackground(QtGui.QBrush(QtGui.QColor(255,255,255)))
-        else:
-            self.setBackground(QtGui.QBrush(QtGui.QColor(255,200,200)))
+        self.dv_model.setValid(self.action_index, valid)
 
     ## type
     #
@@ -93,6 +104,40 @@ class DaveActionStandardItem(QtGui.QStandardItem):
         else:
             return str(parent.text())
 
+    ## updateBackground
+    #
+    # Update the background color to show whether the command is valid.
+    #
+    def updateBackground(self):
+        if self.isValid():
+            self.setBackground(QtGui.QBrush(QtGui.QColor(255,255,255)))
+        else:
+            self.setBackground(QtGui.QBrush(QtGui.QColor(255,200,200)))
+
+
+## DaveBranchStandardItem
+#
+# A QStandardItem for a branch of the sequence. The children of the branch
+# are added by the model when the branch is expanded.
+#
+class DaveBranchStandardItem(QtGui.QStandardItem):
+
+    ## __init__
+    #
+    # @param node A XML branch node.
+    #
+    def __init__(self, node):
+        QtGui.QStandardItem.__init__(self, node.get("name", "NA"))
+        self.node = node
+        self.setFlags(QtCore.Qt.ItemIsEnabled)
+
+    ## getNode
+    #
+    # @return The XML node of the branch.
+    #
+    def getNode(self):
+        return self.node
+
 ## DaveCommandTreeViewer
 #
 # This class wraps the tree view and it's associated model.
@@ -164,6 +209,23 @@ class DaveCommandTreeViewer(QtWidgets.QTreeView):
         else:
             return [0, 0]
 
+    ## getItem
+    #
+    # @param action_index The index of an action.
+    #
+    # @return The DaveActionStandardItem of the action.
+    #
+    def getItem(self, action_index):
+        if self.dv_model is not None:
+            return self.dv_model.getItem(action_index)
+
+    ## getModel
+    #
+    # @return The DaveStandardItemModel or None.
+    #
+    def getModel(self):
+        return self.dv_model
+
     ## getNextItem
     #
     # @param (Optional) skip_invalid True/False to skip invalid commands. Defaults to True.
@@ -201,6 +263,49 @@ class DaveCommandTreeViewer(QtWidgets.QTreeView):
         else:
             return 0
 
+    ## getScheduleEntries
+    #
+    # @param predict (Optional) A function of (action type, action ID, duration) that returns the predicted duration.
+    #
+    # @return A list of [action index, resources, duration] for each valid action.
+    #
+    def getScheduleEntries(self, predict = None):
+        if self.dv_model is not None:
+            return self.dv_model.getScheduleEntries(predict)
+        else:
+            return []
+
+    ## getUpcomingActions
+    #
+    # @param number The maximum number of DaveActions to return.
+    #
+    # @return A list of the (valid) DaveActions after the current DaveAction.
+    #
+    def getUpcomingActions(self, number):
+        return list(map(lambda x: x.getDaveAction(), self.getUpcomingItems(number)))
+
+    ## getUpcomingItems
+    #
+    # @param number The maximum number of items to return.
+    #
+    # @return A list of the (valid) DaveActionStandardItems after the current item.
+    #
+    def getUpcomingItems(self, number):
+        if self.dv_model is not None:
+            return self.dv_model.getUpcomingItems(number)
+        else:
+            return []
+
+    ## getValidationGroups
+    #
+    # @return A list of [action ID, action indices], one for each action ID that requires validation.
+    #
+    def getValidationGroups(self):
+        if self.dv_model is not None:
+            return self.dv_model.getValidationGroups()
+        else:
+            return []
+
     ## handleClick
     #
     # @param model_index The QModelIndex of the item that was clicked.
@@ -310,20 +415,6 @@ class DaveCommandTreeViewer(QtWidgets.QTreeView):
         QtWidgets.QTreeView.setModel(self, self.dv_model)
         self.viewportUpdate()
 
-    ## setTestMode
-    #
-    # @param test_mode True/False sets the test mode of the DaveStandardItemModel.
-    #
-    def setTestMode(self, test_mode):
-        if self.dv_model is not None:
-            self.dv_model.setTestMode(test_mode)
-
-    ## updateEstimates
-    #
-    def updateEstimates(self):
-        if self.dv_model is not None:
-            self.dv_model.updateEstimates()
-        
     ## viewportUpdate
     #
     # Update the viewport.
@@ -339,59 +430,133 @@ class DaveCommandTreeViewer(QtWidgets.QTreeView):
 #
 # A QStandardItemModel specialized for Dave.
 #
+# The sequence is only stored as XML nodes when it is loaded. The items (and
+# their DaveActions) are created one branch at a time when the branch is
+# expanded in the view or when the action is needed, so that sequences with
+# hundreds of thousands of actions load quickly.
+#
 class DaveStandardItemModel(QtGui.QStandardItemModel):
 
     ## __init__
     #
-    def __init__(self):
+    # @param fetch_size (Optional) The maximum number of rows to add to a branch at a time, defaults to 1000.
+    #
+    def __init__(self, fetch_size = 1000):
         QtGui.QStandardItemModel.__init__(self)
 
         self.dave_action_index = 0
-        self.dave_actions_cur = []   # The active list of DaveActionStandardItems
-        self.dave_actions_all = []   # The full list of DaveActionStandardItems
-        
-        # Lists for fast validation.
-        self.dave_actions_test = []  # A list of actions to validate
-        self.dave_actions_test_dict = dict() # A dictionary of test ids and lists of actions that have these
+        self.fetch_size = fetch_size
+
+        # Per action information, in order.
+        self.action_ids = None       # The validation ID of each action, these are found when needed.
+        self.action_items = {}       # Action index : DaveActionStandardItem for the items that have been created.
+        self.action_nodes = []       # The XML node of each action.
+        self.action_parents = []     # The XML node of the branch (or sequence) that contains each action.
+        self.action_resources = None # The resources of each action, these are found when needed.
+        self.disk_usage = []
+        self.duration = []
+        self.valid = []
+
+        # Per branch information, keyed by the XML node of the branch.
+        self.branch_ends = {}        # The index after the last action in the branch.
+        self.branch_fetched = {}     # [number of rows added, index of the next action] for branches with an item.
+        self.branch_items = {}       # The QStandardItem for branches that have been created.
+        self.branch_parents = {}     # The XML node of the parent branch.
+        self.root_node = None
+
+    ## canFetchMore
+    #
+    # @param index A QModelIndex.
+    #
+    # @return True/False if there are more rows to add to this branch.
+    #
+    def canFetchMore(self, index):
+        node = self.nodeFromIndex(index)
+        if node is not None:
+            return (self.branch_fetched[node][0] < len(node))
+        return False
+
+    ## describeActions
+    #
+    # Find the ID and the resources of each action. This creates each of the
+    # DaveActions (without an item) so it is only done when necessary.
+    #
+    def describeActions(self):
+        if self.action_ids is not None:
+            return
+        self.action_ids = []
+        self.action_resources = []
+        resource_sets = {}
+        for node in self.action_nodes:
+            dave_action = getattr(daveActions, node.tag)()
+            dave_action.setup(node)
+            self.action_ids.append(dave_action.getID())
+            resources = dave_action.getResources()
+            if resources is not None:
+                resources = resource_sets.setdefault(frozenset(resources), frozenset(resources))
+            self.action_resources.append(resources)
+
+    ## fetchBranch
+    #
+    # Add the next rows to the item of a branch.
+    #
+    # @param node The XML node of the branch.
+    #
+    def fetchBranch(self, node):
+        [n_rows, action_index] = self.branch_fetched[node]
+        rows = []
+        for child in node[n_rows:n_rows + self.fetch_size]:
+            if (child.tag == "branch"):
+                branch_item = DaveBranchStandardItem(child)
+                self.branch_items[child] = branch_item
+                self.branch_fetched[child] = [0, action_index]
+                action_index = self.branch_ends[child]
+                rows.append(branch_item)
+            else:
+                action_item = DaveActionStandardItem(child, self, action_index)
+                self.action_items[action_index] = action_item
+                action_index += 1
+                rows.append(action_item)
+        self.branch_fetched[node] = [n_rows + len(rows), action_index]
+        self.branch_items[node].appendRows(rows)
+
+    ## fetchMore
+    #
+    # Called by the view when a branch is expanded or scrolled to the end.
+    #
+    # @param index A QModelIndex.
+    #
+    def fetchMore(self, index):
+        node = self.nodeFromIndex(index)
+        if node is not None:
+            self.fetchBranch(node)
 
-        self.test_mode = False
-
-    ## addItem
-    #
-    # @param dave_action_si A DaveActionStandardItem.
-    #
-    def addItem(self, dave_action_si):
-        self.dave_actions_all.append(dave_action_si)
-        self.dave_actions_cur.append(dave_action_si) # Build current actions simultaneously
-        
-        # Check if action requires validation
-        action_id = dave_action_si.getDaveAction().getID()
-        if action_id is not None:
-            # Check for existing id
-            is_present = False
-            for id_value in self.dave_actions_test_dict.keys():
-                if action_id == id_value:
-                    is_present = True
-
-            # Add to list if the id is not currently on the id list
-            if not is_present:
-                self.dave_actions_test.append(dave_action_si)
-                self.dave_actions_test_dict[action_id] = [dave_action_si] # Start list
-            else: # Add to current list of actions with the same id
-                self.dave_actions_test_dict[action_id].append(dave_action_si)
-        
     ## getActionTypes
     #
     # @return A list of DaveAction types (i.e. "hal" or "kilroy").
     #
     def getActionTypes(self):
         types = []
-        for item in self.dave_actions_cur:
-            type = item.getDaveAction().getActionType()
+        for tag in dict.fromkeys(map(lambda x: x.tag, self.action_nodes)):
+            type = getattr(daveActions, tag)().getActionType()
             if not type in types:
                 types.append(type)
         return types
 
+    ## getBranchItem
+    #
+    # @param node The XML node of a branch.
+    #
+    # @return The QStandardItem of the branch, this is created if necessary.
+    #
+    def getBranchItem(self, node):
+        if not node in self.branch_items:
+            parent = self.branch_parents[node]
+            self.getBranchItem(parent)
+            while not node in self.branch_items:
+                self.fetchBranch(parent)
+        return self.branch_items[node]
+
     ## getCurrentIndex
     #
     # @return The current item index.
@@ -404,7 +569,21 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
     # @return The current DaveActionStandardItem.
     #
     def getCurrentItem(self):
-        return self.dave_actions_cur[self.dave_action_index]
+        return self.getItem(self.dave_action_index)
+
+    ## getItem
+    #
+    # @param action_index The index of an action.
+    #
+    # @return The DaveActionStandardItem of the action, this is created if necessary.
+    #
+    def getItem(self, action_index):
+        if not action_index in self.action_items:
+            parent = self.action_parents[action_index]
+            self.getBranchItem(parent)
+            while not action_index in self.action_items:
+                self.fetchBranch(parent)
+        return self.action_items[action_index]
 
     ## getNextItem
     #
@@ -417,20 +596,20 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
 
         # If requested, skip over invalid commands.
         if skip_invalid:
-            while (self.dave_action_index < len(self.dave_actions_cur)) and (not self.dave_actions_cur[self.dave_action_index].isValid()):
+            while (self.dave_action_index < len(self.valid)) and (not self.valid[self.dave_action_index]):
                 self.dave_action_index += 1
 
-        if (self.dave_action_index >= len(self.dave_actions_cur)):
+        if (self.dave_action_index >= len(self.valid)):
             return None
         else:
-            return self.dave_actions_cur[self.dave_action_index]
+            return self.getItem(self.dave_action_index)
 
     ## getNumberItems
     #
     # @return Then number of items in the model.
     #
     def getNumberItems(self):
-        return len(self.dave_actions_cur)
+        return len(self.action_nodes)
 
     ## getRemainingTime
     #
@@ -440,12 +619,9 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
     #
     def getRemainingTime(self, start = 0):
         est_time = 0
-        i = start
-        while (i < len(self.dave_actions_cur)):
-            item = self.dave_actions_cur[i]
-            if item.isValid():
-                est_time += item.getDaveAction().getDuration()
-            i += 1
+        for i in range(start, len(self.valid)):
+            if self.valid[i]:
+                est_time += self.duration[i]
         return est_time
 
     ## getRunSize
@@ -454,17 +630,79 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
     #
     def getRunSize(self):
         est_space = 0
-        for item in self.dave_actions_cur:
-            if item.isValid():
-                est_space += item.getDaveAction().getUsage()
+        for i in range(len(self.valid)):
+            if self.valid[i]:
+                est_space += self.disk_usage[i]
         return est_space
 
+    ## getScheduleEntries
+    #
+    # @param predict (Optional) A function of (action type, action ID, duration) that returns the predicted duration.
+    #
+    # @return A list of [action index, resources, duration] for each valid action.
+    #
+    def getScheduleEntries(self, predict = None):
+        self.describeActions()
+        entries = []
+        for i in range(len(self.valid)):
+            if self.valid[i]:
+                duration = self.duration[i]
+                if predict is not None:
+                    duration = predict(self.action_nodes[i].tag, self.action_ids[i], duration)
+                entries.append([i, self.action_resources[i], duration])
+        return entries
+
+    ## getUpcomingItems
+    #
+    # @param number The maximum number of items to return.
+    #
+    # @return A list of the (valid) DaveActionStandardItems after the current item.
+    #
+    def getUpcomingItems(self, number):
+        items = []
+        i = self.dave_action_index + 1
+        while (i < len(self.valid)) and (len(items) < number):
+            if self.valid[i]:
+                items.append(self.getItem(i))
+            i += 1
+        return items
+
+    ## getValidationGroups
+    #
+    # For fast validation, actions with the same id only need to be validated once.
+    #
+    # @return A list of [action ID, action indices] in the order that the IDs first appear.
+    #
+    def getValidationGroups(self):
+        self.describeActions()
+        groups = {}
+        for i in range(len(self.action_ids)):
+            action_id = self.action_ids[i]
+            if action_id is not None:
+                if not action_id in groups:
+                    groups[action_id] = [i]
+                else:
+                    groups[action_id].append(i)
+        return list(map(list, groups.items()))
+
+    ## hasChildren
+    #
+    # @param index (Optional) A QModelIndex, defaults to the root.
+    #
+    # @return True/False if the item has children, including those that have not been added yet.
+    #
+    def hasChildren(self, index = QtCore.QModelIndex()):
+        node = self.nodeFromIndex(index)
+        if node is not None:
+            return (len(node) > 0)
+        return QtGui.QStandardItemModel.hasChildren(self, index)
+
     ## haveNextItem
     #
     # @return True/False if there is a next item available.
     #
     def haveNextItem(self):
-        if ((self.dave_action_index + 1) >= len(self.dave_actions_cur)):
+        if ((self.dave_action_index + 1) >= len(self.valid)):
             return False
         else:
             return True
@@ -474,11 +712,21 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
     # @return True/False if all the items are valid.
     #
     def isAllValid(self):
-        all_valid = True
-        for item in self.dave_actions_cur:
-            if not item.isValid():
-                all_valid = False
-        return all_valid
+        return all(self.valid)
+
+    ## nodeFromIndex
+    #
+    # @param index A QModelIndex.
+    #
+    # @return The XML node of the branch (or sequence) at index, None if index is an action.
+    #
+    def nodeFromIndex(self, index):
+        if not index.isValid():
+            return self.root_node
+        item = self.itemFromIndex(index)
+        if isinstance(item, DaveBranchStandardItem):
+            return item.getNode()
+        return None
 
     ## resetItemIndex
     #
@@ -492,74 +740,80 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
     # @param valid True/False Sets the valid status of all the items.
     #
     def setAllValid(self, valid):
-        for item in self.dave_actions_all:
-            item.setValid(valid)
+        self.valid = [valid] * len(self.action_nodes)
+        for item in self.action_items.values():
+            item.updateBackground()
 
     ## setCurrentItem
     #
     # @param an_item The desired DaveActionStandardItem.
     #
     def setCurrentAction(self, an_item):
-        self.dave_action_index = 0
-        for i in range(len(self.dave_actions_cur)):
-            if (self.dave_actions_cur[i] == an_item):
-                self.dave_action_index = i
-                break
-        else:
-            print("item not found!")
+        self.dave_action_index = an_item.getActionIndex()
 
     ## setCurrentItemValid
     #
     # @param is_Valid True/False determines the validity of the currentItem(s)
     #
     def setCurrentItemValid(self, is_valid):
-        if self.test_mode:
-            # Find current id
-            current_item = self.dave_actions_cur[self.dave_action_index]
-            current_action = current_item.getDaveAction()
-            current_id = current_action.getID()
-
-            print(current_id, is_valid)
-            
-            # Change validity of all actions that have this id
-            for item in self.dave_actions_test_dict[current_id]:
-                item.setValid(is_valid)
-                
-        else: # Not used
-            item = self.dave_actions_cur[self.dave_action_index]
-            item.setValid(is_valid)
-                    
-    ## setTestMode
-    #
-    # @param test_mode True/False sets the test mode.
-    #
-    def setTestMode(self, test_mode):
-        if self.test_mode:
-            if not test_mode: # Toggle off test mode
-                self.test_mode = False
-                self.dave_actions_cur = self.dave_actions_all # Recover full list
-                self.resetItemIndex()
-        else:
-            if test_mode:
-                self.test_mode = True
-                self.dave_actions_cur = self.dave_actions_test # Set to test list
-                self.resetItemIndex()
-
-    ## updateEstimates
-    #
-    def updateEstimates(self):
-        if self.test_mode: # Only needed in test mode
-
-            # Find current id and the current disk usage and duration.
-            current_item = self.dave_actions_cur[self.dave_action_index]
-            current_action = current_item.getDaveAction()
-            current_id = current_action.getID()
-            disk_usage = current_action.getUsage()
-            duration = current_action.getDuration()
-            
-            # Update usage estimated for all actions that have this id.
-            for item in self.dave_actions_test_dict[current_id]:
-                item.setUsageEstimates(disk_usage, duration)
+        self.setValid(self.dave_action_index, is_valid)
+
+    ## setSequence
+    #
+    # Set the sequence, only the top level of the sequence is added to the model.
+    #
+    # @param xml The XML node of the sequence.
+    #
+    def setSequence(self, xml):
+
+        def parse(xml_branch):
+            for node in xml_branch:
+
+                # Everything is either a branch.
+                if (node.tag == "branch"):
+                    self.branch_parents[node] = xml_branch
+                    parse(node)
+                    self.branch_ends[node] = len(self.action_nodes)
+
+                # Or a leaf (DaveAction), this is created when it is needed.
+                else:
+                    getattr(daveActions, node.tag)
+                    self.action_nodes.append(node)
+                    self.action_parents.append(xml_branch)
+
+        parse(xml)
+        self.disk_usage = [0] * len(self.action_nodes)
+        self.duration = [0] * len(self.action_nodes)
+        self.valid = [True] * len(self.action_nodes)
+
+        self.root_node = xml
+        self.branch_fetched[xml] = [0, 0]
+        self.branch_items[xml] = self.invisibleRootItem()
+        self.fetchBranch(xml)
+
+    ## setUsageEstimates
+    #
+    # @param action_index The index of an action.
+    # @param disk_usage The estimated disk_usage for the action.
+    # @param duration The estimated duration of the action.
+    #
+    def setUsageEstimates(self, action_index, disk_usage, duration):
+        self.disk_usage[action_index] = disk_usage
+        self.duration[action_index] = duration
+        if action_index in self.action_items:
+            dave_action = self.action_items[action_index].getDaveAction()
+            dave_action.setDiskUsage(disk_usage)
+            dave_action.setDuration(duration)
+
+    ## setValid
+    #
+    # @param action_index The index of an action.
+    # @param valid True/False if the action is valid.
+    #
+    def setValid(self, action_index, valid):
+        self.valid[action_index] = valid
+        if action_index in self.action_items:
+            self.action_items[action_index].updateBackground()
 
 ## parseSequenceFile
 #
@@ -569,34 +823,9 @@ class DaveStandardItemModel(QtGui.QStandardItemModel):
 #
 def parseSequenceFile(xml_file):
     model = DaveStandardItemModel()
-    xml = ElementTree.parse(xml_file).getroot()
-    recursiveParse(model, model, xml)
+    model.setSequence(ElementTree.parse(xml_file).getroot())
     return model
 
-## recursiveParse
-#
-# Recursively parse the XML tree.
-#
-# @param model The root DaveStandardItemModel.
-# @param model_branch_model A branch of a DaveStandardItemModel.
-# @param xml_branch The current xml branch
-# 
-def recursiveParse(model, model_branch, xml_branch):
-    for node in xml_branch:
-
-        # Everything is either a branch.
-        if (node.tag == "branch"):
-            parent = QtGui.QStandardItem(node.get("name", "NA"))
-            parent.setFlags(QtCore.Qt.ItemIsEnabled)
-            model_branch.appendRow(parent)
-            recursiveParse(model, parent, node)
-
-        # Or a leaf (DaveAction).
-        else:
-            action = DaveActionStandardItem(node)
-            model.addItem(action)
-            model_branch.appendRow(action)
-
 #
 # The MIT License
 #
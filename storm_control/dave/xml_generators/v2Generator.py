@@ -18,7 +18,7 @@ import os
 import sys
 import traceback
 from xml.etree import ElementTree
-from xml.dom import minidom
+from xml.sax import saxutils
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
@@ -26,9 +26,38 @@ import storm_control.dave.xml_generators.nodeToDict as nodeToDict
 
 import storm_control.dave.daveActions as daveActions
 
+## writeNode
+#
+# Write a (small) element tree in the same format as minidom's toprettyxml().
+#
+# @param fp The file to write to.
+# @param node The element tree node.
+# @param depth The indentation depth of the node.
+#
+def writeNode(fp, node, depth):
+    indent = "  " * depth
+    tag = node.tag
+    for [name, value] in node.attrib.items():
+        tag += " " + name + "=" + saxutils.quoteattr(value)
+
+    if (len(node) > 0):
+        fp.write(indent + "<" + tag + ">\n")
+        for child in node:
+            writeNode(fp, child, depth + 1)
+        fp.write(indent + "</" + node.tag + ">\n")
+    elif node.text:
+        fp.write(indent + "<" + tag + ">" + saxutils.escape(node.text) + "</" + node.tag + ">\n")
+    else:
+        fp.write(indent + "<" + tag + "/>\n")
+
+
 ## XMLRecipeParser
 # 
-# A class for parsing the version 2 dave files and generating dave primitive sequences
+# A class for parsing the version 2 dave files and generating dave primitive sequences.
+#
+# The loops are expanded one iteration at a time and the dave primitives are
+# written as they are created, so the memory use does not depend on the number
+# of movies in the experiment.
 #
 class XMLRecipeParser(QtWidgets.QWidget):
 
@@ -63,11 +92,7 @@ class XMLRecipeParser(QtWidgets.QWidget):
         self.loop_variable_names = []
         self.loop_iterator = []
 
-        self.flat_sequence = []
-        self.flat_sequence_xml = []
         self.xml_sequence_file_path = output_filename
-        
-        self.da_primitives_xml = []
 
         # A convenient list of dave actions required for parsing a <movie> tag
         self.movie_da_actions = [daveActions.DAMoveStage(),
@@ -82,54 +107,89 @@ class XMLRecipeParser(QtWidgets.QWidget):
                                  daveActions.DAPause(),
                                  daveActions.DATakeMovie()]
 
-    ## convertToDaveXMLPrimitives
+    ## copyChildren
+    #
+    # Handles copying children of the specified parent to the new_parent specifically handling <loop> and <variable_entry> tags
+    #
+    # @param parent The element tree to be copied
+    # @param new_parent The element tree that will contain the flat sequence
+    #       
+    def copyChildren(self, parent, new_parent):
+        for child in parent:
+            if child.tag == "loop":
+                self.handleLoop(child, new_parent)
+            elif child.tag == "variable_entry":
+                self.handleVariableEntry(child, new_parent)
+            elif child.attrib.get("increment") == "Yes":
+                new_child = ElementTree.SubElement(new_parent, child.tag, child.attrib)
+                if child.text == None: new_child.text = ""
+                else:
+                    new_child.text = str(child.text)
+                    for [loop_ID, loop_iterator] in enumerate(self.loop_iterator):
+                        pad_length = len(str(len(self.loop_variables[loop_ID])))
+                        if loop_iterator >= 0:
+                            new_child.text += "_" + str(loop_iterator).zfill(pad_length)
+                
+                if child.tail == None: new_child.tail = ""
+                else: new_child.tail = str(child.tail)
+                del new_child.attrib["increment"]
+                self.copyChildren(child, new_child)
+            else:
+                new_child = ElementTree.SubElement(new_parent, child.tag, child.attrib)
+                if child.text == None: new_child.text = ""
+                else: new_child.text = str(child.text)
+                if child.tail == None: new_child.tail = ""
+                else: new_child.tail = str(child.tail)
+                self.copyChildren(child, new_child)
+
+        return new_parent
+
+    ## convertToDavePrimitives
     #
-    # @param primitives_xml The element tree that will contain dave primitives
-    # @param flat_sequence The element tree that contains a flat sequence of higher order commands, e.g. <movie>
+    # @param flat_sequence A generator of flat sequence events from iterFlatSequence().
     #
-    def convertToDaveXMLPrimitives(self, primitives_xml, flat_sequence):
+    # @return A generator of ["start", branch name], ["end", None] and ["node", dave primitive node].
+    #
+    def convertToDavePrimitives(self, flat_sequence):
         if self.verbose:
             print("---------------------------------------------------------")
             print("Converting to Dave Primitives")
-        
-        # Loop over all children
-        for child in flat_sequence:
-            if child.tag == "branch": # Generate block and call recursively to handle elements in blocks
-                branch = ElementTree.SubElement(primitives_xml, "branch")
-                branch.attrib["name"] = child.attrib["name"]
-                self.convertToDaveXMLPrimitives(branch, child)
+
+        for [event, child] in flat_sequence:
+            if not (event == "node"): # Branch start or end.
+                yield [event, child]
             
             elif child.tag == "movie": # Handle <movie> tag
-                movie_block = ElementTree.SubElement(primitives_xml, "branch")
                 name = child.find("name")
 
                 # Determine name.
                 if name is not None:
-                    movie_block.set("name", name.text)
+                    yield ["start", name.text]
                 else:
-                    movie_block.set("name", "No Name Provided")
+                    yield ["start", "No Name Provided"]
 
                 # Determine dictionary
                 movie_dict = nodeToDict.movieNodeToDict(child)
                 for action in self.movie_da_actions:
                     new_node = action.createETree(movie_dict)
                     if new_node is not None:
-                        movie_block.append(new_node)
+                        yield ["node", new_node]
+                yield ["end", None]
             
             elif child.tag == "valve_protocol": # Handle <valve_protocol> tag
                 new_node = daveActions.DAValveProtocol().createETree({"name": child.text})
                 if new_node is not None:
-                    primitives_xml.append(new_node)
+                    yield ["node", new_node]
 
             elif child.tag == "change_directory": # Handle change_directory tag
                 new_node = daveActions.DASetDirectory().createETree({"directory": child.text})
                 if new_node is not None:
-                    primitives_xml.append(new_node)
+                    yield ["node", new_node]
 
             elif child.tag == "clear_warnings": # Handle the clear_warnings tag
                 new_node = daveActions.DAClearWarnings().createETree({})
                 if new_node is not None:
-                    primitives_xml.append(new_node)
+                    yield ["node", new_node]
 
             elif child.tag == "email": # Handle the email tag
                 # Grab the elements of this node and create a dictionary
@@ -142,49 +202,12 @@ class XMLRecipeParser(QtWidgets.QWidget):
                 new_node = daveActions.DAEmail().createETree(dictionary)
                 
                 if new_node is not None:
-                    primitives_xml.append(new_node)
+                    yield ["node", new_node]
                     
             else:
                 pass
                 ## Eventually display an unknown tag error. For now ignore
 
-    ## copyChildren
-    #
-    # Handles copying children of the specified parent to the new_parent specifically handling <loop> and <variable_entry> tags
-    #
-    # @param parent The element tree to be copied
-    # @param new_parent The element tree that will contain the flat sequence
-    #       
-    def copyChildren(self, parent, new_parent):
-        for child in parent:
-            if child.tag == "loop":
-                self.handleLoop(child, new_parent)
-            elif child.tag == "variable_entry":
-                self.handleVariableEntry(child, new_parent)
-            elif child.attrib.get("increment") == "Yes":
-                new_child = ElementTree.SubElement(new_parent, child.tag, child.attrib)
-                if child.text == None: new_child.text = ""
-                else:
-                    new_child.text = str(child.text)
-                    for [loop_ID, loop_iterator] in enumerate(self.loop_iterator):
-                        pad_length = len(str(len(self.loop_variables[loop_ID])))
-                        if loop_iterator >= 0:
-                            new_child.text += "_" + str(loop_iterator).zfill(pad_length)
-                
-                if child.tail == None: new_child.tail = ""
-                else: new_child.tail = str(child.tail)
-                del new_child.attrib["increment"]
-                self.copyChildren(child, new_child)
-            else:
-                new_child = ElementTree.SubElement(new_parent, child.tag, child.attrib)
-                if child.text == None: new_child.text = ""
-                else: new_child.text = str(child.text)
-                if child.tail == None: new_child.tail = ""
-                else: new_child.tail = str(child.tail)
-                self.copyChildren(child, new_child)
-
-        return new_parent
-
     ## handleLoop
     #
     # Handles iteration of loop variables and naming of branches corresponding to loops
@@ -222,6 +245,41 @@ class XMLRecipeParser(QtWidgets.QWidget):
         
         self.copyChildren(variable_entry, new_parent)
         
+    ## iterFlatSequence
+    #
+    # Expand the loops one iteration at a time. This is the streaming equivalent
+    # of copyChildren(), only the top level commands (i.e. <movie>) are copied.
+    #
+    # @param parent The element tree to expand.
+    #
+    # @return A generator of ["start", branch name], ["end", None] and ["node", flat sequence node].
+    #
+    def iterFlatSequence(self, parent):
+        for child in parent:
+            if child.tag == "loop":
+                loop_name = child.attrib["name"]
+                loop_ID = self.loop_variable_names.index(loop_name)
+                yield ["start", loop_name]
+                for local_iterator in range(len(self.loop_variables[loop_ID])):
+                    self.loop_iterator[loop_ID] = local_iterator # Store iterator for updating names
+                    yield from self.iterFlatSequence(child)
+                self.loop_iterator[loop_ID] = -1
+                yield ["end", None]
+                
+            elif child.tag == "variable_entry":
+                loop_ID = self.loop_variable_names.index(child.attrib["name"])
+                yield from self.iterFlatSequence(self.loop_variables[loop_ID][self.loop_iterator[loop_ID]])
+
+            elif child.tag == "branch":
+                yield ["start", child.attrib["name"]]
+                yield from self.iterFlatSequence(child)
+                yield ["end", None]
+                
+            else:
+                new_parent = self.copyChildren([child], ElementTree.Element("sequence"))
+                for new_child in new_parent:
+                    yield ["node", new_child]
+
     ## loadXML
     #
     # Load generic XML files
@@ -366,21 +424,13 @@ class XMLRecipeParser(QtWidgets.QWidget):
         for command_sequence in self.command_sequences:
             command_sequence = self.replaceItems(command_sequence)
 
-        # Create flat command sequence and convert to new xml element tree
-        self.flat_sequence = ElementTree.Element("sequence")
-        self.flat_sequence.text = "\n" # Clean up display
-
-        # Fill sequence from command sequence elements
-        for command_sequence in self.command_sequences:
-            self.copyChildren(command_sequence, self.flat_sequence)
-
-        # Create Dave action primitives
-        self.da_primitives_xml = ElementTree.Element("sequence")
-        self.da_primitives_xml.text = "\n"
-        self.convertToDaveXMLPrimitives(self.da_primitives_xml, self.flat_sequence)
+        # Create flat command sequence from the command sequence elements.
+        def flatSequence():
+            for command_sequence in self.command_sequences:
+                yield from self.iterFlatSequence(command_sequence)
 
-        # Save dave primitives
-        self.saveDavePrimitives()
+        # Create and save the Dave action primitives.
+        self.saveDavePrimitives(self.convertToDavePrimitives(flatSequence()))
 
     ## parseXMLExperiment
     #
@@ -430,18 +480,29 @@ class XMLRecipeParser(QtWidgets.QWidget):
     #
     # Save the final dave primitives sequence.
     #
-    def saveDavePrimitives(self):
+    # @param primitives A generator of dave primitive events from convertToDavePrimitives().
+    #
+    def saveDavePrimitives(self, primitives):
         if self.xml_sequence_file_path == "":
             self.xml_sequence_file_path = QtWidgets.QFileDialog.getSaveFileName(self,
                                                                                 "Save XML Sequence",
                                                                                 self.directory,
                                                                                 "*.xml")[0]
         try:
-            out_fp = open(self.xml_sequence_file_path, "w")
-            rough_string = ElementTree.tostring(self.da_primitives_xml, 'utf-8')        
-            reparsed = minidom.parseString(rough_string)
-            out_fp.write(reparsed.toprettyxml(indent="  ", encoding = "ISO-8859-1").decode())
-            out_fp.close()
+            with open(self.xml_sequence_file_path, "w", encoding = "ISO-8859-1", errors = "xmlcharrefreplace") as out_fp:
+                out_fp.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n')
+                out_fp.write("<sequence>\n")
+                depth = 1
+                for [event, value] in primitives:
+                    if (event == "start"):
+                        out_fp.write("  " * depth + "<branch name=" + saxutils.quoteattr(value) + ">\n")
+                        depth += 1
+                    elif (event == "end"):
+                        depth -= 1
+                        out_fp.write("  " * depth + "</branch>\n")
+                    else:
+                        writeNode(out_fp, value, depth)
+                out_fp.write("</sequence>\n")
             self.wrote_XML = True
         except:
             QtWidgets.QMessageBox.information(self,
@@ -371,10 +371,12 @@ class Film(halModule.HalModule):
         # Sent when filming is not possible/possible. While this is true we'll
         # throw an error if another modules attempts to start/stop a film
         # or a camera. This is also the marker for the beginning / end of the
-        # the film cycle.
+        # the film cycle. At the end of a saved film this also includes the
+        # parameters that were saved with the film.
         halMessage.addMessage("film lockout",
                               validator = {"data" : {"locked out" : [True, bool],
-                                                     "acquisition parameters" : [False, params.StormXMLObject]},
+                                                     "acquisition parameters" : [False, params.StormXMLObject],
+                                                     "film parameters" : [False, params.StormXMLObject]},
                                            "resp" : None})
         
         # In live mode the camera also runs between films.
@@ -473,6 +475,7 @@ class Film(halModule.HalModule):
             self.film_state = "idle"
             acq_p = None
             notes = ""
+            to_save = None
             film_settings = message.getData()["film settings"]
             number_frames = message.getData()["number frames"]
             if film_settings.isSaved():
@@ -508,7 +511,7 @@ class Film(halModule.HalModule):
                     self.logfile_fp.flush()
 
             # Now that everything is complete end the filming lock out.
-            self.setLockout(False, acquisition_parameters = acq_p)
+            self.setLockout(False, acquisition_parameters = acq_p, film_parameters = to_save)
 
     def handleStopCamera(self):
         if (self.film_state == "start"):
@@ -630,15 +633,15 @@ class Film(halModule.HalModule):
             if self.module_name in message.getData()["module names"]:
                 self.wait_for.append(message.getSourceName())
 
-    def setLockout(self, state, acquisition_parameters = None):
+    def setLockout(self, state, acquisition_parameters = None, film_parameters = None):
         self.locked_out = state
+        data = {"locked out" : self.locked_out}
         if acquisition_parameters is not None:
-            self.sendMessage(halMessage.HalMessage(m_type = "film lockout",
-                                                   data = {"locked out" : self.locked_out,
-                                                           "acquisition parameters" : acquisition_parameters}))
-        else:
-            self.sendMessage(halMessage.HalMessage(m_type = "film lockout",
-                                                   data = {"locked out" : self.locked_out}))
+            data["acquisition parameters"] = acquisition_parameters
+        if film_parameters is not None:
+            data["film parameters"] = film_parameters
+        self.sendMessage(halMessage.HalMessage(m_type = "film lockout",
+                                               data = data))
             
     def startCameras(self):
         
@@ -7,10 +7,14 @@ Hazen 04/17
 """
 
 from PyQt5 import QtCore
-import tifffile
+
+import storm_control.sc_library.lazyImport as lazyImport
 
 import storm_control.hal4000.halLib.halMessage as halMessage
 
+# This is only needed if we are saving the QPD images.
+tifffile = lazyImport.lazyImport("tifffile")
+
 
 class LockControl(QtCore.QObject):
     controlMessage = QtCore.pyqtSignal(object)
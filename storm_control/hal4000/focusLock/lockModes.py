@@ -7,18 +7,21 @@ Hazen 05/15
 """
 import math
 import numpy
-import scipy.optimize
-import tifffile
 import time
 
 from PyQt5 import QtCore
 
 import storm_control.sc_library.halExceptions as halExceptions
+import storm_control.sc_library.lazyImport as lazyImport
 import storm_control.sc_library.parameters as params
 
 # Focus quality determination for the optimal lock.
 import storm_control.hal4000.focusLock.focusQuality as focusQuality
 
+# These are only needed by some of the lock modes.
+scipy = lazyImport.lazyImport("scipy.optimize")
+tifffile = lazyImport.lazyImport("tifffile")
+
 
 class LockModeException(halExceptions.HalException):
     pass
@@ -958,6 +961,7 @@ class HardwareZScanLockMode(AlwaysOnLockMode):
         kwds["parameters"] = parameters    
         super().__init__(**kwds)
         self.hzs_film_off = False
+        self.hzs_frames_per_step = 1
         self.hzs_pname = "hardware_z_scan"
         self.hzs_zvals = None
         self.name = "Hardware Z Scan"
@@ -968,6 +972,11 @@ class HardwareZScanLockMode(AlwaysOnLockMode):
         # FIXME: Should be a parameter custom? Both focuslock and illumination
         #        waveforms should be parsed / created / generated by a single
         #        module somewhere else?
+        p.add(params.ParameterRangeInt(description = "Frames at each z step.",
+                                       name = "frames_per_step",
+                                       value = 1,
+                                       min_value = 1,
+                                       max_value = 1000))
         p.add(params.ParameterString(description = "Frame z steps (in microns).",
                                      name = "z_offsets",
                                      value = ""))
@@ -979,8 +988,8 @@ class HardwareZScanLockMode(AlwaysOnLockMode):
         or None if there is no waveform or one shouldn't be used.
         """
         if self.amLocked() and isinstance(self.hzs_zvals, numpy.ndarray):
-            waveform = self.hzs_zvals + LockMode.z_stage_functionality.getCurrentPosition()
-            return LockMode.z_stage_functionality.getDaqWaveform(waveform)
+            return LockMode.z_stage_functionality.getZScanWaveform(self.hzs_zvals,
+                                                                   frames_per_step = self.hzs_frames_per_step)
 
     def setZStageFunctionality(self, z_stage_functionality):
         super().setZStageFunctionality(z_stage_functionality)
@@ -991,6 +1000,7 @@ class HardwareZScanLockMode(AlwaysOnLockMode):
         if hasattr(super(), "newParameters"):
             super().newParameters(parameters)
         p = parameters.get(self.hzs_pname)
+        self.hzs_frames_per_step = p.get("frames_per_step")
         self.hzs_zvals = None
         if (len(p.get("z_offsets")) > 0):
             self.hzs_zvals = numpy.array(list(map(float, p.get("z_offsets").split(","))))
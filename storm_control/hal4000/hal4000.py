@@ -19,6 +19,7 @@ Hazen 01/17
 """
 
 from collections import deque
+import concurrent.futures
 import faulthandler
 import importlib
 import os
@@ -366,6 +367,65 @@ class DetachedView(HalView):
 
     def stopFilm(self):
         self.ui.recordButton.stopFilm()
+
+
+#
+# Hardware initialization.
+#
+def initializeHardware(module_classes, module_params, max_workers = 8):
+    """
+    Call the initializeHardware() method of the modules that have one using
+    a pool of threads. This is where hardware modules do the slow parts of
+    their start up, so that HAL does not have to wait for each device in turn.
+
+    Modules can use the (optional) 'dependencies' parameter to list (comma
+    separated) the modules whose hardware needs to be initialized first, for
+    example when they share a controller.
+
+    module_classes and module_params are dictionaries keyed by module name.
+
+    Returns a dictionary of [hardware, initialization time] keyed by module name.
+    """
+    def getDependencies(module_name):
+        dependencies = module_params[module_name].get("dependencies", "")
+        return list(filter(lambda x: (len(x) > 0), map(lambda x: x.strip(), dependencies.split(","))))
+
+    # Order the modules so that each module comes after its dependencies.
+    ordered = []
+    def addModule(module_name, visiting):
+        if module_name in ordered:
+            return
+        if module_name in visiting:
+            raise halExceptions.HalException("Circular dependency for module '" + module_name + "'.")
+        for dependency in getDependencies(module_name):
+            if not dependency in module_classes:
+                raise halExceptions.HalException("Module '" + module_name + "' depends on unknown module '" + dependency + "'.")
+            addModule(dependency, visiting + [module_name])
+        ordered.append(module_name)
+        
+    for module_name in sorted(module_classes):
+        addModule(module_name, [])
+
+    def task(module_name, dependencies):
+        for dependency in dependencies:
+            dependency.result()
+        start_time = time.time()
+        hardware = None
+        if hasattr(module_classes[module_name], "initializeHardware"):
+            hardware = module_classes[module_name].initializeHardware(module_params[module_name])
+        return [hardware, time.time() - start_time]
+
+    #
+    # The tasks are started in order, so the dependencies of a task will
+    # always have been started before it starts to wait for them.
+    #
+    futures = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers = max_workers) as executor:
+        for module_name in ordered:
+            dependencies = list(map(lambda x: futures[x], getDependencies(module_name)))
+            futures[module_name] = executor.submit(task, module_name, dependencies)
+
+    return dict(map(lambda x: [x, futures[x].result()], futures))
         
 
 #
@@ -378,6 +438,7 @@ class HalCore(QtCore.QObject):
     """
     def __init__(self, config = None,
                  parameters_file_name = None,
+                 profile_startup = False,
                  testing_mode = False,
                  show_gui = True,
                  **kwds):
@@ -429,10 +490,18 @@ class HalCore(QtCore.QObject):
         # Need to load HAL's main window first so that other GUI windows will
         # have the correct Qt parent.
         #
+        # Hardware modules do the slow part of their initialization in parallel
+        # (and in other threads), then all the modules are created in order
+        # in this thread as they will create Qt objects.
+        #
         module_names = sorted(config.get("modules").getAttrs())
-        module_names.insert(0, module_names.pop(module_names.index("hal")))        
+        module_names.insert(0, module_names.pop(module_names.index("hal")))
+        import_times = {}
+        module_classes = {}
+        modules_params = {}
+        start_time = time.time()
         for module_name in module_names:
-            print("  " + module_name)
+            import_start_time = time.time()
 
             # Get module specific parameters.
             module_params = config.get("modules").get(module_name)
@@ -445,10 +514,29 @@ class HalCore(QtCore.QObject):
 
             # Load the module.
             a_module = importlib.import_module(module_params.get("module_name"))
-            a_class = getattr(a_module, module_params.get("class_name"))
-            a_object = a_class(module_name = module_name,
-                               module_params = module_params,
-                               qt_settings = self.qt_settings)
+            module_classes[module_name] = getattr(a_module, module_params.get("class_name"))
+            modules_params[module_name] = module_params
+
+            # Note that the time to import a Python module that is shared between
+            # several HAL modules is included in the first HAL module that uses it.
+            import_times[module_name] = time.time() - import_start_time
+
+        hardware = initializeHardware(module_classes, modules_params)
+
+        create_times = {}
+        for module_name in module_names:
+            print("  " + module_name)
+            module_start_time = time.time()
+
+            a_class = module_classes[module_name]
+            kwds = {"module_name" : module_name,
+                    "module_params" : modules_params[module_name],
+                    "qt_settings" : self.qt_settings}
+            if hasattr(a_class, "initializeHardware"):
+                kwds["hardware"] = hardware[module_name][0]
+            a_object = a_class(**kwds)
+
+            create_times[module_name] = time.time() - module_start_time
 
             # If this is HAL's main window set the HalDialog qt_parent class
             # attribute so that any GUI QDialogs will have the correct Qt parent.
@@ -462,6 +550,27 @@ class HalCore(QtCore.QObject):
                 all_modules[module_name] = True
 
         print("")
+        init_times = {}
+        for module_name in module_names:
+            init_times[module_name] = hardware[module_name][1] + create_times[module_name]
+            if profile_startup:
+                init_times[module_name] += import_times[module_name]
+        
+        if profile_startup:
+            print("Module start up times (seconds)")
+            print("  {0:20s} {1:>8s} {2:>8s} {3:>8s} {4:>8s}".format("", "import", "hardware", "create", "total"))
+            for module_name in sorted(init_times, key = lambda x: init_times[x], reverse = True):
+                print("  {0:20s} {1:8.3f} {2:8.3f} {3:8.3f} {4:8.3f}".format(module_name,
+                                                                        import_times[module_name],
+                                                                        hardware[module_name][1],
+                                                                        create_times[module_name],
+                                                                        init_times[module_name]))
+        else:
+            print("Module initialization times (seconds)")
+            for module_name in sorted(init_times, key = lambda x: init_times[x], reverse = True):
+                print("  {0:s} {1:.3f}".format(module_name, init_times[module_name]))
+        print("Total {0:.3f}".format(time.time() - start_time))
+        print("")
 
         # Connect signals.
         for module in self.modules:
@@ -729,6 +838,8 @@ if (__name__ == "__main__"):
     parser.add_argument('config', type = str, help = "The name of the configuration file to use.")
     parser.add_argument('--xml', dest = 'default_xml', type = str, required = False, default = None,
                         help = "The name of a settings xml file to use as the default.")
+    parser.add_argument('--profile-startup', dest = 'profile_startup', action = 'store_true',
+                        help = "Report the import, hardware initialization and creation time of each module.")
 
     args = parser.parse_args()
     
@@ -753,7 +864,8 @@ if (__name__ == "__main__"):
     
     # Setup HAL and all of the modules.
     hal = HalCore(config = config,
-                  parameters_file_name = args.default_xml)
+                  parameters_file_name = args.default_xml,
+                  profile_startup = args.profile_startup)
 
     # Hide splash screen and start.
     splash.hide()
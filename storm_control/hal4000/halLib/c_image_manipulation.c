@@ -10,14 +10,18 @@
  *
  * Hazen 09/15
  *
+ * Split the work across multiple threads using OpenMP. If the library
+ * is compiled without OpenMP support the pragmas are ignored and the
+ * functions are single threaded as before.
+ *
  *
  * Compilation (windows):
  * gcc -c c_image_manipulation.c -O3
  * gcc -shared -o c_image_manipulation.dll c_image_manipulation.o
  *
  * Compilation (linux):
- * gcc -fPIC -g -c -Wall c_image_manipulation.c -O3
- * gcc -shared -Wl,-soname,c_image_manipulation.so.1 -o c_image_manipulation.so.1.0.1 c_image_manipulation.o -lc 
+ * gcc -fPIC -g -c -Wall -fopenmp c_image_manipulation.c -O3
+ * gcc -shared -fopenmp -Wl,-soname,c_image_manipulation.so.1 -o c_image_manipulation.so.1.0.1 c_image_manipulation.o -lc 
  * ln -s c_image_manipulation.so.1.0.1 c_image_manipulation.so
  *
  */
@@ -26,8 +30,20 @@
 #include <stdio.h>
 #include <stdint.h>
 
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+/*
+ * Images smaller than this are processed in a single thread as
+ * the overhead of starting the threads is more than the savings.
+ */
+#define MIN_PARALLEL_SIZE 65536
+
 /* function definitions */
 int compare(uint8_t*, uint8_t*, int);
+int getNumberOfThreads(void);
+void setNumberOfThreads(int);
 void rescaleImage000(uint8_t*, unsigned short *, int, int, int, int, int, double, int *, int *);
 void rescaleImage001(uint8_t*, unsigned short *, int, int, int, int, int, double, int *, int *);
 void rescaleImage010(uint8_t*, unsigned short *, int, int, int, int, int, double, int *, int *);
@@ -72,6 +88,35 @@ int compare(uint8_t* array1, uint8_t* array2, int n_values)
   return ndiff;
 }
 
+/* getNumberOfThreads
+ *
+ * @return The number of threads that will be used, 1 if the library
+ *         was compiled without OpenMP.
+ */
+int getNumberOfThreads(void)
+{
+#ifdef _OPENMP
+  return omp_get_max_threads();
+#else
+  return 1;
+#endif
+}
+
+/* setNumberOfThreads
+ *
+ * This does nothing if the library was compiled without OpenMP.
+ *
+ * @param n_threads The number of threads to use.
+ */
+void setNumberOfThreads(int n_threads)
+{
+#ifdef _OPENMP
+  if (n_threads > 0){
+    omp_set_num_threads(n_threads);
+  }
+#endif
+}
+
 /* rescaleImage000
  *
  * Converts to thresholded 8 bit for Qt.
@@ -98,12 +143,13 @@ void rescaleImage000(uint8_t *scaled_image, unsigned short *image, int image_wid
   image_size = image_width * image_height;
   cur_min = image[0];
   cur_max = image[0];
+  #pragma omp parallel for private(temp) reduction(min:cur_min) reduction(max:cur_max) if(image_size > MIN_PARALLEL_SIZE)
   for(i=0;i<image_size;i++){
 
     if(image[i]<cur_min){
       cur_min = image[i];
     }
-    else if(image[i]>cur_max){
+    if(image[i]>cur_max){
       cur_max = image[i];
     }
 
@@ -138,6 +184,7 @@ void rescaleImage001(uint8_t *scaled_image, unsigned short *image, int image_wid
 
   cur_min = image[0];
   cur_max = image[0];
+  #pragma omp parallel for private(ij,j,temp) reduction(min:cur_min) reduction(max:cur_max) if(image_width*image_height > MIN_PARALLEL_SIZE)
   for(i=0;i<image_width;i++){
     for(j=0;j<image_height;j++){
 
@@ -146,7 +193,7 @@ void rescaleImage001(uint8_t *scaled_image, unsigned short *image, int image_wid
       if(image[ij]<cur_min){
 	cur_min = image[ij];
       }
-      else if(image[ij]>cur_max){
+      if(image[ij]>cur_max){
 	cur_max = image[ij];
       }
       
@@ -182,6 +229,7 @@ void rescaleImage010(uint8_t *scaled_image, unsigned short *image, int image_wid
 
   cur_min = image[0];
   cur_max = image[0];
+  #pragma omp parallel for private(ij,j,temp) reduction(min:cur_min) reduction(max:cur_max) if(image_width*image_height > MIN_PARALLEL_SIZE)
   for(i=0;i<image_width;i++){
     for(j=0;j<image_height;j++){
 
@@ -190,7 +238,7 @@ void rescaleImage010(uint8_t *scaled_image, unsigned short *image, int image_wid
       if(image[ij]<cur_min){
 	cur_min = image[ij];
       }
-      else if(image[ij]>cur_max){
+      if(image[ij]>cur_max){
 	cur_max = image[ij];
       }
       
@@ -226,6 +274,7 @@ void rescaleImage011(uint8_t *scaled_image, unsigned short *image, int image_wid
 
   cur_min = image[0];
   cur_max = image[0];
+  #pragma omp parallel for private(ij,j,temp) reduction(min:cur_min) reduction(max:cur_max) if(image_width*image_height > MIN_PARALLEL_SIZE)
   for(i=0;i<image_width;i++){
     for(j=0;j<image_height;j++){
 
@@ -234,7 +283,7 @@ void rescaleImage011(uint8_t *scaled_image, unsigned short *image, int image_wid
       if(image[ij]<cur_min){
 	cur_min = image[ij];
       }
-      else if(image[ij]>cur_max){
+      if(image[ij]>cur_max){
 	cur_max = image[ij];
       }
       
@@ -270,6 +319,7 @@ void rescaleImage100(uint8_t *scaled_image, unsigned short *image, int image_wid
 
   cur_min = image[0];
   cur_max = image[0];
+  #pragma omp parallel for private(ij,j,temp) reduction(min:cur_min) reduction(max:cur_max) if(image_width*image_height > MIN_PARALLEL_SIZE)
   for(i=0;i<image_width;i++){
     for(j=0;j<image_height;j++){
 
@@ -278,7 +328,7 @@ void rescaleImage100(uint8_t *scaled_image, unsigned short *image, int image_wid
       if(image[ij]<cur_min){
 	cur_min = image[ij];
       }
-      else if(image[ij]>cur_max){
+      if(image[ij]>cur_max){
 	cur_max = image[ij];
       }
       
@@ -314,6 +364,7 @@ void rescaleImage101(uint8_t *scaled_image, unsigned short *image, int image_wid
 
   cur_min = image[0];
   cur_max = image[0];
+  #pragma omp parallel for private(ij,j,temp) reduction(min:cur_min) reduction(max:cur_max) if(image_width*image_height > MIN_PARALLEL_SIZE)
   for(i=0;i<image_width;i++){
     for(j=0;j<image_height;j++){
 
@@ -322,7 +373,7 @@ void rescaleImage101(uint8_t *scaled_image, unsigned short *image, int image_wid
       if(image[ij]<cur_min){
 	cur_min = image[ij];
       }
-      else if(image[ij]>cur_max){
+      if(image[ij]>cur_max){
 	cur_max = image[ij];
       }
       
@@ -358,6 +409,7 @@ void rescaleImage110(uint8_t *scaled_image, unsigned short *image, int image_wid
 
   cur_min = image[0];
   cur_max = image[0];
+  #pragma omp parallel for private(ij,j,temp) reduction(min:cur_min) reduction(max:cur_max) if(image_width*image_height > MIN_PARALLEL_SIZE)
   for(i=0;i<image_width;i++){
     for(j=0;j<image_height;j++){
 
@@ -366,7 +418,7 @@ void rescaleImage110(uint8_t *scaled_image, unsigned short *image, int image_wid
       if(image[ij]<cur_min){
 	cur_min = image[ij];
       }
-      else if(image[ij]>cur_max){
+      if(image[ij]>cur_max){
 	cur_max = image[ij];
       }
       
@@ -402,6 +454,7 @@ void rescaleImage111(uint8_t *scaled_image, unsigned short *image, int image_wid
 
   cur_min = image[0];
   cur_max = image[0];
+  #pragma omp parallel for private(ij,j,temp) reduction(min:cur_min) reduction(max:cur_max) if(image_width*image_height > MIN_PARALLEL_SIZE)
   for(i=0;i<image_width;i++){
     for(j=0;j<image_height;j++){
 
@@ -410,7 +463,7 @@ void rescaleImage111(uint8_t *scaled_image, unsigned short *image, int image_wid
       if(image[ij]<cur_min){
 	cur_min = image[ij];
       }
-      else if(image[ij]>cur_max){
+      if(image[ij]>cur_max){
 	cur_max = image[ij];
       }
       
@@ -6,6 +6,10 @@ is used to speed up the rendering of the image in the UI. My experience
 was that for large images, such as those from a sCMOS camera, using numpy
 to do the image scaling and type conversion was not fast enough.
 
+The rescaling is multi-threaded if the library was compiled with OpenMP.
+ctypes releases the GIL for the duration of the C call so other Python
+threads can run while the image is being rescaled.
+
 Hazen 09/15
 """
 
@@ -26,6 +30,10 @@ try:
                                     ndpointer(dtype=numpy.uint8),
                                     ctypes.c_int]
     image_manip.compare.restype = ctypes.c_int
+
+    image_manip.getNumberOfThreads.argtypes = []
+    image_manip.getNumberOfThreads.restype = ctypes.c_int
+    image_manip.setNumberOfThreads.argtypes = [ctypes.c_int]
                                                                
     rescale_fn_arg_types = [ndpointer(dtype=numpy.uint8),
                             ndpointer(dtype=numpy.uint16),
@@ -67,6 +75,16 @@ def compare(image1, image2):
     return image_manip.compare(image1, image2, image1.size)
 
 
+def getNumberOfThreads():
+    """
+    Returns the number of threads that the C library will use to
+    rescale large images.
+    """
+    if image_manip is None:
+        return 1
+    return image_manip.getNumberOfThreads()
+
+
 def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_value, use_numpy = False):
     """
     This converts a uint16 image into a uint8 image based on the display
@@ -156,6 +174,16 @@ def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_valu
 
     return [rescaled, image_min, image_max]
 
+
+def setNumberOfThreads(n_threads):
+    """
+    Set the number of threads that the C library will use to rescale
+    large images. This has no effect if the library was compiled
+    without OpenMP.
+    """
+    if image_manip is not None:
+        image_manip.setNumberOfThreads(n_threads)
+
             
 #
 # The MIT License
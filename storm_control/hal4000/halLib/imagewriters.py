@@ -8,14 +8,17 @@ Hazen 03/17
 import copy
 import datetime
 import struct
-import tifffile
 import time
 
 from PyQt5 import QtCore
 
 import storm_control.sc_library.halExceptions as halExceptions
+import storm_control.sc_library.lazyImport as lazyImport
 import storm_control.sc_library.parameters as params
 
+# This is only needed for .tif films.
+tifffile = lazyImport.lazyImport("tifffile")
+
 
 class ImageWriterException(halExceptions.HalException):
     pass
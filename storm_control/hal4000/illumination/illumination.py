@@ -19,6 +19,7 @@ import storm_control.hal4000.halLib.halModule as halModule
 
 import storm_control.hal4000.illumination.illuminationChannel as illuminationChannel
 import storm_control.hal4000.illumination.illuminationParameters as illuminationParameters
+import storm_control.hal4000.illumination.powerLog as powerLog
 import storm_control.hal4000.illumination.xmlParser as xmlParser
 
 # UI.
@@ -60,7 +61,7 @@ class IlluminationView(halDialog.HalDialog):
         self.channels = []
         self.channels_by_name = {}
         self.parameters = params.StormXMLObject()
-        self.power_fp = None
+        self.power_log = None
         self.running_shutters = False
         self.shutters_info = False
         self.timing_functionality = None
@@ -128,6 +129,9 @@ class IlluminationView(halDialog.HalDialog):
         for channel in self.channels:
             channel.cleanup()
 
+        if self.power_log is not None:
+            self.power_log.wait()
+
         super().cleanUp(qt_settings)
 
     def getChannelNames(self):
@@ -139,7 +143,7 @@ class IlluminationView(halDialog.HalDialog):
     def getChannelPowers(self):
         powers = []
         for channel in self.channels:
-            powers.append(channel.getAmplitude())
+            powers.append(channel.getPower())
         return powers
 
     def getFunctionalities(self):
@@ -161,9 +165,8 @@ class IlluminationView(halDialog.HalDialog):
         """
         This called during timing by TimingFunctionality provided by timing.timing.
         """
-        if self.power_fp is not None:
-            frame_number = str(frame_number + 1)
-            self.power_fp.write(frame_number + " " + " ".join(self.getChannelPowers()) + "\n")
+        if self.power_log is not None:
+            self.power_log.addFrame(frame_number + 1, self.getChannelPowers())
             
     def newParameters(self, parameters):
         """
@@ -258,10 +261,19 @@ class IlluminationView(halDialog.HalDialog):
         
     def startFilm(self, film_settings):
 
-        # Open file to save the channel powers at each frame.
+        # Make sure that the powers of the previous film have been saved.
+        if self.power_log is not None:
+            self.power_log.wait()
+            self.power_log = None
+
+        # Record the channel powers at each frame.
         if film_settings.isSaved():
-            self.power_fp = open(film_settings.getBasename() + ".power", "w")
-            self.power_fp.write("frame " + " ".join(self.getChannelNames()) + "\n")
+            frames = 0
+            if film_settings.isFixedLength():
+                frames = film_settings.getFilmLength()
+            self.power_log = powerLog.PowerLog(filename = film_settings.getBasename() + ".power",
+                                               names = self.getChannelNames(),
+                                               frames = frames)
 
         # Configure channels.
         if film_settings.runShutters():
@@ -283,10 +295,9 @@ class IlluminationView(halDialog.HalDialog):
             
     def stopFilm(self):
 
-        # Close the channel powers file.
-        if self.power_fp is not None:
-            self.power_fp.close()
-            self.power_fp = None
+        # Save the channel powers, this is done in the background.
+        if self.power_log is not None:
+            self.power_log.save()
 
         if self.running_shutters:
 
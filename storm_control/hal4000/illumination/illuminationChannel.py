@@ -97,38 +97,61 @@ class Channel(QtCore.QObject):
         control, which is always normalized 0.0 - 1.0, can use the 
         .power file to recreate the intensity profile.
         """
-        power = self.channel_ui.getAmplitude()
-        return "{0:.4f}".format((power - self.min_amplitude)/self.amplitude_range)
+        return "{0:.4f}".format(self.getPower())
 
     def getDaqWaveforms(self, waveform, oversampling):
         """
-        Return the waveform as a DaqWaveform objects. 
+        Return the waveform (a xmlParser.ShutterWaveform) as a DaqWaveform
+        objects. These are kept in the DAQ waveform cache so loading the
+        same shutters file again does not have to render them again.
         """
         if self.bad_module:
             return []
 
+        cache = daqModule.getWaveformCache()
         daq_waveforms = []
 
         # Scale analog waveform.
         if self.analog_modulation is not None:
-            temp = waveform * (self.max_voltage - self.min_voltage) - self.min_voltage
-            temp = numpy.ascontiguousarray(temp, dtype = numpy.float64)
-            daq_waveforms.append(daqModule.DaqWaveform(source = self.analog_modulation.getSource(),
-                                                       oversampling = oversampling,
-                                                       waveform = temp))
+            source = self.analog_modulation.getSource()
+            scale = self.max_voltage - self.min_voltage
+            key = ("shutters", source, oversampling, scale, self.min_voltage, waveform.getKey())
+            daq_waveform = cache.get(key)
+            if daq_waveform is None:
+                temp = waveform.render(dtype = numpy.float64, scale = scale, offset = -self.min_voltage)
+                temp.flags.writeable = False
+                daq_waveform = daqModule.DaqWaveform(source = source,
+                                                     oversampling = oversampling,
+                                                     waveform = temp,
+                                                     key = key)
+                cache.put(key, daq_waveform)
+            daq_waveforms.append(daq_waveform)
 
         # Convert waveform to digital.
         if self.digital_modulation is not None:
-            temp = numpy.round(waveform).astype(numpy.uint8)
-            temp[(temp != 0)] = 1
-            temp = numpy.ascontiguousarray(temp, dtype = numpy.uint8)
-            daq_waveforms.append(daqModule.DaqWaveform(is_analog = False,
-                                                       source = self.digital_modulation.getSource(),
-                                                       oversampling = oversampling,
-                                                       waveform = temp))
+            source = self.digital_modulation.getSource()
+            key = ("shutters", source, oversampling, waveform.getKey())
+            daq_waveform = cache.get(key)
+            if daq_waveform is None:
+                temp = waveform.render(dtype = numpy.uint8, digital = True)
+                temp.flags.writeable = False
+                daq_waveform = daqModule.DaqWaveform(is_analog = False,
+                                                     source = source,
+                                                     oversampling = oversampling,
+                                                     waveform = temp,
+                                                     key = key)
+                cache.put(key, daq_waveform)
+            daq_waveforms.append(daq_waveform)
 
         return daq_waveforms
     
+    def getPower(self):
+        """
+        Return the current channel amplitude normalized to 0.0 - 1.0.
+        """
+        power = self.channel_ui.getAmplitude()
+        return (power - self.min_amplitude)/self.amplitude_range
+
     def getFunctionalityNames(self):
         hw_fn_names = []
         for name in self.functionality_names:
@@ -296,11 +319,9 @@ class Channel(QtCore.QObject):
     def setUsedForFilm(self, waveform):
         """
         Figure out whether or not this channel is used during filming based
-        on the waveform.
+        on the waveform (a xmlParser.ShutterWaveform).
         """
-        self.used_for_film = False
-        if (numpy.count_nonzero(waveform) > 0):
-            self.used_for_film = True
+        self.used_for_film = waveform.isUsed()
 
     def startFilm(self):
         """
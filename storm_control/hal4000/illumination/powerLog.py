@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Records the illumination channel powers at each frame of a film.
+
+The powers are stored in memory during the film and written to the
+.power file when the film stops. The .power file is a text file with
+a header line with the channel names followed by one line per frame
+with the frame number and the (normalized) power of each channel.
+"""
+
+import numpy
+import threading
+
+
+def loadPowerFile(filename):
+    """
+    Returns [channel names, frame numbers, powers] for a .power file,
+    powers is a (frames, channels) array.
+    """
+    with open(filename) as fp:
+        names = fp.readline().split()[1:]
+        lines = fp.read().split("\n")
+    if (len(lines[0]) == 0):
+        return [names, numpy.zeros(0, dtype = numpy.int64), numpy.zeros((0, len(names)))]
+    data = numpy.loadtxt(lines, ndmin = 2)
+    return [names, data[:,0].astype(numpy.int64), data[:,1:]]
+
+
+def writePowerFile(filename, names, frames, powers):
+    """
+    Write frame numbers and powers to a .power file.
+    """
+    with open(filename, "w") as fp:
+        fp.write("frame " + " ".join(names) + "\n")
+        numpy.savetxt(fp,
+                      numpy.column_stack((frames, powers)),
+                      fmt = ["%d"] + ["%.4f"] * len(names))
+
+
+class PowerLog(object):
+    """
+    The log starts with space for the expected number of frames and
+    doubles in size if the film turns out to be longer.
+    """
+    def __init__(self, filename = None, names = None, frames = 0, **kwds):
+        super().__init__(**kwds)
+        self.filename = filename
+        self.n_frames = 0
+        self.names = names
+        self.thread = None
+
+        frames = max(frames, 100)
+        self.frames = numpy.zeros(frames, dtype = numpy.int32)
+        self.powers = numpy.zeros((frames, len(names)), dtype = numpy.float32)
+
+    def addFrame(self, frame_number, powers):
+        if (self.n_frames == self.frames.size):
+            self.frames = numpy.concatenate((self.frames, numpy.zeros_like(self.frames)))
+            self.powers = numpy.concatenate((self.powers, numpy.zeros_like(self.powers)))
+        self.frames[self.n_frames] = frame_number
+        self.powers[self.n_frames,:] = powers
+        self.n_frames += 1
+
+    def getFrames(self):
+        return self.frames[:self.n_frames]
+
+    def getPowers(self):
+        """
+        Returns a (frames, channels) array of the powers.
+        """
+        return self.powers[:self.n_frames]
+
+    def save(self, background = True):
+        """
+        Write the log to the .power file, by default in a background thread,
+        use wait() to wait for this to finish.
+        """
+        args = (self.filename, self.names, self.getFrames(), self.getPowers())
+        if background:
+            self.thread = threading.Thread(target = writePowerFile, args = args)
+            self.thread.start()
+        else:
+            writePowerFile(*args)
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -5,7 +5,9 @@ This file contains the various XML parsing functions.
 Hazen 04/17
 """
 
+import functools
 import numpy
+import os
 
 import xml.etree.ElementTree as ElementTree
 
@@ -33,15 +35,145 @@ class ShuttersInfo(object):
         Return the length of the shutter sequence in frames.
         """
         return self.frames
-        
-        
+
+
+class ShutterWaveform(object):
+    """
+    The waveform of a single channel, stored as a sorted list of
+    non-overlapping [start, stop, power] runs (in samples) instead
+    of one value per sample. Samples that are not in a run are zero.
+
+    The waveform is rendered into an array only when it is needed,
+    in the form that the DAQ needs.
+    """
+    def __init__(self, length = 0, **kwds):
+        super().__init__(**kwds)
+        self.key = None
+        self.length = length
+        self.runs = []
+
+    def __array__(self, dtype = None, copy = None):
+        waveform = self.render()
+        if dtype is not None:
+            waveform = waveform.astype(dtype)
+        return waveform
+
+    def __len__(self):
+        return self.length
+
+    def addEvent(self, on, off, power):
+        """
+        Set the samples from on to off to power. As with the events in
+        a shutters file, later events overwrite earlier ones.
+        """
+        if (off <= on):
+            return
+        self.key = None
+
+        # Events are usually in time order.
+        if (len(self.runs) == 0) or (self.runs[-1][1] <= on):
+            if (power != 0.0):
+                self.runs.append([on, off, power])
+            return
+
+        runs = []
+        for run in self.runs:
+            if (run[1] <= on) or (run[0] >= off):
+                runs.append(run)
+            else:
+                if (run[0] < on):
+                    runs.append([run[0], on, run[2]])
+                if (run[1] > off):
+                    runs.append([off, run[1], run[2]])
+        if (power != 0.0):
+            runs.append([on, off, power])
+        self.runs = sorted(runs)
+
+    def getKey(self):
+        """
+        Return a hashable key that uniquely identifies the waveform.
+        """
+        if self.key is None:
+            self.key = (self.length, tuple(map(tuple, self.runs)))
+        return self.key
+
+    def getLength(self):
+        return self.length
+    
+    def getRuns(self):
+        return self.runs
+
+    def isUsed(self):
+        """
+        Returns True if the waveform is not zero everywhere.
+        """
+        return (len(self.runs) > 0)
+
+    def render(self, start = 0, stop = None, dtype = numpy.float64, scale = 1.0, offset = 0.0, digital = False):
+        """
+        Return samples start to stop of the waveform as a numpy array.
+
+        For analog waveforms the samples are power * scale + offset, for
+        digital waveforms they are 1 if the power rounds to a non-zero
+        value and 0 otherwise.
+        """
+        if stop is None:
+            stop = self.length
+        stop = min(stop, self.length)
+        start = min(start, stop)
+
+        def value(power):
+            if digital:
+                return 1 if (round(power) != 0) else 0
+            else:
+                return power * scale + offset
+
+        waveform = numpy.full(stop - start, value(0.0), dtype = dtype)
+        for [on, off, power] in self.runs:
+            if (off > start) and (on < stop):
+                waveform[max(on, start) - start:min(off, stop) - start] = value(power)
+        return waveform
+
+    def renderChunks(self, chunk_size, **kwds):
+        """
+        Generator that renders the waveform in chunks of (at most)
+        chunk_size samples, kwds are passed to render().
+        """
+        for start in range(0, self.length, chunk_size):
+            yield self.render(start = start, stop = start + chunk_size, **kwds)
+
+
+def clearShuttersCache():
+    parseShuttersXMLFile.cache_clear()
+
+
 def parseShuttersXML(channel_name_to_id, shutters_file, can_oversample = True):
     """
     This parses a XML file that defines a shutter sequence.
 
+    The results are cached, so parsing the same (unchanged) file again
+    with the same channels returns the same ShuttersInfo and ShutterWaveform
+    objects. These should not be modified.
+
     FIXME: Not all setup support oversampling, but none of them currently set
            the can_oversample argument.
     """
+    stat = os.stat(shutters_file)
+    [s_info, waveforms, oversampling] = parseShuttersXMLFile(tuple(sorted(channel_name_to_id.items())),
+                                                             os.path.abspath(shutters_file),
+                                                             stat.st_mtime_ns,
+                                                             stat.st_size,
+                                                             can_oversample)
+    return [s_info, list(waveforms), oversampling]
+
+
+@functools.lru_cache(maxsize = 20)
+def parseShuttersXMLFile(channel_names_and_ids, shutters_file, mtime, size, can_oversample):
+    """
+    This does the actual parsing for parseShuttersXML(), the modification
+    time and the size of the file are only used as part of the cache key.
+    """
+    channel_name_to_id = dict(channel_names_and_ids)
     number_channels = len(channel_name_to_id)
 
     # Load XML shutters file.
@@ -86,7 +218,7 @@ def parseShuttersXML(channel_name_to_id, shutters_file, can_oversample = True):
     #
     waveforms = []
     for i in range(number_channels):
-        waveforms.append(numpy.zeros(frames * oversampling))
+        waveforms.append(ShutterWaveform(length = frames * oversampling))
 
     # Add in the events.
     for event in xml.findall("event"):
@@ -165,11 +297,7 @@ def parseShuttersXML(channel_name_to_id, shutters_file, can_oversample = True):
             raise ShutterXMLException("Off time out of range: " + str(on) + " in channel " + str(channel) + ".")
 
         # Channel waveform setup.
-        i = on
-        waveform = waveforms[channel]
-        while i < off:
-            waveform[i] = power
-            i += 1
+        waveforms[channel].addEvent(on, off, power)
 
         # Color information setup.
         if color:
@@ -181,7 +309,7 @@ def parseShuttersXML(channel_name_to_id, shutters_file, can_oversample = True):
                 i += 1
 
     return [ShuttersInfo(color_data = color_data, frames = frames),
-            waveforms,
+            tuple(waveforms),
             oversampling]
 
 
@@ -12,6 +12,7 @@ the laser powers.
 Hazen 02/14
 """
 
+import numpy
 import os
 import sys
 from PyQt5 import QtCore, QtWidgets
@@ -21,19 +22,29 @@ import storm_control.sc_library.parameters as params
 import storm_control.hal4000.halLib.halDialog as halDialog
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halModule as halModule
+import storm_control.hal4000.illumination.powerLog as powerLog
 
 import storm_control.hal4000.qtdesigner.progression_ui as progressionUi
 
 
 class Channels(object):
-
+    """
+    The progression is compiled into numpy arrays at the start of the
+    film, so that handling a new frame does not have to read the GUI
+    (or a file).
+    """
     def __init__(self, **kwds):
         super().__init__(**kwds)
         self.height = 40
         self.powers = []
 
     def handleNewFrame(self, frame_number):
-        pass
+        """
+        Called when we get a new frame from the camera. Returns which
+        channels (if any) need to have their power adjusted and by how
+        much.
+        """
+        return [[], []]
 
     def startFilm(self):
         pass
@@ -55,10 +66,11 @@ class MathChannels(Channels):
 
         layout = parent.layout()
         self.channels = []
-        self.which_checked = []
+        self.frames = numpy.ones(len(channels), dtype = numpy.int64)
+        self.increments = numpy.zeros(len(channels))
+        self.powers = numpy.zeros(len(channels))
+        self.which_checked = numpy.zeros(len(channels), dtype = bool)
         for i, channel in enumerate(channels):
-            self.powers.append(0.0)
-            self.which_checked.append(False)
 
             # channel number
             channel_text = QtWidgets.QLabel(parent)
@@ -110,15 +122,16 @@ class MathChannels(Channels):
 
     def startFilm(self):
         """
-        This is called when the filming starts. It returns the
-        desired initial powers for the various channels.
+        This is called when the filming starts. It records the settings
+        of the channels and returns the desired initial powers for the
+        various channels.
         """
         for i, channel in enumerate(self.channels):
-            self.which_checked[i] = False
-            self.powers[i] = (float(channel[1].value()))
-            if channel[0].isChecked():
-                self.which_checked[i] = True
-        return [self.which_checked, self.powers]
+            self.which_checked[i] = channel[0].isChecked()
+            self.powers[i] = float(channel[1].value())
+            self.increments[i] = float(channel[2].value())
+            self.frames[i] = channel[3].value()
+        return [self.which_checked.copy(), self.powers.copy()]
 
     def stopFilm(self):
         """
@@ -126,8 +139,8 @@ class MathChannels(Channels):
         to their initial values.
         """
         for i, channel in enumerate(self.channels):
-            self.powers[i] = (float(channel[1].value()))
-        return [self.which_checked, self.powers]
+            self.powers[i] = float(channel[1].value())
+        return [self.which_checked.copy(), self.powers.copy()]
 
 
 class LinearChannels(MathChannels):
@@ -145,20 +158,8 @@ class LinearChannels(MathChannels):
             channel[2].setMaximum(1.0)
 
     def handleNewFrame(self, frame_number):
-        """
-        Called when we get a new frame from the camera. Returns the which
-        channels (if any) need to have their power adjusted.
-        """
-        active = []
-        increment = []
-        for i, channel in enumerate(self.channels):
-            if self.which_checked[i] and ((frame_number % channel[3].value()) == 0):
-                active.append(True)
-                increment.append(float(channel[2].value()))
-            else:
-                active.append(False)
-                increment.append(float(channel[2].value()))
-        return [active, increment]
+        active = self.which_checked & ((frame_number % self.frames) == 0)
+        return [active, self.increments]
 
 
 class ExponentialChannels(MathChannels):
@@ -177,22 +178,10 @@ class ExponentialChannels(MathChannels):
             channel[2].setMaximum(9.9)
 
     def handleNewFrame(self, frame_number):
-        """
-        Called when we get a new frame from the camera. Returns the which
-        channels (if any) need to have their power adjusted.
-        """
-        active = []
-        increment = []
-        for i, channel in enumerate(self.channels):
-            if self.which_checked[i] and ((frame_number % channel[3].value()) == 0):
-                active.append(True)
-                new_power = float(channel[2].value()) * self.powers[i]
-                inc = new_power - self.powers[i]
-                increment.append(inc)
-                self.powers[i] = new_power
-            else:
-                active.append(False)
-                increment.append(float(channel[2].value()))
+        active = self.which_checked & ((frame_number % self.frames) == 0)
+        new_powers = numpy.where(active, self.increments * self.powers, self.powers)
+        increment = new_powers - self.powers
+        self.powers = new_powers
         return [active, increment]
 
 
@@ -204,78 +193,48 @@ class FileChannels(Channels):
     def __init__(self, **kwds):
         super().__init__(**kwds)
         self.active = []
+        self.file_powers = None
         self.start_powers = []
-        self.file_ptr = False
-
-    def getNextPowers(self):
-        """
-        Read and parse the next line of the powers file, or False 
-        if we have reached the end of the file.
-        """
-        line = self.file_ptr.readline()
-        powers = False
-        if line:
-            powers = []
-            powers_text = line.split(" ")[1:]
-            for i in range(len(powers_text)):
-                powers.append(float(powers_text[i]))
-        return powers
 
     def handleNewFrame(self, frame_number):
         """
-        Called when we get a new frame from the camera. Returns the which
-        channels (if any) need to have their power adjusted.
-        """
-        if self.file_ptr:
-            powers = self.getNextPowers()
-            active = []
-            increment = []
-            if powers:
-                for i in range(len(powers)):
-                    if powers[i] != self.powers[i]:
-                        active.append(True)
-                        increment.append(powers[i] - self.powers[i])
-                        self.powers[i] = powers[i]
-                    else:
-                        active.append(False)
-                        increment.append(False)
-            return [active, increment]
-        else:
+        Frame 1 gets the powers in the first line of the file, etc.
+        """
+        if (self.file_powers is None) or (frame_number < 1) or (frame_number > self.file_powers.shape[0]):
             return [[], []]
 
+        powers = self.file_powers[frame_number - 1]
+        active = (powers != self.powers)
+        increment = powers - self.powers
+        self.powers = powers
+        return [active, increment]
+
     def newFile(self, filename):
         """
-        Open a powers file & read the first line to 
-        get the initial power values.
+        Load all the powers in a powers file, the first line
+        has the initial power values.
         """
+        self.file_powers = None
+
         # FIXME: Shouldn't this just fail if the file does not exist?
         if os.path.exists(filename):
-            self.file_ptr = open(filename, "r")
-            self.file_ptr.readline()
-            self.active = []
-            self.start_powers = []
-            powers = self.getNextPowers()
-            if powers:
-                for power in powers:
-                    self.active.append(True)
-                    self.powers.append(power)
-                    self.start_powers.append(power)
-        else:
-            self.file_ptr = False
+            try:
+                [names, frames, powers] = powerLog.loadPowerFile(filename)
+            except ValueError as error:
+                print("Could not load powers file", filename, error)
+                return
+            if (powers.shape[0] > 0):
+                self.file_powers = powers
+                self.active = numpy.ones(powers.shape[1], dtype = bool)
+                self.start_powers = powers[0].copy()
 
     def startFilm(self):
         """
         This is called when the filming starts. It returns the
-        desired initial powers for the various channels. It also
-        rewinds the file pointer to beginning of the powers file.
-        """
-        if self.file_ptr:
-            # reset file ptr
-            self.file_ptr.seek(0)
-            self.file_ptr.readline()
-            # reset internal power record
-            for i in range(len(self.start_powers)):
-                self.powers[i] = self.start_powers[i]
+        desired initial powers for the various channels.
+        """
+        if self.file_powers is not None:
+            self.powers = self.start_powers
             return [self.active, self.start_powers]
         else:
             return [[], []]
@@ -285,7 +244,7 @@ class FileChannels(Channels):
         This is called when the film stops. It resets the powers
         to their initial values.
         """
-        if self.file_ptr:
+        if self.file_powers is not None:
             return [self.active, self.start_powers]
         else:
             return [[], []]
@@ -357,9 +316,8 @@ class ProgressionsView(halDialog.HalDialog):
         if self.channels is not None:
             if (frame_number > 0):
                 [active, increment] = self.channels.handleNewFrame(frame_number)
-                for i in range(len(active)):
-                    if active[i]:
-                        self.ilm_functionality.remoteIncPower(int(i), increment[i])
+                for i in numpy.flatnonzero(active):
+                    self.ilm_functionality.remoteIncPower(int(i), float(increment[i]))
 
     def handleProgressionsCheck(self, state):
         """
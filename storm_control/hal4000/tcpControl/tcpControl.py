@@ -18,6 +18,27 @@ import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halModule as halModule
 
 
+#
+# These messages either change HAL's state or need it to not change
+# while they are being handled, so they are never handled at the same
+# time as any other message.
+#
+exclusive_messages = ["Check Focus Lock",
+                      "Find Sum",
+                      "Set Parameters",
+                      "Take Movie"]
+
+#
+# These messages only return information. They can be sent by any
+# client that is connected to HAL and are handled immediately.
+#
+query_messages = ["Get Frame",
+                  "Get Mosaic Settings",
+                  "Get Objective",
+                  "Get Stage Position",
+                  "Get Status"]
+
+
 def calculateMovieStats(tcp_message, parameters):
     """
     Calculate movie size and duration based on parameters
@@ -75,6 +96,9 @@ class TCPAction(QtCore.QObject):
     def getHalMessage(self):
         return self.hal_message
 
+    def isExclusive(self):
+        return (self.tcp_message.getType() in exclusive_messages)
+    
     def handleResponses(self, message):
         """
         Handles message responses as a halModule.HalModule would.
@@ -368,8 +392,20 @@ class Controller(QtCore.QObject):
     4. 'Take Movie'
     In this sequence 1 and 2 can happen in parallel.
 
-    Note also the expectation that the TCP client does not send another message
-    until it gets a response to the first message.
+    Other clients, such as monitoring tools, can connect at the same time as the
+    controlling client but they can only send the messages in query_messages.
+    These are handled immediately.
+
+    The 'Get Frame' message returns the first frame of the most recent film
+    from a camera as binary data, along with the parameters that were saved
+    with the film. This lets Steve get the image without having to read the
+    film from the disk.
+
+    The TCP client can send several messages without waiting for the responses.
+    These are handled in the order in which they were received, but messages
+    are started without waiting for the previous message to complete unless
+    one of the two is in the exclusive_messages list. The responses are matched
+    to the requests by the TCP client using the message ID.
     """
     controlAction = QtCore.pyqtSignal(object)
     controlMessage = QtCore.pyqtSignal(object)
@@ -377,7 +413,12 @@ class Controller(QtCore.QObject):
     
     def __init__(self, parallel_mode = None, server = None, verbose = True, **kwds):
         super().__init__(**kwds)
+        self.film_frames = {}
+        self.film_parameters = None
+        self.filming = False
         self.parallel_mode = None
+        self.pending = []
+        self.running = []
         self.server = server
         self.test_directory = None
         self.test_parameters = None
@@ -386,6 +427,7 @@ class Controller(QtCore.QObject):
         self.server.comGotConnection.connect(self.handleNewConnection)
         self.server.comLostConnection.connect(self.handleLostConnection)
         self.server.messageReceived.connect(self.handleMessageReceived)
+        self.server.queryReceived.connect(self.handleQueryReceived)
 
     def actionDone(self, tcp_action):
         """
@@ -395,36 +437,114 @@ class Controller(QtCore.QObject):
         if "parameters" in data:
             self.test_parameters = data["parameters"]
         tcp_action.sendResponse(self.server)
+        if tcp_action in self.running:
+            self.running.remove(tcp_action)
+            self.handlePending()
 
     def cleanUp(self):
         self.server.close()
         
+    def getFrame(self, tcp_message):
+        """
+        Add the first frame of the last film to a 'Get Frame' message.
+        """
+        if tcp_message.isTest():
+            return
+
+        camera = tcp_message.getData("camera", default = "camera1")
+        if self.filming:
+            tcp_message.setError(True, "Frames are not available while filming.")
+        elif (self.film_parameters is None) or (not camera in self.film_frames):
+            tcp_message.setError(True, "No saved film frame for '" + camera + "'.")
+        else:
+            frame = self.film_frames[camera]
+            tcp_message.addBinaryData("frame", frame.np_data.reshape((frame.image_y, frame.image_x)))
+            tcp_message.addResponse("parameters", self.film_parameters.toString())
+        
+    def getStatus(self, tcp_message):
+        """
+        Add HAL's current status to a 'Get Status' message.
+        """
+        tcp_message.addResponse("clients", self.server.getNumberOfClients())
+        tcp_message.addResponse("filming", self.filming)
+        tcp_message.addResponse("pending", len(self.pending))
+        tcp_message.addResponse("running", list(map(lambda x: x.tcp_message.getType(), self.running)))
+        
     def handleLostConnection(self):
+        self.pending = []
+        self.running = []
         self.gotConnection.emit(False)
 
+    def handleNewFrame(self, frame):
+        """
+        Keep the first frame of each camera / feed during filming.
+        """
+        if self.filming and (frame.frame_number == 0):
+            self.film_frames[frame.which_camera] = frame
+            
     def handleMessageReceived(self, tcp_message):
         """
-        TCP message handling.
+        Queue TCP messages, they are handled once any exclusive
+        messages ahead of them have completed.
         """
         if self.verbose:
             print(">TCP message received:")
             print(tcp_message)
             print("")
 
+        self.pending.append(tcp_message)
+        self.handlePending()
+
+    def handlePending(self):
+        """
+        Handle as many of the pending TCP messages as we can.
+        """
+        while (len(self.pending) > 0):
+            if any(map(lambda x: x.isExclusive(), self.running)):
+                return
+            if (self.pending[0].getType() in exclusive_messages) and (len(self.running) > 0):
+                return
+            self.handleTCPMessage(self.pending.pop(0))
+            
+    def handleQueryReceived(self, tcp_message):
+        """
+        Queries from clients other than the controlling client.
+        """
+        if tcp_message.isType("Get Frame"):
+            self.getFrame(tcp_message)
+            self.server.sendMessage(tcp_message)
+        elif tcp_message.isType("Get Status"):
+            self.getStatus(tcp_message)
+            self.server.sendMessage(tcp_message)
+        else:
+            self.controlAction.emit(TCPAction(tcp_message = tcp_message))
+            
+    def handleTCPMessage(self, tcp_message):
+        """
+        TCP message handling.
+        """
         if tcp_message.isType('Check Focus Lock'):
             # This is supposed to ensure that everything else, like stage moves is complete.
             self.controlMessage.emit(halMessage.SyncMessage())
             
             action = TCPAction(tcp_message = tcp_message)
-            self.controlAction.emit(action)
+            self.startAction(action)
 
         elif tcp_message.isType('Find Sum'):
             # This is supposed to ensure that everything else, like stage moves is complete.
             self.controlMessage.emit(halMessage.SyncMessage())
             
             action = TCPAction(tcp_message = tcp_message)
-            self.controlAction.emit(action)            
-                
+            self.startAction(action)            
+
+        elif tcp_message.isType("Get Frame"):
+            self.getFrame(tcp_message)
+            self.server.sendMessage(tcp_message)
+            
+        elif tcp_message.isType("Get Status"):
+            self.getStatus(tcp_message)
+            self.server.sendMessage(tcp_message)
+            
         elif tcp_message.isType("Set Directory"):
             warnings.warn("The 'Set Directory' message is deprecated.")
             directory = tcp_message.getData("directory")
@@ -450,13 +570,13 @@ class Controller(QtCore.QObject):
                 action = TCPActionGetParameters(tcp_message = tcp_message)
             else:
                 action = TCPActionSetParameters(tcp_message = tcp_message)
-            self.controlAction.emit(action)
+            self.startAction(action)
                     
         elif tcp_message.isType("Take Movie"):
 
             # Check that movie length is valid.
             if (tcp_message.getData("length") is None) or (tcp_message.getData("length") < 1):
-                tcp_message.setError(True, str(message.getData("length")) + " is an invalid movie length.")
+                tcp_message.setError(True, str(tcp_message.getData("length")) + " is an invalid movie length.")
                 self.server.sendMessage(tcp_message)
                 return
 
@@ -487,7 +607,7 @@ class Controller(QtCore.QObject):
                 # If the movie has parameters specified, we'll request them specially.
                 if tcp_message.getData("parameters") is not None:
                     action = TCPActionGetMovieStats(tcp_message = tcp_message)
-                    self.controlAction.emit(action)
+                    self.startAction(action)
 
                 # Otherwise calculate based on the current parameters.
                 else:
@@ -495,12 +615,12 @@ class Controller(QtCore.QObject):
                     self.server.sendMessage(tcp_message)                    
             else:
                 action = TCPActionTakeMovie(tcp_message = tcp_message)
-                self.controlAction.emit(action)
+                self.startAction(action)
 
         else:
             if tcp_message.isTest() or (not self.parallel_mode):
                 action = TCPAction(tcp_message = tcp_message)
-                self.controlAction.emit(action)
+                self.startAction(action)
             else:
                 msg = halMessage.HalMessage(m_type = "tcp message",
                                             data = {"tcp message" : tcp_message})
@@ -513,8 +633,21 @@ class Controller(QtCore.QObject):
     def setDirectory(self, directory):
         self.test_directory = directory
 
+    def setFilmParameters(self, parameters):
+        self.film_parameters = parameters
+        
+    def setFilming(self, filming):
+        self.filming = filming
+        if self.filming:
+            self.film_frames = {}
+            self.film_parameters = None
+        
     def setParameters(self, parameters):
         self.test_parameters = parameters
+
+    def startAction(self, tcp_action):
+        self.running.append(tcp_action)
+        self.controlAction.emit(tcp_action)
         
         
 class TCPControl(halModule.HalModule):
@@ -523,10 +656,13 @@ class TCPControl(halModule.HalModule):
     """
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
-        self.control_action = None
+        self.camera_functionalities = []
+        self.control_actions = []
+        self.parameters_message = None
 
         configuration = module_params.get("configuration")
         server = tcpServer.TCPServer(port = configuration.get("tcp_port"),
+                                     query_messages = query_messages,
                                      server_name = "Hal",
                                      parent = self)
         self.control = Controller(parallel_mode = configuration.get("parallel_mode"),
@@ -548,21 +684,20 @@ class TCPControl(halModule.HalModule):
     def cleanUp(self, qt_settings):
         self.control.cleanUp()
 
-    def finalizeControlAction(self):
-        self.control.actionDone(self.control_action)
-        self.control_action.actionMessage.disconnect(self.sendMessage)
-        self.control_action = None
+    def finalizeControlAction(self, action):
+        self.control_actions.remove(action)
+        action.actionMessage.disconnect(self.sendMessage)
+        self.control.actionDone(action)
         
     def handleControlAction(self, action):
         #
         # Actions will persist until some condition is met, at which point
-        # a response is returned to the TCP client.
+        # a response is returned to the TCP client. There can be more than
+        # one action in progress at a time.
         #
-        assert (self.control_action is None)
-        
-        self.control_action = action
-        self.control_action.actionMessage.connect(self.sendMessage)
-        self.sendMessage(self.control_action.getHalMessage())
+        self.control_actions.append(action)
+        action.actionMessage.connect(self.sendMessage)
+        self.sendMessage(action.getHalMessage())
         
     def handleControlMessage(self, message):
         #
@@ -577,14 +712,14 @@ class TCPControl(halModule.HalModule):
                                                    data = {"properties" : {"connected" : True}}))
         else:
             #
-            # If we are still processing a message just clean it up and
-            # throw it away. Not sure if this is the right thing, but if
+            # If we are still processing messages just clean them up and
+            # throw them away. Not sure if this is the right thing, but if
             # the Dave / Steve disconnects and reconnects then we are
-            # going to have issues if we're still processing an action.
+            # going to have issues if we're still processing actions.
             #
-            if self.control_action is not None:
-                self.control_action.actionMessage.disconnect(self.sendMessage)
-                self.control_action = None
+            for action in self.control_actions:
+                action.actionMessage.disconnect(self.sendMessage)
+            self.control_actions = []
                 
             self.sendMessage(halMessage.HalMessage(m_type = "configuration",
                                                    data = {"properties" : {"connected" : False}}))
@@ -592,31 +727,57 @@ class TCPControl(halModule.HalModule):
     def handleResponses(self, message):
 
         #
-        # At 'configure2' we get the default parameters, we know this is
-        # 'configure2' because this is the only time that self.control_action
-        # is None.
+        # At 'configure2' we get the default parameters.
         #
-        if self.control_action is None:
-            if message.isType("get parameters"):
-                response = message.getResponses()[0]
-                self.control.setParameters(response.getData()["parameters"])
+        if (message is self.parameters_message):
+            response = message.getResponses()[0]
+            self.control.setParameters(response.getData()["parameters"])
+            self.parameters_message = None
+
+        elif message.isType("get functionality"):
+            for response in message.getResponses():
+                functionality = response.getData()["functionality"]
+                functionality.newFrame.connect(self.control.handleNewFrame)
+                self.camera_functionalities.append(functionality)
+                
         else:
-            if self.control_action.handleResponses(message):
-                self.finalizeControlAction()
+            for action in self.control_actions[:]:
+                if action.handleResponses(message):
+                    self.finalizeControlAction(action)
 
     def processMessage(self, message):
-        
-        if self.control_action is not None:
-            if self.control_action.processMessage(message):
-                self.finalizeControlAction()
+
+        #
+        # This is handled before the actions so that any 'Get Frame' messages
+        # that were waiting for a 'Take Movie' message to complete will get
+        # the frame from this film.
+        #
+        if message.isType("film lockout"):
+            self.control.setFilming(message.getData()["locked out"])
+            if "film parameters" in message.getData():
+                self.control.setFilmParameters(message.getData()["film parameters"])
+
+        for action in self.control_actions[:]:
+            if action.processMessage(message):
+                self.finalizeControlAction(action)
 
         if message.isType("change directory"):
             self.control.setDirectory(message.getData()["directory"])
 
+        elif message.isType("configuration"):
+            if message.sourceIs("feeds"):
+                for functionality in self.camera_functionalities:
+                    functionality.newFrame.disconnect(self.control.handleNewFrame)
+                self.camera_functionalities = []
+                for name in message.getData()["properties"]["feed names"]:
+                    self.sendMessage(halMessage.HalMessage(m_type = "get functionality",
+                                                           data = {"name" : name}))
+
         # At least for testing we'll need the default parameters.
         elif message.isType("configure2"):
-            self.sendMessage(halMessage.HalMessage(m_type = "get parameters",
-                                                   data = {"index or name" : 0}))
+            self.parameters_message = halMessage.HalMessage(m_type = "get parameters",
+                                                            data = {"index or name" : 0})
+            self.sendMessage(self.parameters_message)
 
         elif message.isType("updated parameters"):
             self.control.setParameters(message.getData()["parameters"])
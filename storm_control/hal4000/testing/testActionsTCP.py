@@ -107,6 +107,19 @@ class MoveStage(TestActionTCP):
                                                  message_data = {"stage_x" : x,
                                                                  "stage_y" : y},
                                                  test_mode = self.test_mode)
+
+
+class MoveStageList(TestActionTCP):
+    """
+    Tell HAL to plan a list of XY stage positions and move to the first
+    one, or to move to the next position if positions is None.
+    """
+    def __init__(self, positions = None, order = None, **kwds):
+        super().__init__(**kwds)
+        self.tcp_message = tcpMessage.TCPMessage(message_type = "Move Stage List",
+                                                 message_data = {"order" : order,
+                                                                 "positions" : positions},
+                                                 test_mode = self.test_mode)
         
 
 class NoSuchMessage(TestActionTCP):
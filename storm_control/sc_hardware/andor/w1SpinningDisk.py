@@ -41,16 +41,11 @@ class W1SpinningDisk(RS232.RS232):
     def commandResponse(self, command, timeout = 0.1):
 
         # Clear buffer of old responses.
-        self.tty.timeout = 0
-        while (len(self.readline()) > 0):
-            pass
-        
-        # Set timeout.
-        self.tty.timeout = timeout
+        self.clearBuffer()
 
         # Send the command and wait timeout time for a response.
         self.writeline(command)
-        response = self.readline()
+        response = self.readline(timeout = timeout)
 
         # Check that we got a message within the timeout.
         if (len(response) > 0):
@@ -27,6 +27,10 @@ class Tiger(RS232.RS232):
         self.y = 0
         self.z = 0
 
+        # All the responses end with "\r\n", so we don't have to wait
+        # until there is no more data to know that we have the response.
+        kwds["end_of_response"] = kwds.get("end_of_response", "\r\n")
+
         # Try and connect to the controller.
         try:
             super().__init__(**kwds)
@@ -5,6 +5,7 @@ Basic DAQ module functionality.
 Hazen 04/17
 """
 
+import collections
 import numpy
 from PyQt5 import QtCore
 
@@ -18,9 +19,21 @@ class DaqModuleException(halExceptions.HardwareException):
     pass
 
 
-class DaqWaveform(object):
+def getWaveformCache():
+    """
+    Return the waveform cache that is shared by all the modules that
+    create waveforms for the DAQ.
+    """
+    return waveform_cache
+
 
-    def __init__(self, is_analog = True, source = None, waveform = None, oversampling = 1, **kwds):
+class DaqWaveform(object):
+    """
+    If key is not None it should uniquely identify the contents of the
+    waveform. The DAQ uses the key to tell whether it is being asked to
+    output the same waveforms as it did for the previous film.
+    """
+    def __init__(self, is_analog = True, source = None, waveform = None, oversampling = 1, key = None, **kwds):
         super().__init__(**kwds)
 
         assert isinstance(is_analog, bool)
@@ -29,10 +42,14 @@ class DaqWaveform(object):
         assert isinstance(waveform, numpy.ndarray)
         
         self.is_analog = is_analog
+        self.key = key
         self.oversampling = oversampling # This is relative to the camera speed.
         self.waveform = waveform
         self.source = source
 
+    def getKey(self):
+        return self.key
+
     def getOversampling(self):
         return self.oversampling
         
@@ -48,6 +65,49 @@ class DaqWaveform(object):
     def isAnalog(self):
         return self.is_analog
 
+
+class DaqWaveformCache(object):
+    """
+    A least recently used cache of waveforms (or DaqWaveform objects),
+    so that modules which start many films with the same settings do
+    not have to re-create the waveforms each time.
+
+    Keys must be hashable and should include everything that the
+    waveform depends on, i.e. stage calibration, oversampling, etc.
+    """
+    def __init__(self, max_size = 50, **kwds):
+        super().__init__(**kwds)
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.max_size = max_size
+        self.misses = 0
+
+    def clear(self):
+        self.cache.clear()
+
+    def get(self, key):
+        """
+        Returns None if there is nothing in the cache for key.
+        """
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+        else:
+            self.misses += 1
+            return None
+
+    def getStatistics(self):
+        return {"hits" : self.hits,
+                "misses" : self.misses,
+                "size" : len(self.cache)}
+
+    def put(self, key, value):
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        while (len(self.cache) > self.max_size):
+            self.cache.popitem(last = False)
+
     
 class DaqFunctionality(hardwareModule.HardwareFunctionality):
 
@@ -95,6 +155,10 @@ class DaqModule(hardwareModule.HardwareModule):
         # These are the waveforms to output during a film.
         self.analog_waveforms = []
         self.digital_waveforms = []
+
+        # The keys of the waveforms for the current and the previous film.
+        self.last_waveform_keys = None
+        self.waveform_keys = []
         
         self.oversampling = 0
         self.waveform_len = 0
@@ -123,6 +187,8 @@ class DaqModule(hardwareModule.HardwareModule):
             else:
                 assert (self.oversampling == waveform.getOversampling())
                 assert (self.waveform_len == waveform.getWaveformLength())
+
+            self.waveform_keys.append(waveform.getKey())
                 
             if waveform.isAnalog():
                 self.analog_waveforms.append(waveform)
@@ -171,3 +237,18 @@ class DaqModule(hardwareModule.HardwareModule):
         self.oversampling = 0
         self.analog_waveforms = []
         self.digital_waveforms = []
+        self.last_waveform_keys = self.waveform_keys
+        self.waveform_keys = []
+
+    def waveformsChanged(self):
+        """
+        Returns False if all of the waveforms for this film have keys
+        and these are the same as those of the previous film, meaning
+        that any buffers already uploaded to the hardware can be re-used.
+        """
+        if (self.last_waveform_keys is None) or (None in self.waveform_keys):
+            return True
+        return (sorted(map(repr, self.waveform_keys)) != sorted(map(repr, self.last_waveform_keys)))
+
+
+waveform_cache = DaqWaveformCache()
@@ -9,6 +9,8 @@ Hazen 04/17
 #import copy
 
 import faulthandler
+import heapq
+import threading
 import time
 from PyQt5 import QtCore
 
@@ -19,6 +21,11 @@ import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halModule as halModule
 
 
+# The DeviceExecutors, by device mutex.
+device_executors = {}
+device_executors_lock = threading.Lock()
+
+
 def getThreadPool():
     """
     Return the applications threadpool instance. This is stored in halModule.
@@ -69,30 +76,187 @@ class HardwareWorker(QtCore.QRunnable):
         self.task_complete = True
 
 
+class DeviceJob(object):
+    """
+    A request to run task(*args) on a device. Jobs are sorted by priority
+    (must run jobs first) and then in the order in which they were received.
+    """
+    def __init__(self, args = [], maybe = False, owner = None, priority = 0, sequence = 0, task = None, **kwds):
+        super().__init__(**kwds)
+        self.args = args
+        self.cancelled = False
+        self.maybe = maybe
+        self.owner = owner
+        self.priority = priority
+        self.sequence = sequence
+        self.submit_time = time.time()
+        self.task = task
+
+    def __lt__(self, other):
+        return ((self.priority, self.sequence) < (other.priority, other.sequence))
+
+
+class DeviceExecutor(object):
+    """
+    Runs all the jobs for a single device, one at a time in a thread of
+    its own, so that a slow or hung device does not hold up other devices
+    or use up the threads in the global thread pool.
+
+    Must run jobs are always run. For maybe run jobs only the most recent
+    job from each owner is run, any earlier ones that are still waiting
+    are cancelled.
+    """
+    def __init__(self, name = "", **kwds):
+        super().__init__(**kwds)
+        self.condition = threading.Condition()
+        self.current = None
+        self.jobs = []
+        self.maybe_jobs = {}
+        self.name = name
+        self.sequence = 0
+        self.statistics = {"cancelled" : 0,
+                           "jobs" : 0,
+                           "max_run_time" : 0.0,
+                           "max_wait_time" : 0.0,
+                           "run_time" : 0.0,
+                           "wait_time" : 0.0}
+
+        self.thread = threading.Thread(target = self.runJobs, name = "DeviceExecutor " + name, daemon = True)
+        self.thread.start()
+
+    def getStatistics(self):
+        """
+        Returns the number of jobs run and cancelled and the mean
+        and maximum times (in seconds) that the jobs waited and ran.
+        """
+        with self.condition:
+            stats = dict(self.statistics)
+        n = max(stats["jobs"], 1)
+        stats["mean_run_time"] = stats.pop("run_time")/n
+        stats["mean_wait_time"] = stats.pop("wait_time")/n
+        return stats
+
+    def isBusy(self, owner):
+        """
+        Returns True if there are jobs from owner that are waiting or running.
+        """
+        with self.condition:
+            if (self.current is not None) and (self.current.owner is owner):
+                return True
+            for job in self.jobs:
+                if (job.owner is owner) and not job.cancelled:
+                    return True
+        return False
+
+    def runJobs(self):
+        while True:
+            with self.condition:
+                while (len(self.jobs) == 0):
+                    self.condition.wait()
+                job = heapq.heappop(self.jobs)
+                if job.cancelled:
+                    continue
+                if job.maybe and (self.maybe_jobs.get(job.owner) is job):
+                    del self.maybe_jobs[job.owner]
+                self.current = job
+
+            start_time = time.time()
+            try:
+                job.task(*job.args)
+            except Exception as exception:
+                print("DeviceExecutor", self.name, "job failed", type(exception).__name__, exception)
+            run_time = time.time() - start_time
+
+            with self.condition:
+                wait_time = start_time - job.submit_time
+                self.current = None
+                self.statistics["jobs"] += 1
+                self.statistics["max_run_time"] = max(self.statistics["max_run_time"], run_time)
+                self.statistics["max_wait_time"] = max(self.statistics["max_wait_time"], wait_time)
+                self.statistics["run_time"] += run_time
+                self.statistics["wait_time"] += wait_time
+                self.condition.notify_all()
+
+    def submit(self, task = None, args = [], owner = None, maybe = False):
+        """
+        Add a job to the queue. Maybe run jobs have a lower priority
+        than must run jobs.
+        """
+        with self.condition:
+            self.sequence += 1
+            job = DeviceJob(args = args,
+                            maybe = maybe,
+                            owner = owner,
+                            priority = 1 if maybe else 0,
+                            sequence = self.sequence,
+                            task = task)
+            if maybe:
+                old_job = self.maybe_jobs.get(owner)
+                if old_job is not None:
+                    old_job.cancelled = True
+                    self.statistics["cancelled"] += 1
+                self.maybe_jobs[owner] = job
+            heapq.heappush(self.jobs, job)
+            self.condition.notify_all()
+        return job
+
+    def waitFor(self, owner, timeout = None):
+        """
+        Wait until all of the jobs from owner have finished. Returns
+        False if this took longer than timeout seconds.
+        """
+        end_time = None if (timeout is None) else time.time() + timeout
+        with self.condition:
+            while True:
+                busy = ((self.current is not None) and (self.current.owner is owner))
+                busy = busy or any(map(lambda x: (x.owner is owner) and not x.cancelled, self.jobs))
+                if not busy:
+                    return True
+                if end_time is None:
+                    self.condition.wait()
+                else:
+                    remaining = end_time - time.time()
+                    if (remaining <= 0.0):
+                        return False
+                    self.condition.wait(remaining)
+
+
+def getDeviceExecutor(device_mutex, name = ""):
+    """
+    Returns the DeviceExecutor for a device. Functionalities that share
+    a device (and so the device mutex) also share the executor.
+    """
+    with device_executors_lock:
+        if not device_mutex in device_executors:
+            device_executors[device_mutex] = DeviceExecutor(name = name)
+        return device_executors[device_mutex]
+
+
 class BufferedFunctionality(HardwareFunctionality):
     """
     This is used to communicate with less responsive hardware.
 
     There may be several of these per device, self.device_mutex is used
-    to coordinate.
+    to coordinate. The requests for a device are run by the device's own
+    DeviceExecutor, not in the global thread pool.
 
     maybeRun() only gaurantees that the most recently received
     request will be processed.
 
-    mustRun() will process all requests.
+    mustRun() will process all requests, and before any maybeRun()
+    requests that are still waiting.
     """
     jobDone = QtCore.pyqtSignal()
     jobStarted = QtCore.pyqtSignal()
     
     def __init__(self, device_mutex = None, **kwds):
         super().__init__(**kwds)
-        self.busy = False
         self.device_mutex = device_mutex
-        self.next_request = None
         self.running = True
-        self.workers = []
 
         assert(isinstance(self.device_mutex, QtCore.QMutex))
+
+        self.executor = getDeviceExecutor(self.device_mutex, name = type(self).__name__)
         
         # Timer for stopping tasks that have hung. All jobs must finish in
         # 10 minutes.
@@ -109,23 +273,14 @@ class BufferedFunctionality(HardwareFunctionality):
         self.jobDone.connect(self.handleJobDone)
         self.jobStarted.connect(self.handleJobStarted)
 
-    def cleanUpWorkers(self):
+    def getStatistics(self):
         """
-        Remove any workers that have finished.
+        Returns the statistics of the device's executor.
         """
-        still_working = []
-        for worker in self.workers:
-            if not worker.isFinished():
-                still_working.append(worker)
-        self.workers = still_working
+        return self.executor.getStatistics()
 
     def handleJobDone(self):
         self.kill_timer.stop()
-
-        # Start the next 'maybe' request, if there was one.
-        if self.next_request is not None:
-            self.start(*self.next_request)
-            self.next_request = None
         
     def handleJobStarted(self):
         self.kill_timer.start()        
@@ -138,24 +293,20 @@ class BufferedFunctionality(HardwareFunctionality):
         e_string = "HardwareFunctionality timed out!"
         raise halExceptions.HardwareException(e_string)
 
+    def isBusy(self):
+        return self.executor.isBusy(self)
+
     def maybeRun(self, task = None, args = [], ret_signal = None):
         """
         Call this method with requests that don't absolutely have to be
-        processed. This will process them in the order received, but 
-        will only process the most recently received request.
+        processed. If there is an earlier request from this functionality
+        that has not started yet it is replaced by this one.
         """
-        if not self.busy:
-            self.busy = True
-            self.start(task, args, ret_signal)
-        else:
-            self.next_request = [task, args, ret_signal]
+        self.start(task, args, ret_signal, maybe = True)
 
     def mustRun(self, task = None, args = [], ret_signal = None):
         """
         Call this method with requests that must be processed.
-
-        FIXME: There is some danger here of being able to build up a
-               large backlog of QRunnables that are waiting to run.
         """
         self.start(task, args, ret_signal)
 
@@ -165,48 +316,47 @@ class BufferedFunctionality(HardwareFunctionality):
         pyqtSignal to return the results.
         """
         self.jobStarted.emit()
-        self.busy = True
         self.device_mutex.lock()
-        retv = task(*args)
-        self.device_mutex.unlock()
-        self.busy = False
-        self.jobDone.emit()
+        try:
+            retv = task(*args)
+        finally:
+            self.device_mutex.unlock()
+            self.jobDone.emit()
         if ret_signal is not None:
             ret_signal.emit(retv)
 
-    def start(self, task, args, ret_signal):
-        hw = HardwareWorker(task = self.run,
-                            args = [task, args, ret_signal])
-        self.startWorker(hw)
-
-    def startWorker(self, worker):
+    def start(self, task, args, ret_signal, maybe = False):
         if not self.running:
             return
-
-        # Remove any old workers that have finished.
-        self.cleanUpWorkers()
-
-        # We need to manage the workers ourselves because otherwise we'll
-        # experience strange/sporadic errors like the GUI freezing.
-        worker.setAutoDelete(False)
-        self.workers.append(worker)
-        
-        getThreadPool().start(worker)
+        self.executor.submit(task = self.run,
+                             args = [task, args, ret_signal],
+                             owner = self,
+                             maybe = maybe)
         
     def wait(self):
         """
         Block job submission and wait for the last job to finish.
         """
         self.running = False
-        while(self.busy):
+        while not self.executor.waitFor(self, timeout = 0.1):
             print("BufferedFunctionality wait")
-            time.sleep(0.1)
-
-        self.cleanUpWorkers()
 
 
 class HardwareModule(halModule.HalModule):
+    """
+    HAL calls initializeHardware() at start up in a separate thread, and
+    in parallel with the initialization of the other hardware modules. The
+    value it returns is passed to __init__() as 'hardware'.
+    """
+    @staticmethod
+    def initializeHardware(module_params):
+        """
+        Override this to do the slow parts of connecting to the hardware,
+        such as opening a serial port and querying the device. This must
+        not create any Qt objects.
+        """
+        return None
 
-    def __init__(self, **kwds):
+    def __init__(self, hardware = None, **kwds):
         super().__init__(**kwds)
 
@@ -4,8 +4,15 @@ The core functionality for a QPD, QPD/Camera or z stage.
 
 Hazen 04/17
 """
+import numpy
 
+import storm_control.sc_hardware.baseClasses.daqModule as daqModule
 import storm_control.sc_hardware.baseClasses.hardwareModule as hardwareModule
+import storm_control.sc_library.halExceptions as halExceptions
+
+
+class ZStageException(halExceptions.HardwareException):
+    pass
 
 
 class LockFunctionalityMixin(object):
@@ -131,13 +138,21 @@ class ZStageFunctionalityMixin(LockFunctionalityMixin):
         super().__init__(**kwds)
         self.z_position = 0.0
 
+    def getCalibration(self):
+        """
+        Returns a tuple describing how the stage converts microns into
+        DAQ output. This is part of the key for cached z scan waveforms,
+        so sub-classes with additional calibration values should extend it.
+        """
+        return (self.getMinimum(), self.getMaximum())
+
     def getCenterPosition(self):
         return self.getParameter("center")
     
     def getCurrentPosition(self):
         return self.z_position
 
-    def getDaqWaveform(self, waveform):
+    def getDaqWaveform(self, waveform, oversampling = 1, key = None):
         """
         Scale the analog waveform (a numpy array) that the daq will use to drive 
         the z-stage in hardware timed mode to the correct voltages.
@@ -152,6 +167,42 @@ class ZStageFunctionalityMixin(LockFunctionalityMixin):
     def getMinimum(self):
         return self.getParameter("minimum")
     
+    def getZScanWaveform(self, z_offsets, frames_per_step = 1, oversampling = 1):
+        """
+        Returns a daqModule.DaqWaveform for a hardware timed z scan of
+        z_offsets (in microns) around the current z position, with each
+        offset held for frames_per_step frames.
+
+        Both the scan profile and the DaqWaveform are kept in the DAQ
+        waveform cache, so films with the same scan at the same z position
+        get back the same DaqWaveform object.
+        """
+        z_offsets = tuple(map(float, z_offsets))
+        [z_min, z_max] = [self.getMinimum(), self.getMaximum()]
+        if ((max(z_offsets) - min(z_offsets)) > (z_max - z_min)):
+            raise ZStageException("Z scan range is larger than the stage range.")
+
+        cache = daqModule.getWaveformCache()
+        scan_key = ("z scan", z_offsets, frames_per_step, oversampling, self.getCalibration())
+
+        # The waveform also depends on the current position, which we round to
+        # 1nm as most stages can't resolve anything smaller than this anyway.
+        z_center = round(self.getCurrentPosition(), 3)
+        waveform_key = scan_key + (z_center,)
+        daq_waveform = cache.get(waveform_key)
+        if daq_waveform is None:
+            scan = cache.get(scan_key)
+            if scan is None:
+                scan = numpy.repeat(numpy.array(z_offsets), frames_per_step * oversampling)
+                scan.flags.writeable = False
+                cache.put(scan_key, scan)
+
+            daq_waveform = self.getDaqWaveform(scan + z_center,
+                                               oversampling = oversampling,
+                                               key = waveform_key)
+            cache.put(waveform_key, daq_waveform)
+        return daq_waveform
+    
     def goAbsolute(self, z_pos):
         pass
 
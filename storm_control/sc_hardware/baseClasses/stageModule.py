@@ -5,16 +5,181 @@ Base class / functionality for controlling a motorized stage.
 Hazen 04/17
 """
 
+import numpy
+import time
 from PyQt5 import QtCore
 
 import storm_control.hal4000.halLib.halMessage as halMessage
 
 import storm_control.sc_hardware.baseClasses.hardwareModule as hardwareModule
+import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.parameters as params
 
 
+class StageException(halExceptions.HardwareException):
+    pass
+
+
+def backlashMoves(start, end, backlash = 0.0):
+    """
+    Returns the list of positions to move to in order to get from start
+    to end so that the stage always approaches end from the same (lower)
+    side in both x and y. This takes up any backlash in the stage.
+    """
+    [dx, dy] = [end[0] - start[0], end[1] - start[1]]
+    if (backlash > 0.0) and ((dx < 0.0) or (dy < 0.0)):
+        overshoot = [end[0] - backlash if (dx < 0.0) else end[0],
+                     end[1] - backlash if (dy < 0.0) else end[1]]
+        return [overshoot, list(end)]
+    return [list(end)]
+
+
+def moveCosts(start, ends, backlash = 0.0):
+    """
+    Returns the cost (distance in microns) of moving from start to each
+    of the positions in ends, a (N, 2) array. The axes move at the same
+    time so this is the larger of the x and y distances. Moves that have
+    to overshoot to take up backlash cost more.
+    """
+    d = ends - numpy.asarray(start)
+    cost = numpy.abs(d)
+    if (backlash > 0.0):
+        cost += numpy.where(d < 0.0, 2.0 * backlash, 0.0)
+    return numpy.max(cost, axis = 1)
+
+
+def nearestNeighborOrder(xy, start, backlash = 0.0):
+    """
+    Returns the order in which to visit the positions in xy, a (N, 2)
+    array, going to the closest remaining position each time.
+    """
+    order = []
+    visited = numpy.zeros(xy.shape[0], dtype = bool)
+    current = start
+    for i in range(xy.shape[0]):
+        cost = moveCosts(current, xy, backlash)
+        cost[visited] = numpy.inf
+        j = int(numpy.argmin(cost))
+        order.append(j)
+        visited[j] = True
+        current = xy[j]
+    return order
+
+
+def planTrajectory(positions, start = None, method = "tsp", backlash = 0.0, row_tolerance = 1.0):
+    """
+    Returns the order (a list of indices) in which to visit positions,
+    a list of [x, y] positions in microns, to reduce the total travel.
+
+    start - Where the stage is now, default is the first position.
+
+    method - "none" keeps the original order.
+             "serpentine" goes along rows (positions whose y values are
+                 within row_tolerance), alternating direction.
+             "nearest" always goes to the closest position next.
+             "tsp" is "nearest" followed by 2-opt improvement.
+
+    backlash - Moves that approach a position from above (in x or y) have
+               to overshoot by this much, see backlashMoves(). If this is
+               not zero the order with the lowest total cost including the
+               overshoots is used.
+    """
+    n = len(positions)
+    if (n < 2) or (method == "none"):
+        return list(range(n))
+
+    xy = numpy.array(positions, dtype = numpy.float64)
+    if start is None:
+        start = xy[0]
+
+    if (method == "serpentine"):
+        order = sorted(range(n), key = lambda i: (xy[i,1], xy[i,0]))
+        rows = [[order[0]]]
+        for i in order[1:]:
+            if ((xy[i,1] - xy[rows[-1][0],1]) > row_tolerance):
+                rows.append([])
+            rows[-1].append(i)
+        order = []
+        for j, row in enumerate(rows):
+            order.extend(row if ((j % 2) == 0) else reversed(row))
+        return order
+
+    if not (method in ["nearest", "tsp"]):
+        raise StageException("Unknown trajectory method " + str(method))
+
+    order = nearestNeighborOrder(xy, start)
+    if (method == "tsp"):
+        order = twoOptOrder(xy, start, order)
+
+    # The shortest path is not necessarily the best one if there is backlash.
+    if (backlash > 0.0):
+        candidates = [order, nearestNeighborOrder(xy, start, backlash)]
+        costs = list(map(lambda x: trajectoryLength(xy, x, start, backlash), candidates))
+        order = candidates[costs.index(min(costs))]
+
+    return order
+
+
+def trajectoryLength(positions, order, start = None, backlash = 0.0):
+    """
+    Returns the total cost (in microns) of visiting positions in order.
+    """
+    if (len(order) == 0):
+        return 0.0
+    xy = numpy.array(positions, dtype = numpy.float64)[order]
+    if start is None:
+        start = xy[0]
+    path = numpy.vstack((numpy.asarray(start, dtype = numpy.float64), xy))
+    total = 0.0
+    for i in range(len(order)):
+        total += moveCosts(path[i], path[i+1:i+2], backlash)[0]
+    return float(total)
+
+
+def twoOptOrder(xy, start, order):
+    """
+    Improve the order in which to visit the positions in xy, a (N, 2)
+    array, by reversing parts of the path for as long as this makes the
+    path shorter. This ignores backlash as the moves in the reversed part
+    change direction.
+    """
+    n = len(order)
+    path = numpy.vstack((numpy.asarray(start, dtype = numpy.float64), xy[order]))
+    order = numpy.array(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n):
+            #
+            # Reversing path[i:k+1] replaces the edges (i-1, i) and (k, k+1)
+            # with the edges (i-1, k) and (i, k+1). This is calculated for
+            # all the possible values of k at once.
+            #
+            c = path[i:]
+            d_old_1 = moveCosts(path[i-1], path[i:i+1])[0]
+            d_new_1 = moveCosts(path[i-1], c)
+            d_old_2 = numpy.append(numpy.max(numpy.abs(c[1:] - c[:-1]), axis = 1), 0.0)
+            d_new_2 = numpy.append(moveCosts(path[i], c[1:]), 0.0)
+            gain = (d_old_1 + d_old_2) - (d_new_1 + d_new_2)
+            gain[0] = 0.0
+            m = int(numpy.argmax(gain))
+            if (gain[m] > 1.0e-6):
+                path[i:i+m+1] = path[i:i+m+1][::-1].copy()
+                order[i-1:i+m] = order[i-1:i+m][::-1].copy()
+                improved = True
+    return list(map(int, order))
+
+
 class StageFunctionality(hardwareModule.BufferedFunctionality):
+    """
+    Sub-classes that have to poll the stage for its position should call
+    startPolling() and provide a position() method. The position is then
+    cached, and the polling is faster while the position is changing and
+    slower when the stage is not moving. There is never more than one
+    position query waiting to run.
+    """
     isMoving = QtCore.pyqtSignal(bool)
+    positionUpdate = QtCore.pyqtSignal(dict)
     stagePosition = QtCore.pyqtSignal(dict)
 
     def __init__(self, stage = None, is_slow = False, **kwds):
@@ -26,12 +191,24 @@ class StageFunctionality(hardwareModule.BufferedFunctionality):
                   use them for things like screen drag based movement.
         """
         super().__init__(**kwds)
+        self.am_moving = False
         self.drag_start_x = None
         self.drag_start_y = None
+        self.fast_interval = None
         self.is_slow = is_slow
+
+        # Cached positions that are older than this (in seconds) are refreshed
+        # when they are used for things like drags and TCP requests.
+        self.max_age = 1.0
         self.pixels_to_microns = 1.0
         self.pos_dict = None
+        self.pos_time = None
+        self.querying = False
+        self.slow_interval = None
+        self.stale_query = False
         self.stage = stage
+        self.update_interval = None
+        self.update_timer = None
 
     def canZero(self):
         # Overload for stages that cannot zero their position
@@ -55,16 +232,36 @@ class StageFunctionality(hardwareModule.BufferedFunctionality):
         # This will not work well if the stage does not know it's
         # current position..
         #
-        if self.pos_dict is not None:
-            self.drag_start_x = self.pos_dict["x"]
-            self.drag_start_y = self.pos_dict["y"]
+        pos_dict = self.getCurrentPosition(max_age = self.max_age)
+        if pos_dict is not None:
+            self.drag_start_x = pos_dict["x"]
+            self.drag_start_y = pos_dict["y"]
         else:
             self.drag_start_x = 0
             self.drag_start_y = 0
             
-    def getCurrentPosition(self):
+    def getCurrentPosition(self, max_age = None):
+        """
+        Returns the cached position. If max_age (in seconds) is specified
+        and the position is older than this a new position query is started
+        if there is not one already, but this still returns the cached
+        position.
+        """
+        if (max_age is not None) and (self.update_timer is not None):
+            age = self.getPositionAge()
+            if (age is None) or (age > max_age):
+                self.queryPosition()
         return self.pos_dict
 
+    def getPositionAge(self):
+        """
+        Returns how old (in seconds) the cached position is, or None
+        if the stage has not reported a position.
+        """
+        if self.pos_time is None:
+            return None
+        return time.time() - self.pos_time
+
     def goAbsolute(self, x, y):
         """
         Usually used by the stage GUI, units are microns.
@@ -79,8 +276,51 @@ class StageFunctionality(hardwareModule.BufferedFunctionality):
         self.maybeRun(task = self.stage.goRelative,
                       args = [dx, dy])
 
+    def handlePositionUpdate(self, pos_dict):
+        """
+        Handle a position from the stage. This is ignored if we are in the
+        middle of a move as it might be stale.
+        """
+        self.querying = False
+        if self.am_moving:
+            return
+
+        # This query was started before the end of the last move.
+        if self.stale_query:
+            self.stale_query = False
+            self.queryPosition()
+            return
+
+        # Poll faster if the position is changing, e.g. the joystick is in use.
+        if (pos_dict != self.pos_dict):
+            self.update_interval = self.fast_interval
+        else:
+            self.update_interval = min(2 * self.update_interval, self.slow_interval)
+
+        self.pos_dict = pos_dict
+        self.pos_time = time.time()
+        self.stagePosition.emit(self.pos_dict)
+
+        if self.running:
+            self.update_timer.start(self.update_interval)
+
+    def handleUpdateTimer(self):
+        self.queryPosition()
+
     def isSlow(self):
         return self.is_slow
+
+    def queryPosition(self):
+        """
+        Query the stage for its current position, unless there is
+        already a query in progress or the stage is moving.
+        """
+        if self.querying or self.am_moving or not self.running:
+            return
+        self.querying = True
+        self.update_timer.stop()
+        self.mustRun(task = self.position,
+                     ret_signal = self.positionUpdate)
         
     def jog(self, x_speed, y_speed):
         """
@@ -95,6 +335,47 @@ class StageFunctionality(hardwareModule.BufferedFunctionality):
     def setPixelsToMicrons(self, pixels_to_microns):
         self.pixels_to_microns = pixels_to_microns
 
+    def startPolling(self, update_interval):
+        """
+        Start polling the stage for its position. update_interval (in
+        milli-seconds) is the polling interval when the stage is not
+        moving, the interval is shorter if the position is changing.
+        """
+        self.fast_interval = max(update_interval//5, 50)
+        self.slow_interval = update_interval
+        self.update_interval = self.fast_interval
+
+        # We need a 'relay' signal because when self.position() is called
+        # in the context of a HardwareWorker it will have stale information,
+        # in particular it might think the stage is not moving when it
+        # actually is. If the stage is moving we don't want to return
+        # whatever position the stage thinks it is at as this will likely
+        # be wrong.
+        self.positionUpdate.connect(self.handlePositionUpdate)
+
+        self.update_timer = QtCore.QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.timeout.connect(self.handleUpdateTimer)
+        self.queryPosition()
+
+    def stopMoving(self):
+        """
+        Called by sub-classes when a move has finished. This queries the
+        stage for its actual position.
+        """
+        self.am_moving = False
+        self.isMoving.emit(False)
+        self.update_interval = self.fast_interval
+        if self.querying:
+            self.stale_query = True
+        else:
+            self.queryPosition()
+
+    def wait(self):
+        if self.update_timer is not None:
+            self.update_timer.stop()
+        super().wait()
+
     def zero(self):
         self.mustRun(task = self.stage.zero)
 
@@ -112,44 +393,26 @@ class StageFunctionalityNF(StageFunctionality):
     calculates how long (in seconds) it will take the stage to perform
     the requested move.
     """
-    positionUpdate = QtCore.pyqtSignal(dict)
-
     def __init__(self, update_interval = None, **kwds):
         super().__init__(**kwds)
-        self.am_moving = False
         self.pos_dict = self.stage.position()
-
-        # Each time this timer fires we'll 'query' the stage for it's
-        # current position.
-        self.update_timer = QtCore.QTimer()
-        self.update_timer.setInterval(update_interval)
-        self.update_timer.timeout.connect(self.handleUpdateTimer)
-        self.update_timer.start()
+        self.pos_time = time.time()
 
         # Moving timer for absolute moves.
         self.moving_timer = QtCore.QTimer()
         self.moving_timer.setSingleShot(True)
         self.moving_timer.timeout.connect(self.handleMovingTimer)
 
-        # We need a 'relay' signal because when self.position() is called
-        # in the context of a HardwareWorker it will have stale information,
-        # in particular it might think the stage is not moving when it
-        # actually is. If the stage is moving we don't want to return
-        # whatever position the stage thinks it is at as this will likely
-        # be wrong.
-        self.positionUpdate.connect(self.handlePositionUpdate)
+        self.startPolling(update_interval)
 
     def goAbsolute(self, x, y):
         # Notify that the stage is moving.
         self.am_moving = True
         self.isMoving.emit(True)
 
-        # Stop the position update timer. Note that this alone is not
-        # sufficient to stop stale stage position information. This
-        # timer might have gone off just before self.goAbsolute() was
-        # called so there could be a position request queued up in
-        # the BufferedFunctionality().
-        #
+        # Stop the position update timer. Position queries that are
+        # already queued up in the BufferedFunctionality() are ignored
+        # until the move is finished.
         self.update_timer.stop()
         
         # Tell the stage to move.
@@ -171,33 +434,11 @@ class StageFunctionalityNF(StageFunctionality):
         self.stagePosition.emit(self.pos_dict)
         
     def handleMovingTimer(self):
-        self.isMoving.emit(False)
-        self.am_moving = False
-        
-        # Restart the position update timer.
-        self.update_timer.start()
-
-    def handlePositionUpdate(self, pos_dict):
-        # Only update and pass on the current stage position if we
-        # are not in the middle of a move.
-        if not self.am_moving:
-            self.pos_dict = pos_dict
-            self.stagePosition.emit(self.pos_dict)
-            
-    def handleUpdateTimer(self):
-        """
-        Query the stage for its current position.
-        """
-        self.mustRun(task = self.position,
-                     ret_signal = self.positionUpdate)
+        self.stopMoving()
 
     def position(self):
         return self.stage.position()
         
-    def wait(self):
-        self.update_timer.stop()
-        super().wait()
-        
 
 class StageModule(hardwareModule.HardwareModule):
     """
@@ -211,6 +452,15 @@ class StageModule(hardwareModule.HardwareModule):
         self.stage = None
         self.stage_functionality = None
 
+        #
+        # These are for 'Move Stage List' requests. Sub-classes should set
+        # the backlash (in microns) and the settle time (in seconds) that
+        # are appropriate for the stage.
+        #
+        self.backlash = 0.0
+        self.settle_time = 0.0
+        self.trajectory = []
+
         #
         # This is the default timeout for TCP requested moves. If the stage
         # does not respond that the move has completed in this time then we
@@ -310,25 +560,101 @@ class StageModule(hardwareModule.HardwareModule):
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"handled" : True}))
 
+        elif tcp_message.isType("Move Stage List"):
+            self.tcpMoveStageList(message, tcp_message)
+            message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                              data = {"handled" : True}))
+
         elif tcp_message.isType("Get Stage Position"):
             if not tcp_message.isTest():
-                pos_dict = self.stage_functionality.getCurrentPosition()
+                pos_dict = self.stage_functionality.getCurrentPosition(max_age = self.stage_functionality.max_age)
                 tcp_message.addResponse("stage_x", pos_dict["x"])
                 tcp_message.addResponse("stage_y", pos_dict["y"])
             message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
                                                               data = {"handled" : True}))
 
+    def tcpMoveStageList(self, message, tcp_message):
+        """
+        'Move Stage List' with a list of [x, y] positions plans the order
+        in which to visit them and moves to the first one. Without positions
+        it moves to the next position in the list. The response has the
+        index of the position (in the original list) and the number of
+        positions remaining. The planned order is also returned when the
+        positions are given, both in test mode and when moving.
+        """
+        positions = tcp_message.getData("positions")
+        if positions is not None:
+            start = None
+            pos_dict = self.stage_functionality.getCurrentPosition()
+            if pos_dict is not None:
+                start = [pos_dict["x"], pos_dict["y"]]
+            method = tcp_message.getData("order")
+            if method is None:
+                method = "tsp"
+            try:
+                order = planTrajectory(positions,
+                                       start = start,
+                                       method = method,
+                                       backlash = self.backlash)
+            except StageException as exception:
+                tcp_message.setError(True, str(exception))
+                return
+            tcp_message.addResponse("order", order)
+
+            if tcp_message.isTest():
+                tcp_message.addResponse("duration", 1 + self.settle_time)
+                return
+            self.trajectory = list(map(lambda x: [x, positions[x]], order))
+
+        elif tcp_message.isTest():
+            tcp_message.addResponse("duration", 1 + self.settle_time)
+            return
+
+        if (len(self.trajectory) == 0):
+            tcp_message.setError(True, "There are no more positions in the stage position list.")
+            return
+
+        [index, position] = self.trajectory.pop(0)
+        tcp_message.addResponse("index", index)
+        tcp_message.addResponse("remaining", len(self.trajectory))
+
+        pos_dict = self.stage_functionality.getCurrentPosition()
+        if pos_dict is not None:
+            moves = backlashMoves([pos_dict["x"], pos_dict["y"]], position, self.backlash)
+        else:
+            moves = [position]
+
+        # The handler does the moves and holds the message until they are done.
+        message.incRefCount()
+        TCPMoveHandler(hal_message = message,
+                       moves = moves,
+                       settle_time = self.settle_time,
+                       stage_functionality = self.stage_functionality,
+                       watchdog_timeout = self.watchdog_timeout)
+
 
 class TCPMoveHandler(QtCore.QObject):
+    """
+    Holds on to a HAL message until the stage has finished moving.
 
+    If moves is specified the handler tells the stage to go to each of the
+    positions in turn, otherwise the caller tells the stage to move. If
+    settle_time (in seconds) is specified the handler also waits this long
+    after the stage has stopped.
+    """
     def __init__(self,
                  hal_message = None,
+                 moves = None,
+                 settle_time = 0.0,
                  stage_functionality = None,
                  watchdog_timeout = None,
                  **kwds):
         super().__init__(**kwds)
         self.hal_message = hal_message
+        self.moves = moves
+        self.settle_time = settle_time
         self.stage_functionality = stage_functionality
+        self.watchdog_timeout = watchdog_timeout
 
         #
         # Set watch dog timer to fire in X milli-seconds. If this goes off we're
@@ -346,22 +672,49 @@ class TCPMoveHandler(QtCore.QObject):
         self.watchdog_timer.setSingleShot(True)
         self.watchdog_timer.start(watchdog_timeout)
 
+        self.settle_timer = QtCore.QTimer(self)
+        self.settle_timer.timeout.connect(self.handleSettleTimer)
+        self.settle_timer.setSingleShot(True)
+
         # Add this object as a tag on the message so that it won't get deleted
         # by the garbage collector.
         self.hal_message.tcp_move_handler = self
 
+        if self.moves is not None:
+            self.stage_functionality.isMoving.connect(self.handleIsMoving)
+            self.nextMove()
+
+    def finished(self):
+        """
+        Decrement the HAL message ref count so that message will get finalized.
+        """
+        self.watchdog_timer.stop()
+        self.hal_message.decRefCount()
+
+        # Delete the reference to this object so that it will get deleted
+        # by the garbage collector.
+        self.hal_message.tcp_move_handler = None
+
     def handleIsMoving(self, is_moving):
         #
-        # If the stage has stopped moving, decrement the HAL message
-        # ref count so that message will get finalized.
+        # If the stage has stopped moving, either start the next move,
+        # wait for the stage to settle or we are done.
         #
         if not is_moving:
-            self.hal_message.decRefCount()
+            if self.moves:
+                self.watchdog_timer.start(self.watchdog_timeout)
+                self.nextMove()
+                return
+
             self.stage_functionality.isMoving.disconnect(self.handleIsMoving)
+            if (self.settle_time > 0.0):
+                self.watchdog_timer.stop()
+                self.settle_timer.start(int(self.settle_time * 1.0e+3))
+            else:
+                self.finished()
 
-            # Delete the reference to this object so that it will get deleted
-            # by the garbage collector.
-            self.hal_message.tcp_move_handler = None
+    def handleSettleTimer(self):
+        self.finished()
 
     def handleWatchdogTimer(self):
         print("> stage move request timed out")
@@ -369,10 +722,11 @@ class TCPMoveHandler(QtCore.QObject):
         # If land here, then we're assuming the stage finished the move
         # but we missed this for some reason.
         #
-        self.hal_message.decRefCount()
         self.stage_functionality.isMoving.disconnect(self.handleIsMoving)
+        self.settle_timer.stop()
+        self.finished()
 
-        # Delete the reference to this object so that it will get deleted
-        # by the garbage collector.
-        self.hal_message.tcp_move_handler = None
+    def nextMove(self):
+        [x, y] = self.moves.pop(0)
+        self.stage_functionality.goAbsolute(x, y)
         
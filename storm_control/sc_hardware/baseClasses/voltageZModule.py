@@ -64,10 +64,20 @@ class VoltageZFunctionality(hardwareModule.HardwareFunctionality, lockModule.ZSt
             z_pos = z_pos*self.microns_to_volts
         return z_pos
 
-    def getDaqWaveform(self, waveform):
-        waveform = np.array([self.micronsToVolt(x) for x in waveform])
+    def getCalibration(self):
+        return super().getCalibration() + (self.ao_fn.getSource(),
+                                           self.invert_signal,
+                                           self.microns_to_volts)
+
+    def getDaqWaveform(self, waveform, oversampling = 1, key = None):
+        # This is the same as micronsToVolt() but for the whole waveform at once.
+        waveform = np.clip(waveform, self.minimum, self.maximum) * self.microns_to_volts
+        if self.invert_signal:
+            waveform = 10.0 - waveform
         return daqModule.DaqWaveform(source = self.ao_fn.getSource(),
-                                     waveform = waveform)
+                                     waveform = waveform,
+                                     oversampling = oversampling,
+                                     key = key)
             
     def goAbsolute(self, z_pos, invert = False):
         if self.ao_fn.amFilming():
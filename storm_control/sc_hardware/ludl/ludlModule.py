@@ -28,14 +28,19 @@ class LudlStageFunctionality(stageModule.StageFunctionalityNF):
 
 class LudlStageRS232(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    @staticmethod
+    def initializeHardware(module_params):
+        configuration = module_params.get("configuration")
+        stage = ludl.LudlRS232(port = configuration.get("com_port"))
+        if stage.getStatus():
+            stage.setVelocity(10000,10000)
+        return stage
+        
+    def __init__(self, hardware = None, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
         
-        configuration = module_params.get("configuration")
-        self.stage = ludl.LudlRS232(port = configuration.get("com_port"))
-
+        self.stage = hardware
         if self.stage.getStatus():
-            self.stage.setVelocity(10000,10000)
             self.stage_functionality = LudlStageFunctionality(device_mutex = QtCore.QMutex(),
                                                               stage = self.stage,
                                                               update_interval = 500)
@@ -45,14 +50,19 @@ class LudlStageRS232(stageModule.StageModule):
             
 class LudlStageTCP(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    @staticmethod
+    def initializeHardware(module_params):
+        configuration = module_params.get("configuration")
+        stage = ludl.LudlTCP(ip_address = configuration.get("ip_address"))
+        if stage.getStatus():
+            stage.setVelocity(10000,10000)
+        return stage
+    
+    def __init__(self, hardware = None, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
         
-        configuration = module_params.get("configuration")
-        self.stage = ludl.LudlTCP(ip_address = configuration.get("ip_address"))
-
+        self.stage = hardware
         if self.stage.getStatus():
-            self.stage.setVelocity(10000,10000)
             self.stage_functionality = LudlStageFunctionality(stage = self.stage,
                                                               update_interval = 500)
         else:
@@ -47,6 +47,7 @@ class MarzhauserStageFunctionality(stageModule.StageFunctionality):
 
     def handleStagePosition(self, pos_dict):
         self.pos_dict = pos_dict
+        self.pos_time = time.time()
         self.querying = False
 
     def handleUpdateTimer(self):
@@ -196,19 +197,29 @@ class MarzhauserStageFunctionalityNF(stageModule.StageFunctionalityNF):
 
 class MarzhauserStage(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    @staticmethod
+    def initializeHardware(module_params):
+        configuration = module_params.get("configuration")
+        stage = marzhauser.MarzhauserRS232(baudrate = configuration.get("baudrate"),
+                                           port = configuration.get("port"))
+        if stage.getStatus():
+            # Set (maximum) stage velocity.
+            velocity = configuration.get("velocity")
+            stage.setVelocity(velocity, velocity)
+
+            # Allow to enable or disable joystick from the configuration file
+            joystick = configuration.get("joystick", default = True)
+            stage.joystickOnOff(joystick)
+        return stage
+    
+    def __init__(self, hardware = None, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
 
         configuration = module_params.get("configuration")
         polling = configuration.get("polling", default = True)
         
-        self.stage = marzhauser.MarzhauserRS232(baudrate = configuration.get("baudrate"),
-                                                port = configuration.get("port"))
+        self.stage = hardware
         if self.stage.getStatus():
-            # Set (maximum) stage velocity.
-            velocity = configuration.get("velocity")
-            self.stage.setVelocity(velocity, velocity)
-
             if polling:
                 print('\tstage polling is on')
                 self.stage_functionality = MarzhauserStageFunctionality(device_mutex = QtCore.QMutex(),
@@ -219,10 +230,5 @@ class MarzhauserStage(stageModule.StageModule):
                 self.stage_functionality = MarzhauserStageFunctionalityNF(device_mutex = QtCore.QMutex(),
                                                                         stage = self.stage,
                                                                         update_interval = 500)
-
-            # Allow to enable or disable joystick from the configuration file
-            joystick = configuration.get("joystick", default = True)
-            self.stage.joystickOnOff(joystick)
-
         else:
             self.stage = None
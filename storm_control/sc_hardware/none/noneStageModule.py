@@ -52,7 +52,6 @@ class NoneStage(QtCore.QObject):
 
 
 class NoneStageFunctionality(stageModule.StageFunctionality):
-    positionUpdate = QtCore.pyqtSignal(dict)
     
     def __init__(self, update_interval = None, **kwds):
         """
@@ -60,7 +59,6 @@ class NoneStageFunctionality(stageModule.StageFunctionality):
                           like 500 is usually good.
         """
         super().__init__(**kwds)
-        self.am_moving = False
         self.pos_dict = self.stage.position()
 
         # Pretend it takes 200ms to move, regardless of the actual distance.
@@ -69,21 +67,8 @@ class NoneStageFunctionality(stageModule.StageFunctionality):
         self.move_timer.setInterval(200)
         self.move_timer.setSingleShot(True)
         self.move_timer.timeout.connect(self.handleMoveTimer)
-        
-        # Each time this timer fires we'll 'query' the stage for it's
-        # current position.
-        #
-        self.update_timer = QtCore.QTimer()
-        self.update_timer.setInterval(update_interval)
-        self.update_timer.timeout.connect(self.handleUpdateTimer)
-        self.update_timer.start()
-
-        # We use a 'relay' signal as the stage might return
-        # stale information when it is moving. However the
-        # HardwareWorker that is querying the stage might not
-        # know that the stage is moving.
-        #
-        self.positionUpdate.connect(self.handlePositionUpdate)
+
+        self.startPolling(update_interval)
 
     def goAbsolute(self, x, y):
         self.am_moving = True
@@ -97,29 +82,11 @@ class NoneStageFunctionality(stageModule.StageFunctionality):
         self.move_timer.start()
 
     def handleMoveTimer(self):
-        self.isMoving.emit(False)
-        self.am_moving = False
-        self.update_timer.start()
-
-    def handlePositionUpdate(self, pos_dict):
-        if not self.am_moving:
-            self.pos_dict = pos_dict
-            self.stagePosition.emit(self.pos_dict)
-            
-    def handleUpdateTimer(self):
-        """
-        Query the stage for its current position.
-        """
-        self.mustRun(task = self.position,
-                     ret_signal = self.positionUpdate)
+        self.stopMoving()
 
     def position(self):
         return self.stage.position()
 
-    def wait(self):
-        self.update_timer.stop()
-        super().wait()
-
 
 class NoneStageFunctionalityBroken(NoneStageFunctionality):
     """
@@ -141,6 +108,10 @@ class NoneStageModule(stageModule.StageModule):
         # Set (maximum) stage velocity.
         velocity = configuration.get("velocity")
         self.stage.setVelocity(velocity, velocity)
+
+        # Backlash (microns) and settle time (seconds) for 'Move Stage List'.
+        self.backlash = configuration.get("backlash", 0.0)
+        self.settle_time = configuration.get("settle_time", 0.0)
         
         self.stage_functionality = NoneStageFunctionality(device_mutex = QtCore.QMutex(),
                                                           stage = self.stage,
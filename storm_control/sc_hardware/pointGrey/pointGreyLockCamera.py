@@ -13,8 +13,6 @@ import storm_control.sc_hardware.utility.sa_lock_peak_finder as slpf
 
 import storm_control.sc_hardware.pointGrey.spinnaker as spinnaker
 
-import tifffile
-
 
 class LockCamera(QtCore.QThread):
     """
@@ -205,8 +203,12 @@ class AFLockCamera(LockCamera):
         t2 = list(map(int, parameters.get("roi2").split(",")))
         self.roi2 = (slice(t2[0], t2[1]), slice(t2[2], t2[3]))
 
-        self.afc = afLC.AFLockC(offset = parameters.get("background"),
-                                downsample = parameters.get("downsample"))
+        if afLC.af is not None:
+            self.afc = afLC.AFLockC(offset = parameters.get("background"),
+                                    downsample = parameters.get("downsample"))
+        else:
+            self.afc = afLC.AFLockNumpy(offset = parameters.get("background"),
+                                        downsample = parameters.get("downsample"))
 
         assert (self.reps >= self.min_good), "'reps' must be >= 'min_good'."
 
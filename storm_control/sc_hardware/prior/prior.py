@@ -31,7 +31,7 @@ class Prior(RS232.RS232):
 
         try:
             super().__init__(**kwds)
-            device_info = self._command("?")
+            device_info = self._command("?", end_of_response = "END\r")
             if not device_info:
                 self.live = False
         except Exception:
@@ -54,8 +54,8 @@ class Prior(RS232.RS232):
             self.setEncoderWindow("X", 2)
             self.setEncoderWindow("Y", 2)
 
-    def _command(self, command):
-        response = self.commWithResp(command)
+    def _command(self, command, end_of_response = "\r"):
+        response = self.commWithResp(command, end_of_response = end_of_response)
         if response:
             return response.split("\r")
 
@@ -106,7 +106,7 @@ class Prior(RS232.RS232):
         return self.has_device[device_name]
     
     def info(self):
-        return self._command("?")
+        return self._command("?", end_of_response = "END\r")
 
     def jog(self, x_speed, y_speed):
         """
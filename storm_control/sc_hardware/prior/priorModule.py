@@ -49,7 +49,19 @@ class PriorStageFunctionality(stageModule.StageFunctionalityNF):
 #
 class PriorController(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
+    @staticmethod
+    def initializeHardware(module_params):
+        configuration = module_params.get("configuration")
+        controller = prior.Prior(baudrate = configuration.get("baudrate"),
+                                 port = configuration.get("port"))
+
+        # If we have an XY stage, set the (maximum) stage velocity.
+        if controller.getStatus() and controller.hasDevice("stage"):
+            velocity = configuration.get("velocity")
+            controller.setVelocity(velocity, velocity)
+        return controller
+    
+    def __init__(self, hardware = None, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
         self.controller_mutex = QtCore.QMutex()
         self.focus_functionality = None
@@ -57,8 +69,7 @@ class PriorController(stageModule.StageModule):
         self.fwheel2_functionality = None
 
         configuration = module_params.get("configuration")
-        self.controller = prior.Prior(baudrate = configuration.get("baudrate"),
-                                      port = configuration.get("port"))
+        self.controller = hardware
         
         if self.controller.getStatus():
 
@@ -68,10 +79,6 @@ class PriorController(stageModule.StageModule):
                 # We do this so that the superclass works correctly."
                 self.stage = self.controller
 
-                # If we do, set the (maximum) stage velocity.
-                velocity = configuration.get("velocity")
-                self.controller.setVelocity(velocity, velocity)
-
                 self.stage_functionality = PriorStageFunctionality(device_mutex = self.controller_mutex,
                                                                    stage = self.controller,
                                                                    update_interval = 500)
@@ -2,10 +2,17 @@
 """
 Wraps the pySerial library for RS232 communication.
 
+A reader thread puts everything that is received into a buffer and the
+methods that wait for a response are woken up as soon as the data they
+are waiting for arrives, so that there is no polling delay. Commands
+that expect a response hold a lock so that the response is not read by
+another thread that is using the same port.
+
 Hazen 3/09
 """
 
 import serial
+import threading
 import time
 
 
@@ -22,6 +29,7 @@ class RS232(object):
                  port = None,
                  timeout = 1.0e-3,
                  wait_time = 1.0e-2,
+                 end_of_response = None,
                  **kwds):
         """
         port - The port for RS-232 communication, e.g. "COM4".
@@ -30,45 +38,66 @@ class RS232(object):
         end_of_line - What character(s) are used to indicate the end of a line.
         wait_time - How long to wait between polling events before it is decided 
                     that there is no new data available on the port. 
+        end_of_response - What character(s) are used to indicate the end of a
+                          response. If this is set then commWithResp() returns
+                          as soon as it is received instead of waiting until
+                          there is no new data.
         """
         super().__init__(**kwds)
+        self.buffer = bytearray()
+        self.buffer_cv = threading.Condition()
+        self.comm_lock = threading.RLock()
         self.encoding = encoding
         self.end_of_line = end_of_line
+        self.end_of_response = end_of_response
         self.live = True
+        self.reader = None
+        self.reading = False
+        self.timeout = timeout
+        self.tty = None
         self.wait_time = wait_time
         try:
-            self.tty = serial.Serial(port, baudrate, timeout = timeout)
+            # The reader thread checks whether it should stop this often.
+            self.tty = serial.Serial(port, baudrate, timeout = 0.1)
             self.tty.flush()
             time.sleep(self.wait_time)
+            self.reading = True
+            self.reader = threading.Thread(target = self.readerThread, daemon = True)
+            self.reader.start()
         except serial.serialutil.SerialException as e:
             print("RS232 Error:", type(e), str(e))
             self.live = False
 
-    def commWithResp(self, command):
+    def clearBuffer(self):
+        """
+        Discard any data that has been received.
+        """
+        with self.buffer_cv:
+            self.buffer.clear()
+
+    def commWithResp(self, command, end_of_response = None):
         """
         Send a command and wait (a little) for a response.
+
+        end_of_response - (Optional) The end of the response, defaults to
+                          the end_of_response of the port.
         """
-        self.sendCommand(command)
-        time.sleep(10 * self.wait_time)
-        response = ""
-        response_len = self.tty.inWaiting()
-        while response_len:
-            response += self.read(response_len)
-            time.sleep(self.wait_time)
-            response_len = self.tty.inWaiting()
-        if len(response) > 0:
-            return response
+        if end_of_response is None:
+            end_of_response = self.end_of_response
+        with self.comm_lock:
+            self.sendCommand(command)
+            response = self.readResponse(time.time() + 10 * self.wait_time, end_of_response)
+            if len(response) > 0:
+                return response
 
     def getResponse(self):
         """
         Wait (a little) for a response.
         """
-        response = ""
-        response_len = self.tty.inWaiting()
-        while response_len:
-            response += self.read(response_len)
-            time.sleep(self.wait_time)
-            response_len = self.tty.inWaiting()
+        with self.buffer_cv:
+            if (len(self.buffer) == 0):
+                return None
+        response = self.readResponse(time.time(), None)
         if len(response) > 0:
             return response
 
@@ -79,15 +108,65 @@ class RS232(object):
         return self.live
 
     def read(self, response_len):
-        response = self.tty.read(response_len)
-        return response.decode(self.encoding)
+        with self.buffer_cv:
+            self.buffer_cv.wait_for(lambda : (len(self.buffer) >= response_len), self.timeout)
+            return self.take(response_len)
+
+    def readerThread(self):
+        """
+        Read from the port until shutDown() is called.
+        """
+        while self.reading:
+            try:
+                data = self.tty.read(max(1, self.tty.in_waiting))
+            except (AttributeError, OSError, serial.serialutil.SerialException):
+                break
+            if (len(data) > 0):
+                with self.buffer_cv:
+                    self.buffer.extend(data)
+                    self.buffer_cv.notify_all()
+
+    def readline(self, timeout = -1):
+        """
+        Wait for an end of line ("\\n") character, or for timeout seconds,
+        defaults to the port timeout.
+        """
+        if (timeout == -1):
+            timeout = self.timeout
+        with self.buffer_cv:
+            self.buffer_cv.wait_for(lambda : (self.buffer.find(b"\n") != -1), timeout)
+            index = self.buffer.find(b"\n")
+            if (index != -1):
+                return self.take(index + 1).strip()
+            else:
+                return self.take(len(self.buffer)).strip()
+
+    def readResponse(self, deadline, end_of_response):
+        """
+        Returns once end_of_response is received, or once the deadline
+        has passed and there is no new data.
+        """
+        if end_of_response:
+            end_of_response = end_of_response.encode(self.encoding)
+        with self.buffer_cv:
+            while True:
+                if end_of_response:
+                    index = self.buffer.find(end_of_response)
+                    if (index != -1):
+                        return self.take(index + len(end_of_response))
+
+                # Wait for more data.
+                size = len(self.buffer)
+                timeout = max(deadline - time.time(), self.wait_time)
+                if not self.buffer_cv.wait_for(lambda : (len(self.buffer) > size), timeout):
+                    if (time.time() >= deadline):
+                        return self.take(len(self.buffer))
 
-    def readline(self):
-        response = self.tty.readline()
-        return response.decode(self.encoding).strip()
-        
     def sendCommand(self, command):
-        self.tty.flush()
+        """
+        Send a command, any (old) data that has not been read is discarded.
+        """
+        self.clearBuffer()
         self.write(command + self.end_of_line)
 
     def shutDown(self):
@@ -95,8 +174,20 @@ class RS232(object):
         Closes the RS-232 port.
         """
         if self.live:
+            self.reading = False
+            self.reader.join()
+            self.tty.close()
             self.tty = None
 
+    def take(self, size):
+        """
+        Remove size bytes from the buffer and return them as a string. This
+        must be called with self.buffer_cv acquired.
+        """
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data.decode(self.encoding)
+
     def waitResponse(self, end_of_response = False, max_attempts = 200):
         """
         Waits much longer for a response. This is the method to use if
@@ -107,17 +198,14 @@ class RS232(object):
         """
         if not end_of_response:
             end_of_response = str(self.end_of_line)
-        attempts = 0
-        response = ""
-        index = -1
-        while (index == -1) and (attempts < max_attempts):
-            response_len = self.tty.inWaiting()
-            if response_len > 0:
-                response += self.read(response_len)
-            time.sleep(self.wait_time)
-            index = response.find(end_of_response)
-            attempts += 1
-        return response
+        eor = end_of_response.encode(self.encoding)
+        with self.buffer_cv:
+            self.buffer_cv.wait_for(lambda : (self.buffer.find(eor) != -1), max_attempts * self.wait_time)
+            index = self.buffer.find(eor)
+            if (index != -1):
+                return self.take(index + len(eor))
+            else:
+                return self.take(len(self.buffer))
 
     def write(self, string):
         self.tty.write(string.encode(self.encoding))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+A pseudo-terminal that behaves like a RS-232 device. This is for testing
+the RS232 class (and the hardware classes that use it) without hardware,
+it only works on POSIX systems.
+"""
+
+import os
+import select
+import threading
+import time
+import tty
+
+
+class PtyDevice(object):
+    """
+    The device calls responder with each command that it receives (without
+    the end of line character). The responder returns the response as a
+    string, a list of strings that are sent delay seconds apart, or None if
+    there is no response.
+    """
+    def __init__(self, responder = None, delay = 0.0, encoding = "utf-8", end_of_line = "\r", **kwds):
+        """
+        responder - The function that creates the responses.
+        delay - How long the device takes to respond in seconds.
+        encoding - The encoding of the commands and responses.
+        end_of_line - What character(s) are used to indicate the end of a command.
+        """
+        super().__init__(**kwds)
+        self.commands = []
+        self.delay = delay
+        self.encoding = encoding
+        self.end_of_line = end_of_line.encode(encoding)
+        self.responder = responder
+
+        [self.master, self.slave] = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self.running = True
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def getCommands(self):
+        """
+        Return the commands that the device has received.
+        """
+        return self.commands
+
+    def getPort(self):
+        """
+        Return the name of the port to use with RS232.
+        """
+        return self.port
+
+    def run(self):
+        data = b""
+        while self.running:
+            [ready, write, error] = select.select([self.master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                data += os.read(self.master, 1024)
+            except OSError:
+                break
+            index = data.find(self.end_of_line)
+            while (index != -1):
+                command = data[:index].decode(self.encoding)
+                data = data[index + len(self.end_of_line):]
+                self.commands.append(command)
+                if self.responder is not None:
+                    response = self.responder(command)
+                    if isinstance(response, str):
+                        response = [response]
+                    if response is not None:
+                        for part in response:
+                            if (self.delay > 0.0):
+                                time.sleep(self.delay)
+                            self.send(part)
+                index = data.find(self.end_of_line)
+
+    def send(self, string):
+        """
+        Send (unsolicited) data to the port.
+        """
+        os.write(self.master, string.encode(self.encoding))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Compare the per-offset latency of the C, numpy and Python versions
+of the focus lock fitting code.
+
+$ python benchmark_lock_fitting.py
+"""
+import numpy
+import time
+
+import storm_control.sc_hardware.utility.af_lock_c as afLC
+import storm_control.sc_hardware.utility.corr_2d_gauss_c as corr2DGauss
+
+
+def drawGaussians(size, x, y, sigma = 1.0):
+    xi = numpy.arange(size[0])[:,None]
+    yi = numpy.arange(size[1])[None,:]
+    image = numpy.zeros(size)
+    for i in range(x.size):
+        image += numpy.exp(-((xi - x[i])**2 + (yi - y[i])**2)/(2.0*sigma*sigma))
+    return image
+
+
+def timeIt(fn, reps):
+    start_time = time.time()
+    for i in range(reps):
+        fn(i)
+    return 1000.0 * (time.time() - start_time)/reps
+
+
+def benchmarkAFLock(size = (64, 128), downsample = 2, reps = 100):
+    """
+    Autofocus lock, two spots in a uint16 image.
+    """
+    images = []
+    for i in range(10):
+        x = numpy.array([0.5*size[0], 1.5*size[0]]) + numpy.random.uniform(-2.0, 2.0, 2)
+        y = 0.5*size[1] + numpy.random.uniform(-10.0, 10.0, 2)
+        im = 100.0 * drawGaussians((2*size[0], size[1]), x, y, sigma = downsample)
+        images.append(im.astype(numpy.uint16))
+
+    print("Autofocus lock, {0:d}x{1:d}, downsample {2:d}".format(size[0], size[1], downsample))
+
+    fitters = [["numpy", afLC.AFLockNumpy(downsample = downsample)]]
+    if afLC.af is not None:
+        fitters.append(["C", afLC.AFLockC(downsample = downsample)])
+    else:
+        print("  C library not available.")
+
+    for [name, afc] in fitters:
+        def fn(i):
+            im = images[i%len(images)]
+            afc.findOffsetU16NM(im[:size[0],:], im[size[0]:,:], verbose = False)
+        print("  {0:6s} {1:.3f}ms".format(name, timeIt(fn, reps)))
+        afc.cleanup()
+
+    # The Python reference version does not downsample or use Newton's method.
+    afc = afLC.AFLockPy()
+    def fn(i):
+        im = images[i%len(images)]
+        afc.findOffset(im[:size[0],:], im[size[0]:,:])
+    print("  {0:6s} {1:.3f}ms (no downsampling, CG solver)".format("python", timeIt(fn, max(1, reps//10))))
+
+
+def benchmarkCorr2DGauss(size = (16, 16), reps = 100):
+    """
+    Correlation with a 2D Gaussian.
+    """
+    images = []
+    for i in range(10):
+        disp = numpy.random.uniform(-1.0, 1.0, 2)
+        images.append(drawGaussians(size,
+                                    numpy.array([0.5 * size[0] - 0.5 + disp[0]]),
+                                    numpy.array([0.5 * size[1] - 0.5 + disp[1]])))
+
+    print("Correlation 2D Gaussian, {0:d}x{1:d}".format(size[0], size[1]))
+
+    fitters = [["numpy", corr2DGauss.Corr2DGaussNumpyNCG(size = size, sigma = 1.0, verbose = False)],
+               ["python", corr2DGauss.Corr2DGaussPyNCG(size = size, sigma = 1.0)]]
+    if corr2DGauss.c2dg is not None:
+        fitters.append(["C", corr2DGauss.Corr2DGaussCNCG(size = size, sigma = 1.0, verbose = False)])
+    else:
+        print("  C library not available.")
+
+    for [name, c2dg] in fitters:
+        def fn(i):
+            c2dg.setImage(images[i%len(images)])
+            c2dg.maximize()
+        print("  {0:6s} {1:.3f}ms".format(name, timeIt(fn, reps)))
+        c2dg.cleanup()
+
+
+if (__name__ == "__main__"):
+    benchmarkAFLock()
+    benchmarkCorr2DGauss()
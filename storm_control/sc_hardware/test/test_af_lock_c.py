@@ -38,6 +38,32 @@ def test_afLCPy():
                               rtol = 1.0e-3))
         
 
+# 2D numpy version.
+def test_afLCNumpy():
+    afc = afLC.AFLockNumpy(offset = 0.0)
+
+    cx = 16.0
+    cy = 32.0
+
+    for i in range(10):
+        x1_off = cx + 10.0 * (random.random() - 0.5)
+        y1_off = cy + 40.0 * (random.random() - 0.5)
+
+        x2_off = cx + 10.0 * (random.random() - 0.5)
+        y2_off = cy + 40.0 * (random.random() - 0.5)
+        
+        im1 = dg.drawGaussiansXY((32,64), numpy.array([x1_off]), numpy.array([y1_off]))
+        im2 = dg.drawGaussiansXY((32,64), numpy.array([x2_off]), numpy.array([y2_off]))
+        
+        [dx, dy, res, mag] = afc.findOffset(im1, im2)
+
+        assert(res.success)
+        assert(numpy.allclose(numpy.array([dx, dy]),
+                              numpy.array([x1_off - x2_off, y1_off - y2_off]),
+                              atol = 1.0e-3,
+                              rtol = 1.0e-3))
+
+
 # 1D Python version.
 def test_afLCPy1D():
     afc = afLC.AFLockPy1D(offset = 0.0)
@@ -282,6 +308,56 @@ def test_afLC_ds_u16_nm():
                               atol = 1.0e-2,
                               rtol = 1.0e-2))
 
+
+# Test numpy cost, gradient and hessian calculation.
+def test_numpy_vs_python():
+    afc_py = afLC.AFLockPy(offset = 0.0)
+    afc_np = afLC.AFLockNumpy(offset = 0.0)
+
+    im1 = dg.drawGaussiansXY((32,64), numpy.array([8.0]), numpy.array([16.0]))
+    im2 = dg.drawGaussiansXY((32,64), numpy.array([9.5]), numpy.array([14.0]))
+
+    # Initialize fitter.
+    [dx_py, dy_py, res, mag_py] = afc_py.findOffset(im1, im2)
+    [dx_np, dy_np, res, mag_np] = afc_np.findOffset(im1, im2)
+    assert(numpy.allclose(numpy.array([dx_py, dy_py, mag_py]), numpy.array([dx_np, dy_np, mag_np])))
+
+    for i in range(10):
+        v1 = numpy.random.normal(size = 2)
+        assert(numpy.allclose(afc_py.cost(v1), afc_np.cost(v1)))
+        assert(numpy.allclose(afc_py.gradCost(v1), afc_np.gradCost(v1)))
+        assert(numpy.allclose(afc_py.hessCost(v1), afc_np.hessCost(v1)))
+
+
+# 2D numpy version, downsampled, uint16 images. (Numpy Newton's method solver).
+def test_afLNumpy_ds_u16_nm():
+    downsample = 4
+    afc = afLC.AFLockNumpy(offset = 0.0, downsample = downsample)
+
+    cx = 32.0
+    cy = 64.0
+
+    for i in range(10):
+        x1_off = cx + 10.0 * (random.random() - 0.5)
+        y1_off = cy + 40.0 * (random.random() - 0.5)
+
+        x2_off = 3*cx + 10.0 * (random.random() - 0.5)
+        y2_off = cy + 40.0 * (random.random() - 0.5)
+        
+        im = dg.drawGaussiansXY((128,128),
+                                numpy.array([x1_off, x2_off]),
+                                numpy.array([y1_off, y2_off]),
+                                sigma = downsample)
+        im = (100.0*im).astype(numpy.uint16)
+        
+        [dx, dy, res, mag] = afc.findOffsetU16NM(im[:64,:], im[64:,:])
+
+        assert res, "Fitting failed."
+        assert(numpy.allclose(numpy.array([downsample*dx, downsample*dy]),
+                              numpy.array([x1_off - x2_off + 2.0*cx, y1_off - y2_off]),
+                              atol = 1.0e-2,
+                              rtol = 1.0e-2))
+
         
 if (__name__ == "__main__"):
     test_afLC_ds_u16_nm()
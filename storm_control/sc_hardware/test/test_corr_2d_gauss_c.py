@@ -131,6 +131,44 @@ def test_c_vs_python():
         assert(abs(c2dg_py.ddy(x) - c2dg_c.ddy(x)) < 1.0e-6)
 
 
+def test_numpy_vs_python():
+    
+    # Test numpy version against Python version.
+    im_size = (9,10)
+    c2dg_py = corr2DGauss.Corr2DGaussPy(size = im_size, sigma = 1.0)
+    c2dg_np = corr2DGauss.Corr2DGaussNumpy(size = im_size, sigma = 1.0)
+
+    x = numpy.zeros(2)
+    image = c2dg_py.translate(x)
+        
+    c2dg_py.setImage(image)
+    c2dg_np.setImage(image)
+
+    for i in range(-3,4):
+        x = numpy.array([0.1*i, -0.05*i])
+        assert(abs(c2dg_py.func(x) - c2dg_np.func(x)) < 1.0e-6)
+        assert(abs(c2dg_py.dx(x) - c2dg_np.dx(x)) < 1.0e-6)
+        assert(abs(c2dg_py.dy(x) - c2dg_np.dy(x)) < 1.0e-6)
+        assert(abs(c2dg_py.ddx(x) - c2dg_np.ddx(x)) < 1.0e-6)
+        assert(abs(c2dg_py.ddy(x) - c2dg_np.ddy(x)) < 1.0e-6)
+
+
+def test_offset_numpy():
+
+    # Test finding the correct offset (numpy version).
+    im_size = (9,9)
+    c2dg_np = corr2DGauss.Corr2DGaussNumpyNCG(size = im_size, sigma = 1.0)
+    c2dg_py = corr2DGauss.Corr2DGaussPyNCG(size = im_size, sigma = 1.0)
+
+    for i in range(-2,3):
+        disp = numpy.array([0.1*i, -0.2*i])
+        image = c2dg_py.translate(disp)
+        c2dg_np.setImage(image)
+        [dd, success, fn, status] = c2dg_np.maximize()
+        assert(success)
+        assert(numpy.allclose(dd, disp, atol = 1.0e-3, rtol = 1.0e-3))
+
+
 def test_offset_c():
 
     # Test finding the correct offset (C version).
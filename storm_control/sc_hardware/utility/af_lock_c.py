@@ -7,15 +7,20 @@ Hazen 09/19
 import ctypes
 import numpy
 from numpy.ctypeslib import ndpointer
-import scipy
-import scipy.misc
-import scipy.optimize
 
 import storm_control.c_libraries.loadclib as loadclib
+import storm_control.sc_library.lazyImport as lazyImport
+
+# This is only needed by the Python / numpy fitters.
+scipy = lazyImport.lazyImport("scipy.optimize")
 
 
 # Load C library.
-af = loadclib.loadCLibrary("af_lock")
+try:
+    af = loadclib.loadCLibrary("af_lock")
+except OSError:
+    print("C autofocus lock library not found, reverting to numpy.")
+    af = None
 
 
 #
@@ -57,76 +62,77 @@ class afLockData(ctypes.Structure):
 
     
 # C interface definition.
-af.aflCalcShift.argtypes = [ctypes.POINTER(afLockData)]
+if af is not None:
+    af.aflCalcShift.argtypes = [ctypes.POINTER(afLockData)]
 
-af.aflCleanup.argtypes = [ctypes.POINTER(afLockData)]
+    af.aflCleanup.argtypes = [ctypes.POINTER(afLockData)]
 
-af.aflCost.argtypes = [ctypes.POINTER(afLockData),
-                       ctypes.c_double,
-                       ctypes.c_double]
+    af.aflCost.argtypes = [ctypes.POINTER(afLockData),
+                           ctypes.c_double,
+                           ctypes.c_double]
 
-af.aflCostGradient.argtypes = [ctypes.POINTER(afLockData),
-                               ctypes.c_double,
-                               ctypes.c_double]
+    af.aflCostGradient.argtypes = [ctypes.POINTER(afLockData),
+                                   ctypes.c_double,
+                                   ctypes.c_double]
 
-af.aflCostHessian.argtypes = [ctypes.POINTER(afLockData),
-                              ctypes.c_double,
-                              ctypes.c_double]
+    af.aflCostHessian.argtypes = [ctypes.POINTER(afLockData),
+                                  ctypes.c_double,
+                                  ctypes.c_double]
 
-af.aflGetCost.argtypes = [ctypes.POINTER(afLockData),
-                          ndpointer(dtype=numpy.float64)]
+    af.aflGetCost.argtypes = [ctypes.POINTER(afLockData),
+                              ndpointer(dtype=numpy.float64)]
 
-af.aflGetCostGradient.argtypes = [ctypes.POINTER(afLockData),
-                                  ndpointer(dtype=numpy.float64)]
+    af.aflGetCostGradient.argtypes = [ctypes.POINTER(afLockData),
+                                      ndpointer(dtype=numpy.float64)]
 
-af.aflGetCostHessian.argtypes = [ctypes.POINTER(afLockData),
-                                 ndpointer(dtype=numpy.float64)]
+    af.aflGetCostHessian.argtypes = [ctypes.POINTER(afLockData),
+                                     ndpointer(dtype=numpy.float64)]
 
-af.aflGetMag.argtypes = [ctypes.POINTER(afLockData),
-                         ndpointer(dtype=numpy.float64)]
+    af.aflGetMag.argtypes = [ctypes.POINTER(afLockData),
+                             ndpointer(dtype=numpy.float64)]
 
-af.aflGetOffset.argtypes = [ctypes.POINTER(afLockData),
-                            ndpointer(dtype=numpy.float64)]
+    af.aflGetOffset.argtypes = [ctypes.POINTER(afLockData),
+                                ndpointer(dtype=numpy.float64)]
 
-af.aflGetVector.argtypes = [ctypes.POINTER(afLockData),
-                            ndpointer(dtype=numpy.float64),
-                            ctypes.c_int]
+    af.aflGetVector.argtypes = [ctypes.POINTER(afLockData),
+                                ndpointer(dtype=numpy.float64),
+                                ctypes.c_int]
 
-af.aflInitialize.argtypes = [ctypes.c_int,
-                             ctypes.c_int,
-                             ctypes.c_int]
-af.aflInitialize.restype = ctypes.POINTER(afLockData)
+    af.aflInitialize.argtypes = [ctypes.c_int,
+                                 ctypes.c_int,
+                                 ctypes.c_int]
+    af.aflInitialize.restype = ctypes.POINTER(afLockData)
 
-af.aflMinimizeNM.argtypes = [ctypes.POINTER(afLockData),
-                             ctypes.c_double,
-                             ctypes.c_int]
-af.aflMinimizeNM.restype = ctypes.c_int
+    af.aflMinimizeNM.argtypes = [ctypes.POINTER(afLockData),
+                                 ctypes.c_double,
+                                 ctypes.c_int]
+    af.aflMinimizeNM.restype = ctypes.c_int
 
-af.aflNewImage.argtypes = [ctypes.POINTER(afLockData),
-                           ndpointer(dtype=numpy.float64),
-                           ndpointer(dtype=numpy.float64),
-                           ctypes.c_double,
-                           ctypes.c_double]
+    af.aflNewImage.argtypes = [ctypes.POINTER(afLockData),
+                               ndpointer(dtype=numpy.float64),
+                               ndpointer(dtype=numpy.float64),
+                               ctypes.c_double,
+                               ctypes.c_double]
+
+    af.aflNewImageU16.argtypes = [ctypes.POINTER(afLockData),
+                                  ndpointer(dtype=numpy.uint16),
+                                  ndpointer(dtype=numpy.uint16),
+                                  ctypes.c_double,
+                                  ctypes.c_double]
 
-af.aflNewImageU16.argtypes = [ctypes.POINTER(afLockData),
-                              ndpointer(dtype=numpy.uint16),
-                              ndpointer(dtype=numpy.uint16),
-                              ctypes.c_double,
-                              ctypes.c_double]
+    af.aflRebin.argtypes = [ctypes.POINTER(afLockData),
+                            ndpointer(dtype=numpy.float64),
+                            ctypes.c_double]
 
-af.aflRebin.argtypes = [ctypes.POINTER(afLockData),
-                        ndpointer(dtype=numpy.float64),
-                        ctypes.c_double]
+    af.aflRebinU16.argtypes = [ctypes.POINTER(afLockData),
+                               ndpointer(dtype=numpy.float64),
+                               ctypes.c_double]
 
-af.aflRebinU16.argtypes = [ctypes.POINTER(afLockData),
-                           ndpointer(dtype=numpy.float64),
-                           ctypes.c_double]
+    af.aflSolveStep.argtypes = [ctypes.POINTER(afLockData),
+                                ndpointer(dtype=numpy.float64)]
+    af.aflSolveStep.restype = ctypes.c_int
 
-af.aflSolveStep.argtypes = [ctypes.POINTER(afLockData),
-                            ndpointer(dtype=numpy.float64)]
-af.aflSolveStep.restype = ctypes.c_int
 
-    
 class AFLockC(object):
     """
     The C version of the 2D autofocus lock function.
@@ -290,6 +296,199 @@ class AFLockC(object):
         af.aflSolveStep(self.afld, step)
         return step
 
+
+
+class AFLockNumpy(object):
+    """
+    The numpy version of the 2D autofocus lock function. This has the
+    same interface as AFLockC and is used when the C library is not
+    available.
+
+    By Parseval's theorem the correlation of image1 with the shifted image2
+    is a sum over the product of their FFTs, and as the shift is separable
+    in x and y the cost and all of its derivatives can be calculated with
+    a few matrix-vector products instead of one inverse FFT each.
+    """
+    def __init__(self, downsample = 1, offset = 0.0, max_iters = 10, step_tol = 1.0e-6, **kwds):
+        """
+        offset - The background offset term.
+        """
+        super().__init__(**kwds)
+
+        self.downsample = downsample
+        self.im_x = None
+        self.im_y = None
+        self.mag = 0.0
+        self.max_iters = max_iters
+        self.offset = offset
+        self.p = numpy.zeros(2)
+        self.step_tol = step_tol
+        self.w = None
+        self.x_shift = None
+        self.y_shift = None
+
+        # Storage for the current cost, gradient and hessian.
+        self.c_p = None
+        self.c_cost = 0.0
+        self.c_grad = numpy.zeros(2)
+        self.c_hess = numpy.zeros((2,2))
+
+    def calcCost(self, p):
+        """
+        Calculate the cost, gradient and hessian at p in one pass.
+        """
+        if (self.c_p is not None) and (self.c_p[0] == p[0]) and (self.c_p[1] == p[1]):
+            return
+
+        ex = numpy.exp(-self.x_shift*p[0])
+        ey = numpy.exp(-self.y_shift*p[1])
+
+        # These are the x terms for the cost, 1st derivative and 2nd
+        # derivative, and similarly for the y terms.
+        self.ex_terms[0,:] = ex
+        numpy.multiply(ex, -self.x_shift, out = self.ex_terms[1,:])
+        numpy.multiply(ex, self.x_shift_sqr, out = self.ex_terms[2,:])
+
+        self.ey_terms[:,0] = ey
+        numpy.multiply(ey, -self.y_shift, out = self.ey_terms[:,1])
+        numpy.multiply(ey, self.y_shift_sqr, out = self.ey_terms[:,2])
+
+        numpy.dot(self.w, self.ey_terms, out = self.wy)
+        t = -numpy.real(numpy.dot(self.ex_terms, self.wy))
+
+        self.c_cost = t[0,0]
+        self.c_grad[0] = t[1,0]
+        self.c_grad[1] = t[0,1]
+        self.c_hess[0,0] = t[2,0]
+        self.c_hess[0,1] = t[1,1]
+        self.c_hess[1,0] = t[1,1]
+        self.c_hess[1,1] = t[0,2]
+        self.c_p = numpy.copy(p)
+
+    def cleanup(self):
+        pass
+
+    def cost(self, p):
+        self.calcCost(p)
+        return self.c_cost
+
+    def findOffset(self, image1, image2):
+        self.newImages(image1, image2)
+
+        # Determine offset at the sub-pixel level.
+        res = scipy.optimize.minimize(self.cost, self.getOffset(), method = 'CG', jac = self.gradCost)
+
+        return [res.x[0], res.x[1], res, self.mag]
+
+    def findOffsetU16(self, image1, image2):
+        return self.findOffset(image1, image2)
+
+    def findOffsetU16NM(self, image1, image2, verbose = True):
+        """
+        Find the optimal offset using Newton's method, 'image1' and 'image2'
+        should be of type numpy.uint16.
+        """
+        self.newImages(image1, image2)
+
+        # Determine offset at the sub-pixel level.
+        success = False
+        p = self.getOffset()
+        t1 = self.step_tol * self.step_tol
+        for i in range(self.max_iters):
+            self.calcCost(p)
+            try:
+                step = numpy.linalg.solve(self.c_hess, self.c_grad)
+            except numpy.linalg.LinAlgError:
+                break
+            p -= step
+            if (numpy.sum(step*step) < t1):
+                self.p = p
+                success = True
+                break
+
+        if not success and verbose:
+            print("Numpy Newton solver failed.")
+
+        return [self.p[0], self.p[1], success, self.mag]
+
+    def getMag(self):
+        return self.mag
+
+    def getOffset(self):
+        return numpy.copy(self.p)
+
+    def gradCost(self, p):
+        self.calcCost(p)
+        return numpy.copy(self.c_grad)
+
+    def hessCost(self, p):
+        self.calcCost(p)
+        return numpy.copy(self.c_hess)
+
+    def initialize(self, image1):
+        self.im_x = image1.shape[0]
+        self.im_y = image1.shape[1]
+
+        # Zero padded to 2x the size (after downsampling).
+        sx = 2*(self.im_x//self.downsample)
+        sy = 2*(self.im_y//self.downsample)
+
+        self.im1 = numpy.zeros((sx, sy))
+        self.im2 = numpy.zeros((sx, sy))
+        self.x0 = sx//2 - 1
+        self.y0 = sy//2 - 1
+
+        self.x_shift = 1j * 2.0 * numpy.pi * numpy.fft.fftfreq(sx)
+        self.x_shift_sqr = self.x_shift * self.x_shift
+        self.y_shift = 1j * 2.0 * numpy.pi * numpy.fft.fftfreq(sy)
+        self.y_shift_sqr = self.y_shift * self.y_shift
+
+        self.ex_terms = numpy.zeros((3, sx), dtype = numpy.complex128)
+        self.ey_terms = numpy.zeros((sy, 3), dtype = numpy.complex128)
+        self.wy = numpy.zeros((sx, 3), dtype = numpy.complex128)
+
+    def newImages(self, image1, image2):
+        """
+        New images to find the optimal cross-correlation of. This also
+        calculates the offset to the nearest pixel.
+        """
+        if self.im_x is None:
+            self.initialize(image1)
+
+        assert (image1.shape[0] == self.im_x)
+        assert (image1.shape[1] == self.im_y)
+        assert (image2.shape[0] == self.im_x)
+        assert (image2.shape[1] == self.im_y)
+
+        bx = self.im1.shape[0]//2
+        by = self.im1.shape[1]//2
+        self.im1[:bx,:by] = self.rebin(image1)
+        self.im2[:bx,:by] = self.rebin(image2)
+
+        im1_fft = numpy.fft.fft2(self.im1)
+        im2_fft = numpy.fft.fft2(self.im2)
+
+        # Offset to the nearest pixel. The cross-correlation is calculated
+        # in the same way as by the C library, i.e. as the convolution of
+        # image1 with a flipped version of image2.
+        self.im2[:bx,:by] = numpy.flip(self.im2[:bx,:by])
+        conv = numpy.real(numpy.fft.ifft2(im1_fft * numpy.fft.fft2(self.im2)))
+        [ix, iy] = numpy.unravel_index(conv.argmax(), conv.shape)
+        self.mag = conv[ix,iy]
+        self.p = numpy.array([ix - self.x0, iy - self.y0], dtype = numpy.float64)
+
+        # Cost is -sum(im1 * ifft(im2_fft * shift)), which is the same as
+        # -sum(conj(im1_fft) * im2_fft * shift)/N.
+        self.w = numpy.conj(im1_fft) * im2_fft / self.im1.size
+        self.c_p = None
+
+    def rebin(self, image):
+        ds = self.downsample
+        bx = self.im_x//ds
+        by = self.im_y//ds
+        image = image[:bx*ds,:by*ds].astype(numpy.float64)
+        return image.reshape(bx, ds, by, ds).sum(axis = (1,3)) - ds*ds*self.offset
+
     
 class AFLockPy(object):
     """
@@ -7,16 +7,22 @@ Hazen 04/18
 import ctypes
 import numpy
 from numpy.ctypeslib import ndpointer
-import scipy
-import scipy.optimize
 
 import storm_analysis.simulator.draw_gaussians_c as dg
 
 import storm_control.c_libraries.loadclib as loadclib
+import storm_control.sc_library.lazyImport as lazyImport
+
+# This is only needed by the Python / numpy fitters.
+scipy = lazyImport.lazyImport("scipy.optimize")
 
 
 # Load C library.
-c2dg = loadclib.loadCLibrary("corr_2d_gauss")
+try:
+    c2dg = loadclib.loadCLibrary("corr_2d_gauss")
+except OSError:
+    print("C correlation 2D Gaussian library not found, reverting to numpy.")
+    c2dg = None
 
 # corr2DData structure definition.
 class corr2DData(ctypes.Structure):
@@ -52,40 +58,41 @@ class corr2DData(ctypes.Structure):
                 ('yi', ctypes.POINTER(ctypes.c_double))]
 
 # C interface definition.
-c2dg.cleanup.argtypes = [ctypes.POINTER(corr2DData)]
+if c2dg is not None:
+    c2dg.cleanup.argtypes = [ctypes.POINTER(corr2DData)]
 
-c2dg.ddx.argtypes = [ctypes.POINTER(corr2DData),
-                     ctypes.c_double,
-                     ctypes.c_double]
-c2dg.ddx.restype = ctypes.c_double
+    c2dg.ddx.argtypes = [ctypes.POINTER(corr2DData),
+                         ctypes.c_double,
+                         ctypes.c_double]
+    c2dg.ddx.restype = ctypes.c_double
 
-c2dg.ddy.argtypes = [ctypes.POINTER(corr2DData),
-                     ctypes.c_double,
-                     ctypes.c_double]
-c2dg.ddy.restype = ctypes.c_double
+    c2dg.ddy.argtypes = [ctypes.POINTER(corr2DData),
+                         ctypes.c_double,
+                         ctypes.c_double]
+    c2dg.ddy.restype = ctypes.c_double
 
-c2dg.dx.argtypes = [ctypes.POINTER(corr2DData),
-                    ctypes.c_double,
-                    ctypes.c_double]
-c2dg.dx.restype = ctypes.c_double
+    c2dg.dx.argtypes = [ctypes.POINTER(corr2DData),
+                        ctypes.c_double,
+                        ctypes.c_double]
+    c2dg.dx.restype = ctypes.c_double
 
-c2dg.dy.argtypes = [ctypes.POINTER(corr2DData),
-                    ctypes.c_double,
-                    ctypes.c_double]
-c2dg.dy.restype = ctypes.c_double
+    c2dg.dy.argtypes = [ctypes.POINTER(corr2DData),
+                        ctypes.c_double,
+                        ctypes.c_double]
+    c2dg.dy.restype = ctypes.c_double
 
-c2dg.fn.argtypes = [ctypes.POINTER(corr2DData),
-                    ctypes.c_double,
-                    ctypes.c_double]
-c2dg.fn.restype = ctypes.c_double
+    c2dg.fn.argtypes = [ctypes.POINTER(corr2DData),
+                        ctypes.c_double,
+                        ctypes.c_double]
+    c2dg.fn.restype = ctypes.c_double
 
-c2dg.initialize.argtypes = [ctypes.c_double,
-                            ctypes.c_int,
-                            ctypes.c_int]
-c2dg.initialize.restype = ctypes.POINTER(corr2DData)
+    c2dg.initialize.argtypes = [ctypes.c_double,
+                                ctypes.c_int,
+                                ctypes.c_int]
+    c2dg.initialize.restype = ctypes.POINTER(corr2DData)
 
-c2dg.setImage.argtypes = [ctypes.POINTER(corr2DData),
-                          ndpointer(dtype=numpy.float64)]
+    c2dg.setImage.argtypes = [ctypes.POINTER(corr2DData),
+                              ndpointer(dtype=numpy.float64)]
 
 
 class Corr2DGaussC(object):
@@ -144,6 +151,107 @@ class Corr2DGaussC(object):
         c2dg.setImage(self.c2d, c_image)
     
 
+class Corr2DGaussNumpy(object):
+    """
+    This class optimizes the correlation between an image and a 2D
+    Gaussian.
+
+    Numpy implementation, this has the same interface as Corr2DGaussC
+    and is used when the C library is not available. The Gaussian is
+    separable in x and y, so the function value and all of the derivatives
+    are calculated together from two matrix-vector products whenever
+    the position changes.
+    """
+    def __init__(self, size = None, sigma = None, verbose = True, **kwds):
+        super(Corr2DGaussNumpy, self).__init__(**kwds)
+
+        assert(len(size) == 2), "Size must have two elements."
+
+        self.n_checks = 0
+        self.n_updates = 0
+        self.last_x = None
+        self.r_im = None
+        self.sg_term = 1.0/(sigma*sigma)
+        self.verbose = verbose
+        self.x_size = size[0]
+        self.y_size = size[1]
+
+        self.xi = numpy.arange(self.x_size) - 0.5 * self.x_size + 0.5
+        self.yi = numpy.arange(self.y_size) - 0.5 * self.y_size + 0.5
+
+        # Current function value and derivatives.
+        self.v_f = 0.0
+        self.v_dx = 0.0
+        self.v_dy = 0.0
+        self.v_ddx = 0.0
+        self.v_ddy = 0.0
+
+    def cleanup(self):
+        if self.verbose:
+            print("Lock fitting: {0:0d} checks, {1:0d} updates".format(self.n_checks,
+                                                                       self.n_updates))
+
+    def ddx(self, x):
+        self.update(x)
+        return self.v_ddx
+
+    def ddy(self, x):
+        self.update(x)
+        return self.v_ddy
+
+    def dx(self, x):
+        self.update(x)
+        return self.v_dx
+
+    def dy(self, x):
+        self.update(x)
+        return self.v_dy
+
+    def func(self, x, sign = 1.0):
+        self.update(x)
+        return sign * self.v_f
+
+    def hessian(self, x, sign = 1.0):
+        dxdy = -sign * self.dx(x) * self.dy(x)
+        return numpy.array([[sign * self.ddx(x), dxdy],
+                            [dxdy, sign * self.ddy(x)]])
+
+    def jacobian(self, x, sign = 1.0):
+        return sign * numpy.array([self.dx(x), self.dy(x)])
+
+    def setImage(self, image):
+        assert(image.shape[0] == self.x_size)
+        assert(image.shape[1] == self.y_size)
+
+        self.last_x = None
+        self.r_im = numpy.ascontiguousarray(image, dtype = numpy.float64)
+
+    def update(self, x):
+        """
+        Recalculate the function value and derivatives if x has changed.
+        """
+        self.n_checks += 1
+        if (self.last_x is not None) and (abs(self.last_x[0] - x[0]) <= 1.0e-9) and (abs(self.last_x[1] - x[1]) <= 1.0e-9):
+            return
+
+        self.n_updates += 1
+        self.last_x = numpy.array([x[0], x[1]])
+
+        tx = (x[0] - self.xi) * self.sg_term
+        ty = (x[1] - self.yi) * self.sg_term
+        gx = numpy.exp(-0.5 * (x[0] - self.xi) * tx)
+        gy = numpy.exp(-0.5 * (x[1] - self.yi) * ty)
+
+        r_gy = numpy.dot(self.r_im, gy)
+        gx_r = numpy.dot(gx, self.r_im)
+
+        self.v_f = numpy.dot(gx, r_gy)
+        self.v_dx = -numpy.dot(gx * tx, r_gy)
+        self.v_dy = -numpy.dot(gx_r, gy * ty)
+        self.v_ddx = numpy.dot(gx * (tx * tx - self.sg_term), r_gy)
+        self.v_ddy = numpy.dot(gx_r, gy * (ty * ty - self.sg_term))
+
+
 class Corr2DGaussPy(object):
     """
     This class optimizes the correlation between an image and a 2D
@@ -316,6 +424,36 @@ class Corr2DGaussCNCG(Corr2DGaussC):
         return [fit.x, fit.success, -fit.fun, fit.status]
 
 
+class Corr2DGaussNumpyNCG(Corr2DGaussNumpy):
+    """
+    Optimize using Newton-CG (numpy version).
+    """
+    def maximize(self, dx = 0.0, dy = 0.0):
+        """
+        Find the offset that optimizes the correlation of the 
+        Gaussian with the reference image.
+        """
+        x0 = numpy.array([dx, dy])
+
+        fit = scipy.optimize.minimize(self.func,
+                                      x0,
+                                      args=(-1.0,),
+                                      method='Newton-CG',
+                                      jac=self.jacobian,
+                                      hess=self.hessian,
+                                      options={'xtol': 1e-3, 'disp': False})
+
+        if (not fit.success) and (not (fit.status == 2)):
+            print("Maximization failed with:")
+            print(fit.message)
+            print("Status:", fit.status)
+            print("X:", fit.x)
+            print("Function value:", -fit.fun)
+            print()
+                        
+        return [fit.x, fit.success, -fit.fun, fit.status]
+
+
 class Corr2DGaussPyNCG(Corr2DGaussPy):
     """
     Optimize using Newton-CG (Python version).
@@ -6,11 +6,12 @@ version uses numpy/scipy only.
 Hazen 11/17
 """
 import numpy
-import scipy
-import scipy.optimize
 import time
 
 import storm_control.sc_library.hdebug as hdebug
+import storm_control.sc_library.lazyImport as lazyImport
+
+scipy = lazyImport.lazyImport("scipy.optimize")
 
 last_warning_time = None
 
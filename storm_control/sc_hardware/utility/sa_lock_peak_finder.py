@@ -6,7 +6,6 @@ version requires the storm-analysis project.
 Hazen 11/17
 """
 import numpy
-import tifffile
 
 import storm_analysis.sa_library.dao_fit_c as daoFitC
 import storm_analysis.sa_library.fitting as fitting
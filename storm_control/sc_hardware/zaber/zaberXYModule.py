@@ -6,6 +6,7 @@ Hazen 04/17
 Jeff 04/21
 """
 
+import time
 from PyQt5 import QtCore
 
 import storm_control.hal4000.halLib.halMessage as halMessage
@@ -52,6 +53,7 @@ class ZaberXYStageFunctionality(stageModule.StageFunctionality):
 
     def handleStagePosition(self, pos_dict):
         self.pos_dict = pos_dict
+        self.pos_time = time.time()
         self.querying = False
 
     def handleUpdateTimer(self):
@@ -141,8 +143,8 @@ class ZaberPollingThread(QtCore.QThread):
 
 class ZaberXYStage(stageModule.StageModule):
 
-    def __init__(self, module_params = None, qt_settings = None, **kwds):
-        super().__init__(**kwds)
+    @staticmethod
+    def initializeHardware(module_params):
 
         # Extract configuration
         configuration = module_params.get("configuration")
@@ -154,17 +156,24 @@ class ZaberXYStage(stageModule.StageModule):
                         "y_max": configuration.get("y_max",100000)}
         
         # Create the stage
-        self.stage = zaber.ZaberXYRS232(baudrate = configuration.get("baudrate"),
-                                        port = configuration.get("port"), 
-                                        unit_to_um = configuration.get("unit_to_um", 0.15625),
-                                        stage_id = configuration.get("stage_id", 2), 
-                                        limits_dict = limits_dict)
-        if self.stage.getStatus():            
+        stage = zaber.ZaberXYRS232(baudrate = configuration.get("baudrate"),
+                                   port = configuration.get("port"), 
+                                   unit_to_um = configuration.get("unit_to_um", 0.15625),
+                                   stage_id = configuration.get("stage_id", 2), 
+                                   limits_dict = limits_dict)
+        if stage.getStatus():            
             
             # Set (maximum) stage velocity.
             velocity = configuration.get("velocity", None)
             if not velocity is None:
-                self.stage.setVelocity(velocity, velocity)
+                stage.setVelocity(velocity, velocity)
+        return stage
+
+    def __init__(self, hardware = None, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+
+        self.stage = hardware
+        if self.stage.getStatus():            
             
             # Create the stage functionality
             self.stage_functionality = ZaberXYStageFunctionality(device_mutex = QtCore.QMutex(),
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Import modules when they are first used instead of when the module
+that uses them is imported. This is for (slow to import) modules that
+HAL only needs some of the time, like scipy.optimize or tifffile.
+
+Usage:
+  scipy = lazyImport.lazyImport("scipy.optimize")
+
+This is equivalent to 'import scipy.optimize' except that the import
+happens the first time an attribute of scipy is accessed.
+"""
+import importlib
+import threading
+
+
+class LazyModule(object):
+    """
+    A stand-in for a module that has not been imported yet.
+    """
+    def __init__(self, name, **kwds):
+        super().__init__(**kwds)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+        self._lazy_name = name
+
+    def __getattr__(self, name):
+        return getattr(self._lazyLoad(), name)
+
+    def __repr__(self):
+        if self._lazy_module is None:
+            return "<lazy module '" + self._lazy_name + "' (not imported)>"
+        return repr(self._lazy_module)
+
+    def _lazyLoad(self):
+        with self._lazy_lock:
+            if self._lazy_module is None:
+
+                # Like 'import a.b' we import a.b but return a.
+                importlib.import_module(self._lazy_name)
+                self._lazy_module = importlib.import_module(self._lazy_name.split(".")[0])
+        return self._lazy_module
+
+
+def isImported(module):
+    """
+    Return True if module is not a LazyModule or if it is a
+    LazyModule that has been imported.
+    """
+    if isinstance(module, LazyModule):
+        return module._lazy_module is not None
+    return True
+
+
+def lazyImport(name):
+    """
+    Return a LazyModule for the module name.
+    """
+    return LazyModule(name)
@@ -7,6 +7,7 @@ Hazen 06/15
 """
 
 import copy
+import functools
 import os
 import traceback
 import xml
@@ -15,6 +16,25 @@ from xml.dom import minidom
 from xml.etree import ElementTree
 
 
+#
+# This is incremented every time a Parameter or the structure of a
+# StormXMLObject changes. It is used to tell whether cached section
+# signatures are still valid.
+#
+modification_count = 0
+
+#
+# Values of these types are not copied when Parameters are copied as
+# they are immutable.
+#
+immutable_types = (bool, float, int, str, type, type(None))
+
+#
+# Values of these types can be included in section signatures.
+#
+signature_types = (bool, float, int, str, type(None))
+
+
 #
 # Functions.
 #
@@ -137,6 +157,12 @@ def difference(params1, params2):
     differences = []
     
     def diffRecurse(root, p1, p2):
+
+        # Skip sections whose contents are identical.
+        sig1 = p1.getSignature()
+        if (sig1 is not None) and (sig1 == p2.getSignature()):
+            return
+        
         for attr in p1.getAttrs():
             prop = p1.get(attr)
 
@@ -206,6 +232,15 @@ def parameters(parameters_file, recurse = False, add_filename_param = True):
     return xml_object
 
 
+@functools.lru_cache(maxsize = 4096)
+def splitName(pname):
+    """
+    Split a (dotted) parameter name into its parts. The results are
+    cached as the same names are looked up over and over again.
+    """
+    return tuple(pname.split("."))
+
+
 #
 # Classes.
 # 
@@ -244,6 +279,24 @@ class Parameter(object):
         
         self.setv(value)
 
+    def __deepcopy__(self, memo):
+        """
+        Only the mutable attributes are (deep) copied, this is a lot
+        faster than the default deepcopy().
+        """
+        new_param = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new_param
+        for [key, value] in self.__dict__.items():
+            if not isinstance(value, immutable_types):
+                value = copy.deepcopy(value, memo)
+            new_param.__dict__[key] = value
+        return new_param
+
+    def __setattr__(self, name, value):
+        global modification_count
+        modification_count += 1
+        super().__setattr__(name, value)
+        
     def copy(self):
         return copy.deepcopy(self)
     
@@ -531,6 +584,7 @@ class StormXMLObject(object):
     def __init__(self, nodes = None, recurse = False, validate = True, **kwds):
         super().__init__(**kwds)
 
+        self._signature_ = None
         self._validate_ = validate
         self.parameters = {}
 
@@ -653,7 +707,7 @@ class StormXMLObject(object):
             else:
                 raise ParametersException("pvalue for " + pname + " must be specified.")
 
-        pnames = pname.split(".")
+        pnames = splitName(pname)
         if (len(pnames) > 1):
             try:
                 prop = self.get(pnames[0])
@@ -668,6 +722,8 @@ class StormXMLObject(object):
         """
         Handles adding Parameters.
         """
+        global modification_count
+        modification_count += 1
         if pname in self.parameters:
             raise ParametersException("Parameter " + pname + " already exists.")
         else:
@@ -686,7 +742,9 @@ class StormXMLObject(object):
         If the section already exists and overwrite is False then you
         will get an exception.
         """
-        snames = sname.split(".")
+        global modification_count
+        modification_count += 1
+        snames = splitName(sname)
         if (len(snames) > 1):
             if not snames[0] in self.parameters:
                 cur_section = self.parameters[snames[0]] = StormXMLObject()
@@ -711,6 +769,19 @@ class StormXMLObject(object):
 
             return self.parameters[sname]
 
+    def __deepcopy__(self, memo):
+        """
+        Only the dictionaries and the Parameters need to be copied, the
+        cached signature can be shared as the copy has the same contents.
+        """
+        new_object = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new_object
+        new_object.__dict__.update(self.__dict__)
+        new_object.parameters = {}
+        for [key, value] in self.parameters.items():
+            new_object.parameters[key] = copy.deepcopy(value, memo)
+        return new_object
+    
     def copy(self):
         return copy.deepcopy(self)
 
@@ -718,8 +789,10 @@ class StormXMLObject(object):
         """
         Remove a sub-section or parameter (if it exists).
         """
+        global modification_count
         if self.has(name):
-            names = name.split(".")
+            modification_count += 1
+            names = splitName(name)
             if (len(names) > 1):
                 self.get(".".join(names[:-1])).delete(names[-1])
             else:
@@ -759,17 +832,12 @@ class StormXMLObject(object):
         """
         Return the property specified by pname.
         """
-        # Check for sub-property.
-        pnames = pname.split(".")
-        if (len(pnames) > 1):
-            xml_object = self.getp(pnames[0])
-            #print pnames, type(xml_object)
-            return xml_object.getp(".".join(pnames[1:]))
-
-        if pname in self.parameters:
-            return self.parameters[pname]
-        else:
-            raise ParametersExceptionGet("Requested property " + pname + " not found")
+        prop = self
+        for name in splitName(pname):
+            if not isinstance(prop, StormXMLObject) or not name in prop.parameters:
+                raise ParametersExceptionGet("Requested property " + pname + " not found")
+            prop = prop.parameters[name]
+        return prop
 
     def getProps(self):
         """
@@ -777,6 +845,32 @@ class StormXMLObject(object):
         """
         return self.parameters.values()
 
+    def getSignature(self):
+        """
+        Return a (nested) tuple of the names and values of all the Parameters
+        in this section, or None if any of the values are not simple types.
+        This is cached until the next change to any set of parameters.
+        """
+        if (self._signature_ is None) or (self._signature_[0] != modification_count):
+            signature = []
+            for key in sorted(self.parameters):
+                prop = self.parameters[key]
+                if isinstance(prop, StormXMLObject):
+                    value = prop.getSignature()
+                    if value is None:
+                        signature = None
+                        break
+                else:
+                    value = prop.getv()
+                    if not isinstance(value, signature_types):
+                        signature = None
+                        break
+                signature.append((key, value))
+            if signature is not None:
+                signature = tuple(signature)
+            self._signature_ = (modification_count, signature)
+        return self._signature_[1]
+    
     def getSortedAttrs(self):
         """
         Return attributes sorted by order, then by name.
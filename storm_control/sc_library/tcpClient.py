@@ -55,6 +55,8 @@ class TCPClient(QtCore.QObject, tcpCommunications.TCPCommunicationsMixin):
         """
         Handles the disconnect from the socket.
         """
+        self.partial_message = None
+        self.abortInFlight("Communication Error: " + self.server_name + " connection lost")
         self.comLostConnection.emit()
 
     def startCommunication(self):
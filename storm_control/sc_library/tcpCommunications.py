@@ -8,6 +8,7 @@ jeffmoffitt@gmail.com
 
 Hazen 05/14
 """
+import numpy
 
 from PyQt5 import QtCore, QtNetwork
 
@@ -21,6 +22,13 @@ class TCPCommunicationsMixin(object):
 
     They will should also include the following signal:
     messageReceived = QtCore.pyqtSignal(object)
+
+    Messages are sent as one JSON string per line. Several messages can
+    be in flight at the same time, responses are matched to requests
+    using the message ID.
+
+    If a message has binary data the raw bytes follow immediately after
+    the JSON string, in the order given in the 'binary_header' field.
     """
     def __init__(self,
                  address = QtNetwork.QHostAddress(QtNetwork.QHostAddress.LocalHost),
@@ -35,10 +43,23 @@ class TCPCommunicationsMixin(object):
         self.address = address
         self.encoding = encoding
         self.port = port 
+        self.in_flight = {}
+        self.partial_message = None
         self.server_name = server_name
         self.socket = None
         self.verbose = verbose
     
+    def abortInFlight(self, error_message):
+        """
+        Return all the messages that we are waiting for responses to
+        with an error. This is called when the connection is lost.
+        """
+        in_flight = self.in_flight
+        self.in_flight = {}
+        for [message, response_fn] in in_flight.values():
+            message.setError(True, error_message)
+            response_fn(message)
+        
     def close(self):
         """
         Close the socket.
@@ -57,19 +78,57 @@ class TCPCommunicationsMixin(object):
     def handleReadyRead(self):
         """
         Create TCP message class from JSON message and forward as appropriate
+
+        Each line is a complete message. Incomplete lines are left in
+        the socket buffer until the rest of the line arrives. Messages
+        with binary data are held in self.partial_message until all of
+        the data has arrived.
         """
-        message_str = ""
-        while self.socket.canReadLine():
-            # Read data line
-            message_str += str(self.socket.readLine(), self.encoding)
+        while True:
+
+            # Waiting for binary data.
+            if self.partial_message is not None:
+                message = self.partial_message
+                header = message.getBinaryHeader()
+                if (self.socket.bytesAvailable() < sum(map(lambda x: x[3], header))):
+                    return
+                binary_data = {}
+                for [name, dtype, shape, size] in header:
+                    data = bytes(self.socket.read(size))
+                    binary_data[name] = numpy.frombuffer(data, dtype = dtype).reshape(shape)
+                message.setBinaryData(binary_data)
+                self.partial_message = None
+
+            # Waiting for a JSON string.
+            else:
+                if not self.socket.canReadLine():
+                    return
+                message_str = str(self.socket.readLine(), self.encoding).strip()
+                if (len(message_str) == 0):
+                    continue
+
+                # Create message.
+                message = TCPMessage.fromJSON(message_str)
+                if (len(message.getBinaryHeader()) > 0):
+                    self.partial_message = message
+                    continue
+                
+            if self.verbose:
+                print("Received: \n" + str(message))
 
-        # Create message.
-        message = TCPMessage.fromJSON(message_str)
-        if self.verbose:
-            print("Received: \n" + str(message))
+            if (message.getType() == "Busy"):
+                self.handleBusy()
+            else:
+                self.handleMessage(message)
 
-        if (message.getType() == "Busy"):
-            self.handleBusy()
+    def handleMessage(self, message):
+        """
+        Send the message to the function that is waiting for it (if any),
+        otherwise emit the messageReceived signal.
+        """
+        if message.getID() in self.in_flight:
+            [sent, response_fn] = self.in_flight.pop(message.getID())
+            response_fn(message)
         else:
             self.messageReceived.emit(message)
     
@@ -82,13 +141,28 @@ class TCPCommunicationsMixin(object):
         else:
             return False
 
-    def sendMessage(self, message):
+    def numberInFlight(self):
+        """
+        Return the number of messages that we are waiting for responses to.
+        """
+        return len(self.in_flight)
+    
+    def sendMessage(self, message, response_fn = None):
         """
         Send TCP message as JSON string if the socket is connected.
+
+        If response_fn is specified then it will be called with the
+        response to this message instead of emitting messageReceived.
+        This makes it possible to have several messages in flight.
         """
+        if response_fn is not None:
+            self.in_flight[message.getID()] = [message, response_fn]
+            
         if self.isConnected():
             message_str = message.toJSON() + "\n"
             self.socket.write(message_str.encode(self.encoding))
+            for data in message.toBinary():
+                self.socket.write(data)
             self.socket.flush()
             if self.verbose:
                 print("Sent: \n" + str(message))
@@ -96,7 +170,7 @@ class TCPCommunicationsMixin(object):
             print(self.server_name + " socket not connected. \nDid not send:" )
             message.setError(True, "Communication Error: " + self.server_name + " socket not connected")
             print(message)
-            self.messageReceived.emit(message) # Return message with error
+            self.handleMessage(message) # Return message with error
 
 
 #
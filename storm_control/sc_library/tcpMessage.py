@@ -11,11 +11,16 @@ Hazen 05/14
 
 import copy
 import json
+import numpy
 
 
 class TCPMessage(object):
     """
     Contains the contents and status of a TCP message.
+
+    Messages can also carry binary data (numpy arrays). This is not part
+    of the JSON string, only a description of it is. The data itself is
+    sent as raw bytes immediately after the JSON string.
     """
     _COUNTER = 0 # Track number of created instances of this class.
 
@@ -28,6 +33,7 @@ class TCPMessage(object):
 
         assert message_type is not None
         
+        self.binary_data = {}
         #self.complete = False
         self.error = False
         self.error_message = None
@@ -45,6 +51,12 @@ class TCPMessage(object):
         """
         self.message_data[key_name] = value
 
+    def addBinaryData(self, key_name, np_array):
+        """
+        Add a numpy array to the message, this will be sent as raw bytes.
+        """
+        self.binary_data[key_name] = numpy.ascontiguousarray(np_array)
+        
     def addResponse(self, key_name, value):
         """
         Add or change the contents of fields in the response data dictionary.
@@ -60,6 +72,20 @@ class TCPMessage(object):
         message.__dict__.update(json.loads(json_string))
         return message
 
+    def getBinaryData(self, key_name):
+        """
+        Return a numpy array that was sent with the message, or None. Note
+        that arrays that were received over TCP are read only.
+        """
+        return self.binary_data.get(key_name, None)
+
+    def getBinaryHeader(self):
+        """
+        Return the description of the binary data that was sent with this
+        message, a list of [name, dtype, shape, size in bytes] lists.
+        """
+        return getattr(self, "binary_header", [])
+
     def getData(self, key_name, default = None):
         """
         Access elements of the message data by name.
@@ -136,11 +162,32 @@ class TCPMessage(object):
         """
         self.test_mode = test_boolean
 
+    def setBinaryData(self, binary_data):
+        """
+        Set the binary data, this is used when the message is received.
+        """
+        self.binary_data = binary_data
+        if hasattr(self, "binary_header"):
+            del self.binary_header
+        
+    def toBinary(self):
+        """
+        Return a list of the binary data, in the order given by the
+        binary header in the JSON string.
+        """
+        return list(map(lambda x: x.tobytes(), self.binary_data.values()))
+    
     def toJSON(self):
         """
         Serialize using JSON.
         """
-        return json.dumps(self.__dict__)
+        message_dict = copy.copy(self.__dict__)
+        del message_dict["binary_data"]
+        if (len(self.binary_data) > 0):
+            message_dict["binary_header"] = []
+            for [key, value] in self.binary_data.items():
+                message_dict["binary_header"].append([key, value.dtype.str, value.shape, value.nbytes])
+        return json.dumps(message_dict)
 
     ## markAsComplete
     #
@@ -155,7 +202,10 @@ class TCPMessage(object):
         """
         string_rep = "\tMessage Type: " + str(self.message_type)
         for attribute in sorted(vars(self).keys()):
-            if not (attribute == "message_type"):
+            if (attribute == "binary_data"):
+                for [key, value] in self.binary_data.items():
+                    string_rep += "\n\tbinary " + key + ": " + str(value.dtype) + " " + str(value.shape)
+            elif not (attribute == "message_type"):
                 string_rep += "\n\t" + attribute + ": " + str(getattr(self, attribute))
         return string_rep
 
@@ -11,22 +11,58 @@ Hazen 05/14
 """
 
 import sys
+import weakref
 from PyQt5 import QtCore, QtGui, QtWidgets, QtNetwork
 
 from storm_control.sc_library.tcpMessage import TCPMessage
 import storm_control.sc_library.tcpCommunications as tcpCommunications
 
 
+class TCPServerSession(QtCore.QObject, tcpCommunications.TCPCommunicationsMixin):
+    """
+    The connection to a single client.
+    """
+    messageReceived = QtCore.pyqtSignal(object)
+    sessionClosed = QtCore.pyqtSignal(object)
+
+    def __init__(self, socket = None, **kwds):
+        super().__init__(**kwds)
+        self.socket = socket
+        self.socket.readyRead.connect(self.handleReadyRead)
+        self.socket.disconnected.connect(self.handleDisconnect)
+
+    def handleDisconnect(self):
+        """
+        Handle disconnection of the client.
+        """
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+            self.sessionClosed.emit(self)
+        
+
 class TCPServer(QtNetwork.QTcpServer, tcpCommunications.TCPCommunicationsMixin):
     """
     A TCP server for passing TCP messages between programs.
+
+    More than one client can be connected at the same time. The first
+    client to send a message that is not in query_messages is the
+    controlling client until it disconnects. Other clients can only
+    send query messages, which are emitted with the queryReceived
+    signal. Responses are sent back to the client that sent the message.
     """
     comGotConnection = QtCore.pyqtSignal()
     comLostConnection = QtCore.pyqtSignal()
     messageReceived = QtCore.pyqtSignal(object)
+    queryReceived = QtCore.pyqtSignal(object)
     
-    def __init__(self, **kwds):
+    def __init__(self, max_clients = 10, query_messages = [], **kwds):
         super().__init__(**kwds)
+        self.control_session = None
+        self.max_clients = max_clients
+        self.message_sessions = weakref.WeakKeyDictionary()
+        self.query_messages = query_messages
+        self.sessions = []
 
         # Connect new connection signal
         self.newConnection.connect(self.handleClientConnection)
@@ -34,6 +70,16 @@ class TCPServer(QtNetwork.QTcpServer, tcpCommunications.TCPCommunicationsMixin):
         # Listen for new connections
         self.connectToNewClients()
 
+    def close(self):
+        """
+        Close all the client connections and stop listening.
+        """
+        for session in self.sessions[:]:
+            session.close()
+        self.sessions = []
+        self.control_session = None
+        super().close()
+        
     def connectToNewClients(self):
         """
         Listen for new clients.
@@ -52,13 +98,13 @@ class TCPServer(QtNetwork.QTcpServer, tcpCommunications.TCPCommunicationsMixin):
         """
         if self.verbose:
             print("Force disconnect from clients")
-        if self.isConnected():
-            self.socket.disconnectFromHost()
-            self.socket.waitForDisconnect()
-            self.socket.close()
-            self.socket = None
-            self.comLostConnection.emit()
-            self.connectToNewClients()
+        for session in self.sessions[:]:
+            if session.isConnected():
+                session.socket.disconnectFromHost()
+            session.handleDisconnect()
+
+    def getNumberOfClients(self):
+        return len(self.sessions)
     
     def handleClientConnection(self):
         """
@@ -66,14 +112,18 @@ class TCPServer(QtNetwork.QTcpServer, tcpCommunications.TCPCommunicationsMixin):
         """
         socket = self.nextPendingConnection()
 
-        if not self.isConnected():
-            self.socket = socket
-            self.socket.readyRead.connect(self.handleReadyRead)
-            self.socket.disconnected.connect(self.handleClientDisconnect)
-            self.comGotConnection.emit()
+        if (len(self.sessions) < self.max_clients):
+            session = TCPServerSession(encoding = self.encoding,
+                                       server_name = self.server_name,
+                                       socket = socket,
+                                       verbose = self.verbose,
+                                       parent = self)
+            session.messageReceived.connect(lambda x: self.handleSessionMessage(session, x))
+            session.sessionClosed.connect(self.handleSessionClosed)
+            self.sessions.append(session)
             if self.verbose:
                 print("Connected new client")
-        else: # Refuse new socket if one already exists
+        else: # Refuse new socket if there are too many clients.
             message = TCPMessage(message_type = "Busy") # from tcpMessage.TCPMessage
             if self.verbose:
                 print("Sent: \n" + str(message))
@@ -81,16 +131,58 @@ class TCPServer(QtNetwork.QTcpServer, tcpCommunications.TCPCommunicationsMixin):
             socket.disconnectFromHost()
             socket.close()
 
-    def handleClientDisconnect(self):
+    def handleSessionClosed(self, session):
         """
-        Handle disconnection of client.
+        Handle disconnection of a client.
         """
-        self.socket.disconnectFromHost()
-        self.socket.close()
-        self.socket = None
-        self.comLostConnection.emit()
+        if session in self.sessions:
+            self.sessions.remove(session)
+        session.deleteLater()
         if self.verbose:
             print("Client disconnected")
+        if (session is self.control_session):
+            self.control_session = None
+            self.comLostConnection.emit()
+
+    def handleSessionMessage(self, session, message):
+        """
+        Handle a message from one of the clients.
+        """
+        self.message_sessions[message] = session
+
+        if (session is self.control_session):
+            self.messageReceived.emit(message)
+        elif (message.getType() in self.query_messages):
+            self.queryReceived.emit(message)
+        elif self.control_session is None:
+            self.control_session = session
+            self.comGotConnection.emit()
+            self.messageReceived.emit(message)
+        else:
+            message.setError(True, self.server_name + " is being controlled by another client.")
+            self.sendMessage(message)
+
+    def isConnected(self):
+        """
+        Return true if there is a controlling client.
+        """
+        if self.control_session is not None:
+            return self.control_session.isConnected()
+        return False
+
+    def sendMessage(self, message):
+        """
+        Send the message to the client that it came from, or to the
+        controlling client if it did not come from a client.
+        """
+        session = self.message_sessions.pop(message, None)
+        if session is None:
+            session = self.control_session
+        if (session is not None) and session.isConnected():
+            session.sendMessage(message)
+        else:
+            print(self.server_name + " client not connected. \nDid not send:" )
+            print(message)
             
         
 class StandAlone(QtWidgets.QMainWindow):
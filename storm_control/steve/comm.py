@@ -64,6 +64,9 @@ class Comm(QtCore.QObject):
             err_msg = "tcp error: " + message.getErrorMessage()
             warnings.warn(err_msg)
             hdebug.logText(err_msg)
+
+            # Warning! This can also change self.current_message.
+            self.current_message.errorHandler(message)
         else:
             # Warning! This can change self.current_message.
             self.current_message.finalizer(message)
@@ -108,12 +111,16 @@ class CommMessage(object):
     Base message class.
     """
     @hdebug.debug
-    def __init__(self, disconnect = True, finalizer_fn = None, **kwds):
+    def __init__(self, disconnect = True, error_fn = None, finalizer_fn = None, **kwds):
         super().__init__(**kwds)
 
         # If this is True we'll disconnect from HAL when we receive the
         # message response.
         self.disconnect = disconnect
+
+        # This function will be called if HALs response to a message
+        # has an error.
+        self.error_fn = error_fn
         
         # This function will be called when HALs response to a message
         # is received.
@@ -122,6 +129,11 @@ class CommMessage(object):
         # This is the HAL message.
         self.tcp_message = None
 
+    @hdebug.debug
+    def errorHandler(self, tcp_message_response):
+        if self.error_fn is not None:
+            self.error_fn(self.tcp_message, tcp_message_response)
+            
     @hdebug.debug
     def getDisconnect(self):
         return self.disconnect
@@ -140,6 +152,18 @@ class CommMessage(object):
             self.finalizer_fn(self.tcp_message, tcp_message_response)
 
 
+class CommMessageFrame(CommMessage):
+    """
+    Get the first frame of the last movie.
+    """
+    @hdebug.debug
+    def __init__(self, camera = "camera1", **kwds):
+        super().__init__(**kwds)
+
+        self.tcp_message = tcpMessage.TCPMessage(message_type = "Get Frame",
+                                                 message_data = {"camera" : camera})
+
+        
 class CommMessageMovie(CommMessage):
     """
     Take a movie.
@@ -140,8 +140,16 @@ class MovieCapture(QtCore.QObject):
     def handleMovieTaken(self):
         """
         Load the (basic) movie and add it to the item store and scene.
+
+        If HAL sent us the frame we use that, otherwise we load the
+        frame from the movie file.
         """
-        image_item = self.loadMovie(self.smc.getMovieName())
+        frame_message = self.smc.getFrameMessage()
+        if frame_message is not None:
+            image_item = self.movie_loader.loadFrame(frame_message)
+            self.addImageItem(image_item)
+        else:
+            image_item = self.loadMovie(self.smc.getMovieName())
         self.captureComplete.emit(image_item)
 
         # Update current objective.
@@ -273,6 +281,9 @@ class MovieCapture(QtCore.QObject):
 class SingleMovieCapture(object):
     """
     Handles communicating with HAL to move the stage and acquire a single movie.
+
+    Once the movie is taken we also ask HAL for the first frame of the movie,
+    if this fails (older versions of HAL) the frame is loaded from the file.
     """
     def __init__(self,
                  comm_instance = None,
@@ -285,6 +296,10 @@ class SingleMovieCapture(object):
         super().__init__(**kwds)
         self.comm = comm_instance
         self.finalizer_fn = finalizer_fn
+        self.frame_message = comm.CommMessageFrame(disconnect = disconnect,
+                                                   error_fn = self.handleFrameError,
+                                                   finalizer_fn = self.handleFrameMessage)
+        self.frame_response = None
         self.movie_message = comm.CommMessageMovie(disconnect = disconnect,
                                                    finalizer_fn = self.handleMovieMessage,
                                                    directory = directory,
@@ -295,11 +310,24 @@ class SingleMovieCapture(object):
                                                    stage_x = pos.x_um,
                                                    stage_y = pos.y_um)
 
+    def getFrameMessage(self):
+        return self.frame_response
+    
     def getMovieName(self):
         return self.movie_name
 
-    def handleMovieMessage(self, tcp_message, tcp_message_response):
+    def handleFrameError(self, tcp_message, tcp_message_response):
         self.finalizer_fn()
+
+    def handleFrameMessage(self, tcp_message, tcp_message_response):
+        self.frame_response = tcp_message_response
+        self.finalizer_fn()
+        
+    def handleMovieMessage(self, tcp_message, tcp_message_response):
+        """
+        Get the frame when the movie message completes.
+        """
+        self.comm.sendMessage(self.frame_message)
         
     def handleStageMessage(self, tcp_message, tcp_message_response):
         """
@@ -12,6 +12,9 @@ import os
 import pickle
 import warnings
 from PyQt5 import QtCore, QtGui, QtWidgets
+from xml.etree import ElementTree
+
+import storm_control.sc_library.parameters as params
 
 import storm_control.steve.coord as coord
 import storm_control.steve.mosaicDialog as mosaicDialog
@@ -286,6 +289,22 @@ class ImageItemLoaderHAL(object):
                 self.objectives.addObjective(obj_data.split(","))
                 i += 1
             
+    def loadFrame(self, tcp_message):
+        """
+        Create an ImageItem from the response to a 'Get Frame' message.
+        """
+        xml = params.StormXMLObject(ElementTree.fromstring(tcp_message.getResponse("parameters")),
+                                    recurse = True)
+        self.handleRealXML(xml)
+        
+        # Set currently selected objective to this movies objective.
+        self.objectives.changeObjective(self.getObjectiveName(xml))
+
+        # Orient, we copy the data as the TCP data is read only.
+        numpy_data = self.orientNumpyData(tcp_message.getBinaryData("frame").copy(), xml)
+
+        return self.dataXMLToImageItem(numpy_data, xml)
+        
     def loadMovie(self, no_ext_name, frame_number):
         """
         For basic loading we assume that the XML file has the same name
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Measure how long it takes to rescale camera frames for display as
+a function of frame size and number of threads.
+
+$ python benchmark_rescale_image.py
+"""
+import numpy
+import threading
+import time
+
+import storm_control.hal4000.halLib.c_image_manipulation_c as cIM
+
+
+def timeIt(fn, reps):
+    start_time = time.time()
+    for i in range(reps):
+        fn()
+    return 1000.0 * (time.time() - start_time)/reps
+
+
+def benchmarkRescale(sizes = [512, 2048, 4096], reps = 20):
+    """
+    Single viewer, the C library with different numbers of threads and numpy.
+    """
+    max_threads = cIM.getNumberOfThreads()
+    thread_counts = [1]
+    if (max_threads > 1):
+        thread_counts.append(max_threads)
+
+    for size in sizes:
+        image = numpy.random.randint(100, 1000, size = (size, size)).astype(numpy.uint16)
+        print("Rescale {0:d}x{0:d}".format(size))
+
+        if cIM.image_manip is not None:
+            for n_threads in thread_counts:
+                cIM.setNumberOfThreads(n_threads)
+                def fn():
+                    cIM.rescaleImage(image, True, False, True, [100, 1000], 4000)
+                print("  C, {0:d} thread(s) {1:.3f}ms".format(n_threads, timeIt(fn, reps)))
+            cIM.setNumberOfThreads(max_threads)
+        else:
+            print("  C library not available.")
+
+        def fn():
+            cIM.rescaleImage(image, True, False, True, [100, 1000], 4000, use_numpy = True)
+        print("  numpy       {0:.3f}ms".format(timeIt(fn, max(1, reps//4))))
+
+
+def benchmarkViewers(size = 2048, n_viewers = 3, reps = 20):
+    """
+    Several viewers rescaling at the same time from different Python threads,
+    this only works because ctypes releases the GIL during the C call.
+    """
+    if cIM.image_manip is None:
+        return
+
+    image = numpy.random.randint(100, 1000, size = (size, size)).astype(numpy.uint16)
+    print("{0:d} viewers, {1:d}x{1:d}".format(n_viewers, size))
+
+    def viewer():
+        for i in range(reps):
+            cIM.rescaleImage(image, False, False, False, [100, 1000], 4000)
+
+    start_time = time.time()
+    threads = []
+    for i in range(n_viewers):
+        threads.append(threading.Thread(target = viewer))
+        threads[-1].start()
+    for thread in threads:
+        thread.join()
+    print("  {0:.3f}ms per refresh".format(1000.0 * (time.time() - start_time)/reps))
+
+
+if (__name__ == "__main__"):
+    benchmarkRescale()
+    benchmarkViewers()
@@ -361,6 +361,43 @@ class MoveStage2(testing.TestingTCP):
         self.test_actions = [testActionsTCP.MoveStage(x = x, y = y),
                              GetStagePositionAction1(x = x, y = y)]
 
+class MoveStageListAction1(testActionsTCP.MoveStageList):
+
+    def __init__(self, index = None, remaining = None, **kwds):
+        super().__init__(**kwds)
+        self.index = index
+        self.remaining = remaining
+
+    def checkMessage(self, tcp_message):
+        assert(tcp_message.getResponse("index") == self.index)
+        assert(tcp_message.getResponse("remaining") == self.remaining)
+
+class MoveStageListAction2(testActionsTCP.MoveStageList):
+
+    def checkMessage(self, tcp_message):
+        if self.test_mode:
+            assert(tcp_message.getResponse("duration") == 1)
+            assert(tcp_message.getResponse("order") == [0, 2, 1])
+        else:
+            assert tcp_message.hasError()
+
+class MoveStageList1(testing.TestingTCP):
+    """
+    This tests planning and stepping through a list of stage positions.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        positions = [[0.0, 0.0], [20.0, 0.0], [10.0, 0.0]]
+        self.test_actions = [MoveStageListAction2(test_mode = True, positions = positions),
+                             MoveStageListAction1(positions = positions, index = 0, remaining = 2),
+                             GetStagePositionAction1(x = 0.0, y = 0.0),
+                             MoveStageListAction1(index = 2, remaining = 1),
+                             GetStagePositionAction1(x = 10.0, y = 0.0),
+                             MoveStageListAction1(index = 1, remaining = 0),
+                             GetStagePositionAction1(x = 20.0, y = 0.0),
+                             MoveStageListAction2()]
+
 #
 # Test handling of messages that are not supported.
 #
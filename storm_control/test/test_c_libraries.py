@@ -3,6 +3,20 @@
 Tests of the C libraries.
 """
 import numpy
+import os
+import sys
+
+
+def testBuild():
+    import storm_control.c_libraries.loadclib as loadclib
+
+    if (sys.platform == "win32"):
+        return
+
+    loadclib.buildCLibrary("focus_quality", verbose = False)
+    assert os.path.exists(loadclib.cLibraryPath("focus_quality"))
+    assert not loadclib.needsBuild("focus_quality")
+    assert loadclib.loadCLibrary("focus_quality") is not None
 
 
 def testCImageManipulation():
@@ -37,6 +51,26 @@ def testCImageManipulation():
             assert(numpy.allclose(c_nim, py_nim, atol = 1.1))
 
 
+def testCImageManipulationThreaded():
+    import storm_control.hal4000.halLib.c_image_manipulation_c as cIM
+
+    # Large enough that the work is split across threads, with the minimum
+    # and maximum values at the end of a row band.
+    nim = numpy.random.randint(100, 200, size = (512,384)).astype(numpy.uint16)
+    nim[511,383] = 10
+    nim[255,383] = 1000
+
+    for n_threads in [1, 4]:
+        cIM.setNumberOfThreads(n_threads)
+        for transpose in [False, True]:
+            [c_nim, c_image_min, c_image_max] = cIM.rescaleImage(nim, True, False, transpose, [100, 200], None)
+            [py_nim, py_image_min, py_image_max] = cIM.rescaleImage(nim, True, False, transpose, [100, 200], None, True)
+
+            assert(c_image_min == 10)
+            assert(c_image_max == 1000)
+            assert(numpy.allclose(c_nim.astype(numpy.int), py_nim.astype(numpy.int), atol = 1.1))
+
+    
 
 def testFocusQuality():
     import storm_control.hal4000.camera.frame as frame
@@ -87,7 +121,9 @@ def testLMMoment():
 
 
 if (__name__ == "__main__"):
+    testBuild()
     testCImageManipulation()
+    testCImageManipulationThreaded()
     testFocusQuality()
     testLMMoment()
     
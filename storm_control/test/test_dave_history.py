@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Test the history of measured Dave action durations.
+"""
+import os
+import sys
+from xml.etree import ElementTree
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.sc_library.tcpClient as tcpClient
+import storm_control.sc_library.tcpServer as tcpServer
+import storm_control.test as test
+
+import storm_control.dave.dave as dave
+import storm_control.dave.daveActions as daveActions
+import storm_control.dave.daveHistory as daveHistory
+
+
+def getApp():
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    return app
+
+
+def test_dave_history_1():
+    """
+    Test predictions using the overhead of the same action ID.
+    """
+    history = daveHistory.DurationHistory()
+
+    # No measurements, use the estimate.
+    assert (history.predict("DATakeMovie", "movie", 10.0) == 10.0)
+
+    for measured in [12.0, 13.0, 12.5]:
+        history.addMeasurement("DATakeMovie", "movie", 10.0, measured)
+    assert (history.predict("DATakeMovie", "movie", 10.0) == 12.5)
+
+    # Actions without an ID are stored by type.
+    for i in range(3):
+        history.addMeasurement("DAMoveStage", None, 0.0, 1.0)
+    assert (history.predict("DAMoveStage", None, 0.0) == 1.0)
+
+
+def test_dave_history_2():
+    """
+    Test predictions for a new action ID using the fit for the action type.
+    """
+    history = daveHistory.DurationHistory()
+    for length in [10.0, 20.0, 40.0]:
+        history.addMeasurement("DATakeMovie", "movie " + str(length), length, 2.0 + 1.1 * length)
+
+    # 2 seconds of overhead and 10% slower than expected.
+    assert (abs(history.predict("DATakeMovie", "new movie", 100.0) - 112.0) < 1.0e-6)
+
+    # Other types are not affected.
+    assert (history.predict("DAValveProtocol", "wash", 30.0) == 30.0)
+
+
+def test_dave_history_3():
+    """
+    Test detection of unusually slow actions.
+    """
+    history = daveHistory.DurationHistory()
+    for measured in [11.0, 11.2, 10.9, 11.1, 11.0]:
+        assert not history.addMeasurement("DATakeMovie", "movie", 10.0, measured)
+
+    assert not history.addMeasurement("DATakeMovie", "movie", 10.0, 12.0)
+    assert history.addMeasurement("DATakeMovie", "movie", 10.0, 20.0)
+
+
+def test_dave_history_4():
+    """
+    Test saving and loading the history.
+    """
+    filename = os.path.join(test.dataDirectory(), "dave_history.json")
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    history = daveHistory.DurationHistory(filename)
+    for measured in [12.0, 13.0, 12.5]:
+        history.addMeasurement("DATakeMovie", "movie", 10.0, measured)
+    history.save()
+
+    history = daveHistory.DurationHistory(filename)
+    assert (history.predict("DATakeMovie", "movie", 10.0) == 12.5)
+    os.remove(filename)
+
+
+def test_dave_history_5():
+    """
+    Test that the command engine measures how long the actions take.
+    """
+    app = getApp()
+
+    server = tcpServer.TCPServer(port = 9506)
+    server.messageReceived.connect(lambda x: QtCore.QTimer.singleShot(200, lambda : server.sendMessage(x)))
+
+    engine = dave.CommandEngine()
+    engine.HALClient = tcpClient.TCPClient(port = 9506)
+    assert engine.HALClient.startCommunication()
+
+    measured = []
+    engine.measured.connect(lambda x, y: measured.append([x, y]))
+
+    dave_action = daveActions.DAMoveStage()
+    node = dave_action.createETree({"stage_x" : 0.0, "stage_y" : 0.0})
+    dave_action.setup(ElementTree.fromstring(ElementTree.tostring(node)))
+
+    done = []
+    engine.done.connect(lambda : done.append(True))
+    engine.startCommand(dave_action)
+
+    timer = QtCore.QElapsedTimer()
+    timer.start()
+    while (len(done) == 0) and (timer.elapsed() < 5000):
+        app.processEvents()
+
+    assert (len(measured) == 1)
+    assert (measured[0][0] is dave_action)
+    assert (measured[0][1] > 0.15)
+
+    # Test mode commands are not measured.
+    engine.startCommand(dave_action, test_mode = True)
+    timer.start()
+    while (len(done) == 1) and (timer.elapsed() < 5000):
+        app.processEvents()
+    assert (len(done) == 2)
+    assert (len(measured) == 1)
+
+    engine.HALClient.stopCommunication()
+    server.close()
+
+
+if (__name__ == "__main__"):
+    test_dave_history_1()
+    test_dave_history_2()
+    test_dave_history_3()
+    test_dave_history_4()
+    test_dave_history_5()
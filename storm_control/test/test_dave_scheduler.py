@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Test running Dave actions at the same time.
+"""
+import sys
+from xml.etree import ElementTree
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.sc_library.tcpClient as tcpClient
+import storm_control.sc_library.tcpServer as tcpServer
+
+import storm_control.dave.dave as dave
+import storm_control.dave.daveActions as daveActions
+import storm_control.dave.daveScheduler as daveScheduler
+
+
+def getApp():
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    return app
+
+
+def makeAction(action_class, duration = 0, **kwds):
+    dave_action = action_class()
+    node = dave_action.createETree(kwds)
+    dave_action.setup(ElementTree.fromstring(ElementTree.tostring(node)))
+    dave_action.setDuration(duration)
+    return dave_action
+
+
+def makeEntries(sequence):
+    return list(map(lambda x: [x.getResources(), x.getDuration()], sequence))
+
+
+def makeSequence():
+    return [makeAction(daveActions.DAMoveStage, 1, stage_x = 0.0, stage_y = 0.0),
+            makeAction(daveActions.DASetParameters, 2, parameters = "647_storm"),
+            makeAction(daveActions.DATakeMovie, 10, name = "movie_0", length = 100),
+            makeAction(daveActions.DAValveProtocol, 30, name = "Wash", overlap = True),
+            makeAction(daveActions.DAMoveStage, 1, stage_x = 10.0, stage_y = 0.0),
+            makeAction(daveActions.DATakeMovie, 10, name = "movie_1", length = 100),
+            makeAction(daveActions.DAValveProtocol, 30, name = "Hybridize"),
+            makeAction(daveActions.DATakeMovie, 10, name = "movie_2", length = 100)]
+
+
+def test_dave_scheduler_1():
+    """
+    Test the predicted schedule.
+    """
+    app = getApp()
+
+    schedule = daveScheduler.predictSchedule(makeEntries(makeSequence()))
+
+    # The parameters are set while the stage moves.
+    assert (schedule[0] == [0, 1])
+    assert (schedule[1] == [0, 2])
+
+    # The movie waits for both.
+    assert (schedule[2] == [2, 12])
+
+    # The wash (overlap = True) runs during the movie, and so does the
+    # next stage move, but not the next movie.
+    assert (schedule[3] == [2, 32])
+    assert (schedule[4] == [12, 13])
+    assert (schedule[5] == [13, 23])
+
+    # The hybridization changes the sample, so it waits for the wash and
+    # the movie, and the last movie waits for it.
+    assert (schedule[6] == [32, 62])
+    assert (schedule[7] == [62, 72])
+    assert (daveScheduler.scheduleDuration(schedule) == 72)
+
+    # Without lookahead everything is sequential.
+    schedule = daveScheduler.predictSchedule(makeEntries(makeSequence()), lookahead = 0)
+    assert (daveScheduler.scheduleDuration(schedule) == 94)
+
+
+def test_dave_scheduler_2():
+    """
+    Test that the command engine starts the next action early when it can.
+    """
+    app = getApp()
+
+    received = []
+    server = tcpServer.TCPServer(port = 9505)
+    server.messageReceived.connect(lambda x: received.append(x))
+
+    engine = dave.CommandEngine()
+    engine.HALClient = tcpClient.TCPClient(port = 9505)
+    assert engine.HALClient.startCommunication()
+
+    # This does what Dave does when an action is done.
+    sequence = makeSequence()[:3]
+    done = []
+    def handleDone():
+        done.append(True)
+        if (len(done) < len(sequence)):
+            engine.startCommand(sequence[len(done)], lookahead = sequence[len(done)+1:])
+    engine.done.connect(handleDone)
+
+    def waitFor(condition):
+        timer = QtCore.QElapsedTimer()
+        timer.start()
+        while not condition() and (timer.elapsed() < 5000):
+            app.processEvents()
+
+    # The stage move and the parameters are sent at the same time.
+    engine.startCommand(sequence[0], lookahead = sequence[1:])
+    waitFor(lambda : (len(received) == 2))
+    assert (len(received) == 2)
+    assert received[0].isType("Move Stage")
+    assert received[1].isType("Set Parameters")
+
+    # The parameters finish first, this is not handled until the stage move is done.
+    server.sendMessage(received[1])
+    waitFor(lambda : (len(engine.overlapped) == 1) and (engine.overlapped[sequence[1]] is not None))
+    assert (len(done) == 0)
+
+    # The movie is only sent once both are done.
+    server.sendMessage(received[0])
+    waitFor(lambda : (len(received) == 3))
+    assert (len(done) == 2)
+    assert received[2].isType("Take Movie")
+
+    server.sendMessage(received[2])
+    waitFor(lambda : (len(done) == 3))
+    assert (len(done) == 3)
+
+    engine.HALClient.stopCommunication()
+    server.close()
+
+
+if (__name__ == "__main__"):
+    test_dave_scheduler_1()
+    test_dave_scheduler_2()
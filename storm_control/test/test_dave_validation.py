@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Test validation of Dave command sequences.
+"""
+import sys
+from xml.etree import ElementTree
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.sc_library.tcpClient as tcpClient
+import storm_control.sc_library.tcpServer as tcpServer
+
+import storm_control.dave.daveActions as daveActions
+import storm_control.dave.daveValidation as daveValidation
+import storm_control.dave.sequenceViewer as sequenceViewer
+
+
+def getApp():
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    return app
+
+
+def makeModel(n_positions):
+    """
+    A sequence like those created by the XML generators, a stage move
+    and two movies with different parameters at each position.
+    """
+    xml = ElementTree.Element("sequence")
+    for i in range(n_positions):
+        branch = ElementTree.SubElement(xml, "branch", name = "position " + str(i))
+        nodes = [daveActions.DAMoveStage().createETree({"stage_x" : float(i),
+                                                        "stage_y" : 0.0})]
+        for params in ["647_storm", "561_storm"]:
+            nodes.append(daveActions.DASetParameters().createETree({"parameters" : params}))
+            nodes.append(daveActions.DATakeMovie().createETree({"name" : params + "_" + str(i),
+                                                                "length" : 100,
+                                                                "parameters" : params}))
+        branch.extend(nodes)
+
+    model = sequenceViewer.DaveStandardItemModel()
+    model.setSequence(xml)
+    return model
+
+
+def test_dave_validation_1():
+    """
+    Test that identical actions are grouped.
+    """
+    app = getApp()
+
+    model = makeModel(50)
+    assert (model.getNumberItems() == 250)
+
+    # 1 stage move, 2 parameters and 2 movies.
+    groups = model.getValidationGroups()
+    assert (len(groups) == 5)
+    assert (sum(map(lambda x: len(x[1]), groups)) == 250)
+
+
+def test_dave_validation_2():
+    """
+    Test validation against a server that responds like HAL.
+    """
+    app = getApp()
+
+    received = []
+    def handleMessage(message):
+        received.append(message)
+        assert message.isTest()
+        if message.isType("Take Movie"):
+            if (message.getData("parameters") == "561_storm"):
+                message.setError(True, "No such parameters.")
+            else:
+                message.addResponse("disk_usage", 10)
+                message.addResponse("duration", 5)
+        elif message.isType("Move Stage"):
+            message.addResponse("duration", 1)
+        server.sendMessage(message)
+
+    server = tcpServer.TCPServer(port = 9504)
+    server.messageReceived.connect(handleMessage)
+
+    model = makeModel(50)
+    client = tcpClient.TCPClient(port = 9504)
+    assert client.startCommunication()
+    engine = daveValidation.ValidationEngine({"hal" : client}, max_in_flight = 2)
+
+    problems = []
+    engine.problem.connect(lambda x, y: problems.append(x))
+    engine.start(model, model.getValidationGroups())
+
+    timer = QtCore.QElapsedTimer()
+    timer.start()
+    while engine.isRunning() and (timer.elapsed() < 5000):
+        app.processEvents()
+    assert not engine.isRunning()
+
+    # One message for each group.
+    assert (len(received) == 5)
+    assert (engine.getNumberValidated() == 5)
+
+    # The 561 movies are not valid.
+    assert (len(problems) == 1)
+    assert (problems[0].getDaveAction().getDescriptor() == "take movie 561_storm_0, 100 frames")
+    assert (len(list(filter(lambda x: not model.getItem(x).isValid(), range(250)))) == 50)
+
+    # Totals are calculated from the group estimates.
+    assert (model.getRunSize() == 50 * 10)
+    assert (model.getRemainingTime() == 50 * (1 + 5))
+
+    client.stopCommunication()
+    server.close()
+
+
+if (__name__ == "__main__"):
+    test_dave_validation_1()
+    test_dave_validation_2()
@@ -3,10 +3,23 @@
 Test Dave XML generators.
 """
 import os
+import sys
+from xml.etree import ElementTree
+from PyQt5 import QtWidgets
 
 import storm_control.test as test
 
+import storm_control.dave.sequenceViewer as sequenceViewer
 import storm_control.dave.xml_generators.v1Generator as v1Generator
+import storm_control.dave.xml_generators.v2Generator as v2Generator
+
+
+def getApp():
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    return app
+
 
 
 def test_v1_1():
@@ -21,3 +34,66 @@ def test_v1_1():
 
     v1Generator.generate(None, input_xml, input_positions, output_xml)
 
+
+def test_v2_1():
+    """
+    Test the v2 generator with nested loops, and that Dave only creates the
+    items of the branches that are used.
+    """
+    app = getApp()
+
+    # 3 rounds of fluidics, with a stage move and a movie at 20 positions.
+    recipe = ElementTree.Element("recipe")
+    valve_loop = ElementTree.SubElement(ElementTree.SubElement(recipe, "command_sequence"), "loop", name = "Valve Loop")
+    ElementTree.SubElement(valve_loop, "variable_entry", name = "Valve Loop")
+    position_loop = ElementTree.SubElement(valve_loop, "loop", name = "Position Loop", increment = "name")
+    movie = ElementTree.SubElement(position_loop, "movie")
+    ElementTree.SubElement(movie, "name", increment = "Yes").text = "storm"
+    ElementTree.SubElement(movie, "length").text = "100"
+    ElementTree.SubElement(movie, "variable_entry", name = "Position Loop")
+
+    values = ElementTree.SubElement(recipe, "loop_variable", name = "Valve Loop")
+    for i in range(3):
+        ElementTree.SubElement(ElementTree.SubElement(values, "value"), "valve_protocol").text = "Hybridize " + str(i)
+    values = ElementTree.SubElement(recipe, "loop_variable", name = "Position Loop")
+    for i in range(20):
+        value = ElementTree.SubElement(values, "value")
+        ElementTree.SubElement(value, "stage_x").text = str(i)
+        ElementTree.SubElement(value, "stage_y").text = "0.0"
+
+    input_xml = os.path.join(test.dataDirectory(), "v2_recipe.xml")
+    output_xml = os.path.join(test.dataDirectory(), "dave_sequence.xml")
+    ElementTree.ElementTree(recipe).write(input_xml)
+
+    parser = v2Generator.XMLRecipeParser(xml_filename = input_xml, output_filename = output_xml, verbose = False)
+    parser.parseXML()
+    assert (parser.writtenXMLPath() == output_xml)
+
+    sequence = ElementTree.parse(output_xml).getroot()
+    assert (len(sequence.findall(".//DAValveProtocol")) == 3)
+    assert (len(sequence.findall(".//DATakeMovie")) == 60)
+    assert (sequence.findall(".//DATakeMovie/name")[-1].text == "storm_2_19")
+
+    # Nothing below the top level branch is created when the sequence is loaded.
+    model = sequenceViewer.parseSequenceFile(output_xml)
+    assert (model.getNumberItems() == 123)
+    assert (model.rowCount() == 1)
+    assert (len(model.action_items) == 0)
+
+    # Getting an action creates its branch (and the branches above it).
+    item = model.getItem(122)
+    assert (item.getDaveAction().getDescriptor() == "take movie storm_2_19, 100 frames")
+    assert (item.getParentName() == "storm_2_19")
+    assert (len(model.action_items) == 5)
+
+    # Validation results are stored for actions that do not have an item.
+    model.setValid(1, False)
+    assert not model.isAllValid()
+    assert not model.getItem(1).isValid()
+    assert (len(model.getValidationGroups()) == 5)
+
+
+if (__name__ == "__main__"):
+    test_v1_1()
+    test_v2_1()
+
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Test the per-device hardware job executors.
+"""
+import threading
+import time
+from PyQt5 import QtCore
+
+import storm_control.sc_hardware.baseClasses.hardwareModule as hardwareModule
+
+
+def test_device_executor_1():
+    """
+    Test that must run jobs run in order and before waiting maybe run jobs.
+    """
+    executor = hardwareModule.DeviceExecutor(name = "test")
+    owner = object()
+    done = []
+    gate = threading.Event()
+
+    executor.submit(task = gate.wait, owner = owner)
+    executor.submit(task = done.append, args = ["maybe 1"], owner = owner, maybe = True)
+    for i in range(3):
+        executor.submit(task = done.append, args = ["must " + str(i)], owner = owner)
+    executor.submit(task = done.append, args = ["maybe 2"], owner = owner, maybe = True)
+    assert executor.isBusy(owner)
+
+    gate.set()
+    assert executor.waitFor(owner, timeout = 1.0)
+    assert not executor.isBusy(owner)
+
+    # The first maybe run job was superseded by the second.
+    assert (done == ["must 0", "must 1", "must 2", "maybe 2"])
+    stats = executor.getStatistics()
+    assert (stats["cancelled"] == 1)
+    assert (stats["jobs"] == 5)
+    assert (stats["max_run_time"] >= stats["mean_run_time"])
+
+
+def test_device_executor_2():
+    """
+    Test that maybe run jobs are only coalesced for the same owner.
+    """
+    executor = hardwareModule.DeviceExecutor(name = "test")
+    owners = [object(), object()]
+    done = []
+    gate = threading.Event()
+
+    executor.submit(task = gate.wait, owner = owners[0])
+    for i in range(5):
+        for j, owner in enumerate(owners):
+            executor.submit(task = done.append, args = [[j, i]], owner = owner, maybe = True)
+
+    gate.set()
+    assert executor.waitFor(owners[0], timeout = 1.0)
+    assert executor.waitFor(owners[1], timeout = 1.0)
+    assert (sorted(done) == [[0, 4], [1, 4]])
+    assert (executor.getStatistics()["cancelled"] == 8)
+
+
+def test_device_executor_3():
+    """
+    Test that a slow device does not hold up the other devices.
+    """
+    slow = hardwareModule.getDeviceExecutor(QtCore.QMutex(), name = "slow")
+    fast = hardwareModule.getDeviceExecutor(QtCore.QMutex(), name = "fast")
+    assert not (slow is fast)
+
+    slow.submit(task = time.sleep, args = [0.5], owner = "slow")
+    start_time = time.time()
+    fast.submit(task = time.sleep, args = [0.01], owner = "fast")
+    assert fast.waitFor("fast", timeout = 1.0)
+    assert ((time.time() - start_time) < 0.2)
+
+    assert not slow.waitFor("slow", timeout = 0.05)
+    assert slow.waitFor("slow", timeout = 1.0)
+
+    # Functionalities for the same device share an executor.
+    mutex = QtCore.QMutex()
+    assert (hardwareModule.getDeviceExecutor(mutex) is hardwareModule.getDeviceExecutor(mutex))
+
+
+def test_device_executor_4():
+    """
+    Test that a job that raises an exception does not stop the executor.
+    """
+    executor = hardwareModule.DeviceExecutor(name = "test")
+    done = []
+    executor.submit(task = lambda : 1/0, owner = "owner")
+    executor.submit(task = done.append, args = [True], owner = "owner")
+    assert executor.waitFor("owner", timeout = 1.0)
+    assert (done == [True])
+
+
+if (__name__ == "__main__"):
+    test_device_executor_1()
+    test_device_executor_2()
+    test_device_executor_3()
+    test_device_executor_4()
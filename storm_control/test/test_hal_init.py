@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Test parallel initialization of hardware modules.
+"""
+import threading
+import time
+
+import storm_control.hal4000.hal4000 as hal4000
+import storm_control.sc_library.halExceptions as halExceptions
+import storm_control.sc_library.parameters as params
+
+
+initialized = []
+lock = threading.Lock()
+
+class FakeModule(object):
+
+    @staticmethod
+    def initializeHardware(module_params):
+        time.sleep(0.2)
+        with lock:
+            initialized.append(module_params.get("name"))
+        return module_params.get("name")
+
+
+class FakeGUIModule(object):
+    pass
+
+
+def createModules(dependencies):
+    module_classes = {}
+    module_params = {}
+    for name in dependencies:
+        module_classes[name] = FakeModule
+        module_params[name] = params.StormXMLObject()
+        module_params[name].add(params.ParameterString(name = "name", value = name))
+        if dependencies[name] is not None:
+            module_params[name].add(params.ParameterString(name = "dependencies", value = dependencies[name]))
+    return [module_classes, module_params]
+
+
+def test_hal_init_1():
+    """
+    Test that hardware is initialized in parallel.
+    """
+    [module_classes, module_params] = createModules({"stage" : None,
+                                                     "valves" : None,
+                                                     "wheel" : None,
+                                                     "z_stage" : None})
+    module_classes["display"] = FakeGUIModule
+    module_params["display"] = params.StormXMLObject()
+
+    start_time = time.time()
+    hardware = hal4000.initializeHardware(module_classes, module_params)
+    assert ((time.time() - start_time) < 0.6)
+
+    assert (hardware["display"][0] is None)
+    for name in ["stage", "valves", "wheel", "z_stage"]:
+        assert (hardware[name][0] == name)
+        assert (hardware[name][1] > 0.1)
+
+
+def test_hal_init_2():
+    """
+    Test that dependencies are initialized first.
+    """
+    del initialized[:]
+    [module_classes, module_params] = createModules({"prior_stage" : "prior_wheel",
+                                                     "prior_wheel" : None,
+                                                     "z_stage" : "prior_stage, prior_wheel"})
+    hal4000.initializeHardware(module_classes, module_params)
+    assert (initialized == ["prior_wheel", "prior_stage", "z_stage"])
+
+
+def test_hal_init_3():
+    """
+    Test that circular or unknown dependencies are errors.
+    """
+    for dependencies in [{"a" : "b", "b" : "a"}, {"a" : "c"}]:
+        [module_classes, module_params] = createModules(dependencies)
+        try:
+            hal4000.initializeHardware(module_classes, module_params)
+        except halExceptions.HalException:
+            continue
+        assert False
+
+
+if (__name__ == "__main__"):
+    test_hal_init_1()
+    test_hal_init_2()
+    test_hal_init_3()
@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+"""
+Test move stage list.
+"""
+from storm_control.test.hal.standardHalTest import halTest
+
+
+def test_hal_msl_1():
+
+    halTest(config_xml = "none_tcp_config.xml",
+            class_name = "MoveStageList1",
+            test_module = "storm_control.test.hal.tcp_tests")
+
+    
+if (__name__ == "__main__"):
+    test_hal_msl_1()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Test lazy importing of modules.
+"""
+import subprocess
+import sys
+
+import storm_control.sc_library.lazyImport as lazyImport
+
+
+def test_lazy_import_1():
+    """
+    Test that the module is imported on first use.
+    """
+    sys.modules.pop("colorsys", None)
+    colorsys = lazyImport.lazyImport("colorsys")
+    assert not lazyImport.isImported(colorsys)
+    assert not ("colorsys" in sys.modules)
+
+    assert (colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0))
+    assert lazyImport.isImported(colorsys)
+    assert ("colorsys" in sys.modules)
+
+
+def test_lazy_import_2():
+    """
+    Test that 'a.b' works like 'import a.b'.
+    """
+    email = lazyImport.lazyImport("email.utils")
+    assert (email.utils.quote('"') == '\\"')
+
+
+def test_lazy_import_3():
+    """
+    Test that importing HAL's image writers does not import tifffile.
+    """
+    code = "import sys\n"
+    code += "import storm_control.hal4000.halLib.imagewriters\n"
+    code += "print('tifffile' in sys.modules)\n"
+    output = subprocess.check_output([sys.executable, "-c", code])
+    assert (output.decode().strip() == "False")
+
+
+if (__name__ == "__main__"):
+    test_lazy_import_1()
+    test_lazy_import_2()
+    test_lazy_import_3()
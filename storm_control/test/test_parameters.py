@@ -155,6 +155,58 @@ def test_parameters_8():
 
     assert(s1.getSortedAttrs() == ['dd', 'bb', 'aa', 'cc'])
 
+
+def test_parameters_9():
+
+    # Load parameters.
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    p1.add(params.ParameterCustom(name = "camera1.custom", value = [1, 2]))
+    p1.add(params.ParameterInt(name = "camera1.int", value = -1))
+
+    # Copies are independent, including values that are mutable objects.
+    p2 = p1.copy()
+    p2.get("camera1.custom").append(3)
+    assert (p1.get("camera1.custom") == [1, 2])
+    p2.getp("camera1.int").setv(-2)
+    assert (p1.get("camera1.int") == -1)
+    assert (params.difference(p1, p2) == ["camera1.custom", "camera1.int"])
+
+    # Sections shared within a tree are still shared in the copy.
+    p1.addSubSection("camera2", p1.get("camera1"), overwrite = True)
+    p2 = p1.copy()
+    assert (p2.get("camera1") is p2.get("camera2"))
+    assert not (p2.get("camera1") is p1.get("camera1"))
+
+
+def test_parameters_10():
+
+    # Load parameters.
+    p1 = params.parameters(test.xmlFilePathAndName("test_parameters.xml"), recurse = True)
+    p2 = p1.copy()
+    assert (p1.getSignature() is not None)
+    assert (len(params.difference(p1, p2)) == 0)
+
+    # Cached signatures are updated when values change.
+    p2.set("camera1.flip_horizontal", True)
+    assert (params.difference(p1, p2) == ["camera1.flip_horizontal"])
+    p2.set("camera1.flip_horizontal", False)
+    assert (len(params.difference(p1, p2)) == 0)
+
+    # And when the structure changes.
+    p2.delete("camera1.flip_horizontal")
+    assert (params.difference(p1, p2) == ["camera1.flip_horizontal"])
+    
+
+def test_parameters_11():
+    p1 = params.StormXMLObject()
+    p1.add("foo.bar", 1)
+
+    # Parameters don't have sub-properties.
+    assert p1.has("foo.bar")
+    assert not p1.has("foo.bar.baz")
+    assert not p1.has("foo.baz")
+    assert (p1.get("foo.bar.baz", 2) == 2)
+
         
 if (__name__ == "__main__"):
     test_parameters_1()
@@ -165,3 +217,6 @@ if (__name__ == "__main__"):
     test_parameters_6()
     test_parameters_7()
     test_parameters_8()
+    test_parameters_9()
+    test_parameters_10()
+    test_parameters_11()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Test recording and saving the illumination channel powers.
+"""
+import numpy
+import os
+
+import storm_control.test as test
+
+import storm_control.hal4000.illumination.powerLog as powerLog
+
+
+def test_power_log_1():
+    """
+    Test that the log grows as needed and is saved in the .power format.
+    """
+    filename = os.path.join(test.dataDirectory(), "power_log_test.power")
+
+    log = powerLog.PowerLog(filename = filename, names = ["750", "647"], frames = 10)
+    for i in range(250):
+        log.addFrame(i + 1, [0.1, 0.001 * i])
+    assert (log.getPowers().shape == (250, 2))
+    assert (log.getPowers().dtype == numpy.float32)
+
+    log.save()
+    log.wait()
+
+    with open(filename) as fp:
+        assert (fp.readline() == "frame 750 647\n")
+        assert (fp.readline() == "1 0.1000 0.0000\n")
+        assert (fp.readline() == "2 0.1000 0.0010\n")
+
+    [names, frames, powers] = powerLog.loadPowerFile(filename)
+    assert (names == ["750", "647"])
+    assert numpy.array_equal(frames, numpy.arange(1, 251))
+    assert numpy.allclose(powers[:,1], 0.001 * numpy.arange(250), atol = 1.0e-4)
+    os.remove(filename)
+
+
+def test_power_log_2():
+    """
+    Test an empty log.
+    """
+    filename = os.path.join(test.dataDirectory(), "power_log_test.power")
+
+    log = powerLog.PowerLog(filename = filename, names = ["750", "647"])
+    log.save(background = False)
+
+    [names, frames, powers] = powerLog.loadPowerFile(filename)
+    assert (names == ["750", "647"])
+    assert (frames.size == 0)
+    assert (powers.shape == (0, 2))
+    os.remove(filename)
+
+
+if (__name__ == "__main__"):
+    test_power_log_1()
+    test_power_log_2()
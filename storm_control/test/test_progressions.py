@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Test the precompiled power progressions.
+"""
+import numpy
+import os
+import sys
+from PyQt5 import QtWidgets
+
+import storm_control.test as test
+
+import storm_control.hal4000.progressions.progressions as progressions
+
+
+def getApp():
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    return app
+
+
+class Configuration(object):
+
+    def get(self, name):
+        return {"frames" : 100,
+                "increment" : 0.01,
+                "starting_value" : 0.1}[name]
+
+
+def makeParent():
+    parent = QtWidgets.QWidget()
+    parent.setLayout(QtWidgets.QGridLayout(parent))
+    return parent
+
+
+def runFrames(channels, frames):
+    """
+    Return the powers during each frame, the same as ProgressionsView does.
+    """
+    [active, powers] = channels.startFilm()
+    powers = numpy.array(powers, dtype = numpy.float64)
+    history = []
+    for frame_number in range(1, frames):
+        [active, increment] = channels.handleNewFrame(frame_number)
+        for i in numpy.flatnonzero(active):
+            powers[i] += increment[i]
+        history.append(powers.copy())
+    return numpy.array(history)
+
+
+def test_progressions_1():
+    """
+    Test linear and exponential progressions.
+    """
+    app = getApp()
+    parents = [makeParent(), makeParent()]
+
+    linear = progressions.LinearChannels(channels = ["750", "647"],
+                                         configuration = Configuration(),
+                                         parent = parents[0])
+    linear.remoteSetChannel(1, 0.1, 0.05, 200)
+    history = runFrames(linear, 1000)
+    assert numpy.allclose(history[:,0], 0.1)
+    assert numpy.allclose(history[198,1], 0.1)
+    assert numpy.allclose(history[199,1], 0.15)
+    assert numpy.allclose(history[998,1], 0.3)
+
+    # Changes to the GUI during the film have no effect.
+    linear.startFilm()
+    linear.channels[1][2].setValue(0.5)
+    [active, increment] = linear.handleNewFrame(200)
+    assert (list(active) == [False, True])
+    assert numpy.allclose(increment[1], 0.05)
+
+    exponential = progressions.ExponentialChannels(channels = ["750", "647"],
+                                                   configuration = Configuration(),
+                                                   parent = parents[1])
+    exponential.remoteSetChannel(0, 0.1, 2.0, 100)
+    history = runFrames(exponential, 301)
+    assert numpy.allclose(history[98,0], 0.1)
+    assert numpy.allclose(history[99,0], 0.2)
+    assert numpy.allclose(history[299,0], 0.8)
+    assert numpy.allclose(history[:,1], 0.1)
+
+    # Powers are reset at the end of the film.
+    [active, powers] = exponential.stopFilm()
+    assert (list(active) == [True, False])
+    assert numpy.allclose(powers, [0.1, 0.1])
+
+
+def test_progressions_2():
+    """
+    Test replaying a powers file.
+    """
+    filename = os.path.join(test.dataDirectory(), "progressions_test.power")
+    with open(filename, "w") as fp:
+        fp.write("frame 750 647\n")
+        for i in range(10):
+            fp.write(str(i + 1) + " 0.1 " + str(0.1 * (i//4)) + "\n")
+
+    channels = progressions.FileChannels()
+    channels.newFile(filename)
+    [active, powers] = channels.startFilm()
+    assert (list(active) == [True, True])
+    assert numpy.allclose(powers, [0.1, 0.0])
+
+    history = runFrames(channels, 15)
+    assert numpy.allclose(history[:,0], 0.1)
+    assert numpy.allclose(history[:10,1], [0.0, 0.0, 0.0, 0.0, 0.1, 0.1, 0.1, 0.1, 0.2, 0.2])
+    assert numpy.allclose(history[10:,1], 0.2)
+
+    # Replaying again starts from the beginning.
+    history = runFrames(channels, 6)
+    assert numpy.allclose(history[:,1], [0.0, 0.0, 0.0, 0.0, 0.1])
+
+    # Missing files are ignored.
+    channels.newFile(filename + ".missing")
+    assert (channels.startFilm() == [[], []])
+    os.remove(filename)
+
+
+if (__name__ == "__main__"):
+    test_progressions_1()
+    test_progressions_2()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Test RS232 communication using a pseudo-terminal device.
+"""
+import threading
+import time
+
+import storm_control.sc_hardware.serial.ptyDevice as ptyDevice
+import storm_control.sc_hardware.serial.RS232 as RS232
+
+
+def echo(command):
+    return command + "\r"
+
+
+def test_rs232_1():
+    """
+    Test that a response with an end_of_response does not have to wait.
+    """
+    device = ptyDevice.PtyDevice(responder = echo)
+    rs232 = RS232.RS232(port = device.getPort(), baudrate = 9600, wait_time = 0.05, end_of_response = "\r")
+    assert rs232.getStatus()
+
+    start_time = time.time()
+    for i in range(20):
+        assert (rs232.commWithResp("ping " + str(i)) == "ping " + str(i) + "\r")
+
+    # Without end_of_response each of these would take at least 10 * wait_time.
+    assert (((time.time() - start_time)/20) < 0.05)
+
+    rs232.shutDown()
+    device.close()
+
+
+def test_rs232_2():
+    """
+    Test that without an end_of_response the whole response is returned.
+    """
+    device = ptyDevice.PtyDevice(responder = lambda x: ["line 1\r", "line 2\r", "END\r"], delay = 0.01)
+    rs232 = RS232.RS232(port = device.getPort(), baudrate = 9600, wait_time = 0.05)
+
+    assert (rs232.commWithResp("?") == "line 1\rline 2\rEND\r")
+    assert (rs232.commWithResp("?", end_of_response = "END\r") == "line 1\rline 2\rEND\r")
+
+    # No response.
+    device.responder = None
+    assert (rs232.commWithResp("?") is None)
+
+    rs232.shutDown()
+    device.close()
+
+
+def test_rs232_3():
+    """
+    Test waitResponse(), getResponse() and readline().
+    """
+    device = ptyDevice.PtyDevice(responder = lambda x: "R\r" if x.startswith("G") else None, delay = 0.2)
+    rs232 = RS232.RS232(port = device.getPort(), baudrate = 9600, wait_time = 0.05)
+
+    # Old data is discarded when a command is sent.
+    device.send("old\r")
+    time.sleep(0.05)
+    start_time = time.time()
+    rs232.sendCommand("G 100,100")
+    assert (rs232.waitResponse() == "R\r")
+    elapsed = time.time() - start_time
+    assert (elapsed > 0.2) and (elapsed < 0.3)
+
+    assert (rs232.getResponse() is None)
+    device.send("x")
+    time.sleep(0.05)
+    assert (rs232.getResponse() == "x")
+
+    device.send("1 2\r\nabc")
+    assert (rs232.readline(timeout = 1.0) == "1 2")
+    assert (rs232.readline(timeout = 0.05) == "abc")
+    assert (device.getCommands() == ["G 100,100"])
+
+    rs232.shutDown()
+    device.close()
+
+
+def test_rs232_4():
+    """
+    Test that each thread gets the response to its own command.
+    """
+    device = ptyDevice.PtyDevice(responder = echo, delay = 0.002)
+    rs232 = RS232.RS232(port = device.getPort(), baudrate = 9600, wait_time = 0.05, end_of_response = "\r")
+
+    errors = []
+    def query(name):
+        for i in range(20):
+            command = name + " " + str(i)
+            if (rs232.commWithResp(command) != command + "\r"):
+                errors.append(command)
+
+    threads = list(map(lambda x: threading.Thread(target = query, args = ("thread" + str(x),)), range(4)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (len(errors) == 0)
+    assert (len(device.getCommands()) == 80)
+
+    rs232.shutDown()
+    device.close()
+
+
+if (__name__ == "__main__"):
+    test_rs232_1()
+    test_rs232_2()
+    test_rs232_3()
+    test_rs232_4()
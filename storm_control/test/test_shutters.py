@@ -3,6 +3,7 @@
 Test parsing of shutters files.
 """
 import numpy
+import os
 
 import storm_control.hal4000.illumination.xmlParser as xmlParser
 
@@ -115,7 +116,69 @@ def test_parser_7():
         return
     
     assert(False)
-    
+
+
+def test_parser_8():
+    """
+    Test overlapping events and rendering of the waveforms.
+    """
+    waveform = xmlParser.ShutterWaveform(length = 10)
+    waveform.addEvent(1, 6, 0.5)
+    waveform.addEvent(4, 8, 1.0)
+    waveform.addEvent(2, 3, 0.0)
+    assert(waveform.getRuns() == [[1, 2, 0.5], [3, 4, 0.5], [4, 8, 1.0]])
+    assert(waveform.isUsed())
+
+    expected = numpy.array([0, 0.5, 0, 0.5, 1, 1, 1, 1, 0, 0])
+    assert(numpy.allclose(expected, waveform))
+
+    analog = waveform.render(scale = 2.0, offset = 1.0)
+    assert(analog.dtype == numpy.float64)
+    assert(numpy.allclose(expected * 2.0 + 1.0, analog))
+
+    digital = waveform.render(dtype = numpy.uint8, digital = True)
+    assert(digital.dtype == numpy.uint8)
+    assert(numpy.array_equal(numpy.array([0, 0, 0, 0, 1, 1, 1, 1, 0, 0]), digital))
+
+    chunks = list(waveform.renderChunks(4))
+    assert(list(map(len, chunks)) == [4, 4, 2])
+    assert(numpy.allclose(expected, numpy.concatenate(chunks)))
+
+    waveform.addEvent(0, 10, 0.0)
+    assert(not waveform.isUsed())
+
+
+def test_parser_9():
+    """
+    Test that parsing the same file again uses the cache.
+    """
+    filename = data_dir + "shutters_test_cache.xml"
+    with open(data_dir + "shutters_test_1.xml") as fp:
+        contents = fp.read()
+    with open(filename, "w") as fp:
+        fp.write(contents)
+
+    xmlParser.clearShuttersCache()
+    [s_info_1, waveforms_1, oversampling] = xmlParser.parseShuttersXML(name_to_id, filename)
+    [s_info_2, waveforms_2, oversampling] = xmlParser.parseShuttersXML(name_to_id, filename)
+    assert(s_info_1 is s_info_2)
+    assert(waveforms_1[1] is waveforms_2[1])
+
+    # Different channels are parsed again.
+    [s_info_3, waveforms_3, oversampling] = xmlParser.parseShuttersXML({"750" : 0, "647" : 1}, filename)
+    assert(len(waveforms_3) == 2)
+
+    # So are files that changed.
+    with open(filename, "w") as fp:
+        fp.write(contents.replace("<power>1.0</power>", "<power>0.5</power>"))
+    stat = os.stat(filename)
+    os.utime(filename, ns = (stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    [s_info_4, waveforms_4, oversampling] = xmlParser.parseShuttersXML(name_to_id, filename)
+    assert(s_info_4 is not s_info_1)
+    assert(numpy.allclose(numpy.array([0.0, 0.0, 0.5, 0.5, 0.0, 0.0]), waveforms_4[1]))
+
+    os.remove(filename)
+
 
 if (__name__ == "__main__"):
     test_parser_1()
@@ -125,3 +188,5 @@ if (__name__ == "__main__"):
     test_parser_5()
     test_parser_6()
     test_parser_7()
+    test_parser_8()
+    test_parser_9()
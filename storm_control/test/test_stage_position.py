@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Test the cached stage position and the adaptive position polling.
+"""
+import sys
+import time
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.sc_hardware.none.noneStageModule as noneStageModule
+
+
+def getApp():
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication(sys.argv)
+    return app
+
+
+class SlowStage(noneStageModule.NoneStage):
+    """
+    A stage that counts position queries and takes some time to answer them.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.queries = 0
+
+    def position(self):
+        self.queries += 1
+        time.sleep(0.02)
+        return super().position()
+
+
+def processEvents(app, milliseconds):
+    timer = QtCore.QElapsedTimer()
+    timer.start()
+    while (timer.elapsed() < milliseconds):
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def test_stage_position_1():
+    """
+    Test that concurrent position requests are coalesced.
+    """
+    app = getApp()
+    stage = SlowStage()
+    stage_fn = noneStageModule.NoneStageFunctionality(device_mutex = QtCore.QMutex(),
+                                                      stage = stage,
+                                                      update_interval = 500)
+    processEvents(app, 100)
+    assert (stage_fn.getPositionAge() is not None)
+    queries = stage.queries
+
+    # Fresh enough, no queries.
+    for i in range(100):
+        stage_fn.getCurrentPosition(max_age = 10.0)
+    # Stale, but only one query.
+    for i in range(100):
+        stage_fn.getCurrentPosition(max_age = 0.0)
+    processEvents(app, 100)
+    assert (stage.queries == queries + 1)
+    assert (stage_fn.getPositionAge() < 0.1)
+
+    stage_fn.wait()
+
+
+def test_stage_position_2():
+    """
+    Test that polling is faster when the position changes.
+    """
+    app = getApp()
+    stage = SlowStage()
+    stage_fn = noneStageModule.NoneStageFunctionality(device_mutex = QtCore.QMutex(),
+                                                      stage = stage,
+                                                      update_interval = 500)
+
+    # Not moving, slow polling.
+    processEvents(app, 1100)
+    assert (stage_fn.update_interval == 500)
+    idle_queries = stage.queries
+
+    # Joystick like motion.
+    positions = []
+    stage_fn.stagePosition.connect(lambda x: positions.append(x))
+    for i in range(10):
+        stage.x += 1.0
+        processEvents(app, 100)
+    assert (stage.queries - idle_queries >= 5)
+    assert (positions[-1]["x"] >= 9.0)
+
+    # Moves are reported once they are done.
+    stage_fn.goAbsolute(100.0, 0.0)
+    processEvents(app, 400)
+    assert (stage_fn.getCurrentPosition()["x"] == 100.0)
+    assert (stage_fn.getPositionAge() < 0.2)
+
+    stage_fn.wait()
+
+
+if (__name__ == "__main__"):
+    test_stage_position_1()
+    test_stage_position_2()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Test planning the order of stage moves.
+"""
+import numpy
+
+import storm_control.sc_hardware.baseClasses.stageModule as stageModule
+
+
+def makeGrid(nx, ny, step = 100.0):
+    positions = []
+    for i in range(ny):
+        for j in range(nx):
+            positions.append([j * step, i * step])
+    return positions
+
+
+def test_stage_trajectory_1():
+    """
+    Test serpentine ordering of a shuffled grid.
+    """
+    grid = makeGrid(4, 3)
+    shuffle = numpy.random.RandomState(0).permutation(len(grid))
+    positions = list(map(lambda x: grid[x], shuffle))
+
+    order = stageModule.planTrajectory(positions, method = "serpentine")
+    path = list(map(lambda x: positions[x], order))
+    assert (path[:5] == [[0.0, 0.0], [100.0, 0.0], [200.0, 0.0], [300.0, 0.0], [300.0, 100.0]])
+    assert (stageModule.trajectoryLength(positions, order) == 1100.0)
+
+    # Original order.
+    assert (stageModule.planTrajectory(positions, method = "none") == list(range(len(positions))))
+
+
+def test_stage_trajectory_2():
+    """
+    Test that nearest neighbor and 2-opt reduce the travel.
+    """
+    positions = numpy.random.RandomState(1).uniform(0.0, 10000.0, (200, 2)).tolist()
+    lengths = []
+    for method in ["none", "nearest", "tsp"]:
+        order = stageModule.planTrajectory(positions, start = [0.0, 0.0], method = method)
+        assert (sorted(order) == list(range(len(positions))))
+        lengths.append(stageModule.trajectoryLength(positions, order, start = [0.0, 0.0]))
+    assert (lengths[1] < 0.2 * lengths[0])
+    assert (lengths[2] < lengths[1])
+
+    try:
+        stageModule.planTrajectory(positions, method = "foo")
+    except stageModule.StageException:
+        pass
+    else:
+        assert False
+
+
+def test_stage_trajectory_3():
+    """
+    Test backlash moves.
+    """
+    assert (stageModule.backlashMoves([0.0, 0.0], [10.0, 10.0], 5.0) == [[10.0, 10.0]])
+    assert (stageModule.backlashMoves([20.0, 0.0], [10.0, 10.0], 5.0) == [[5.0, 10.0], [10.0, 10.0]])
+    assert (stageModule.backlashMoves([20.0, 0.0], [10.0, 10.0], 0.0) == [[10.0, 10.0]])
+
+    # Going back along a row costs more than going forward.
+    positions = makeGrid(5, 2)
+    serpentine = stageModule.planTrajectory(positions, method = "serpentine")
+    order = stageModule.planTrajectory(positions, method = "tsp", backlash = 50.0)
+    assert (stageModule.trajectoryLength(positions, order, backlash = 50.0) <=
+            stageModule.trajectoryLength(positions, serpentine, backlash = 50.0))
+
+
+if (__name__ == "__main__"):
+    test_stage_trajectory_1()
+    test_stage_trajectory_2()
+    test_stage_trajectory_3()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+"""
+Tests of having several TCP messages in flight at the same time, of
+having several clients connected at the same time and of messages with
+binary data.
+"""
+import numpy
+import sys
+from PyQt5 import QtCore
+
+import storm_control.sc_library.parameters as params
+import storm_control.sc_library.tcpClient as tcpClient
+import storm_control.sc_library.tcpMessage as tcpMessage
+import storm_control.sc_library.tcpServer as tcpServer
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.tcpControl.tcpControl as tcpControl
+
+
+class FakeServer(QtCore.QObject):
+    comGotConnection = QtCore.pyqtSignal()
+    comLostConnection = QtCore.pyqtSignal()
+    messageReceived = QtCore.pyqtSignal(object)
+    queryReceived = QtCore.pyqtSignal(object)
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.sent = []
+
+    def getNumberOfClients(self):
+        return 1
+    
+    def sendMessage(self, message):
+        self.sent.append(message)
+
+
+def getApp():
+    app = QtCore.QCoreApplication.instance()
+    if app is None:
+        app = QtCore.QCoreApplication(sys.argv)
+    return app
+
+
+def waitFor(app, condition):
+    timer = QtCore.QElapsedTimer()
+    timer.start()
+    while not condition() and (timer.elapsed() < 5000):
+        app.processEvents()
+    
+
+def test_tcp_pipelined():
+    """
+    Send several messages without waiting for the responses, they
+    should all arrive and the responses should be matched by ID.
+    """
+    app = getApp()
+
+    server = tcpServer.TCPServer(port = 9501)
+    server.messageReceived.connect(lambda x: server.sendMessage(x))
+
+    client = tcpClient.TCPClient(port = 9501)
+    assert client.startCommunication()
+
+    messages = []
+    responses = {}
+    for i in range(5):
+        messages.append(tcpMessage.TCPMessage(message_type = "Test",
+                                              message_data = {"index" : i}))
+        client.sendMessage(messages[-1],
+                           response_fn = lambda x: responses.__setitem__(x.getID(), x))
+    assert (client.numberInFlight() == 5)
+
+    waitFor(app, lambda : (len(responses) == 5))
+    assert (client.numberInFlight() == 0)
+    for message in messages:
+        assert (responses[message.getID()].getData("index") == message.getData("index"))
+
+    client.stopCommunication()
+    server.close()
+
+
+def test_tcp_controller():
+    """
+    Test that exclusive messages are not handled at the same time as
+    any other message.
+    """
+    server = FakeServer()
+    control = tcpControl.Controller(server = server, verbose = False)
+
+    actions = []
+    control.controlAction.connect(lambda x: actions.append(x))
+
+    def tcpMsg(message_type, **kwds):
+        server.messageReceived.emit(tcpMessage.TCPMessage(message_type = message_type,
+                                                          message_data = kwds))
+
+    # These can happen at the same time.
+    tcpMsg("Move Stage", stage_x = 10.0, stage_y = 0.0)
+    tcpMsg("Get Stage Position")
+    assert (len(actions) == 2)
+
+    # These have to wait.
+    tcpMsg("Set Parameters", parameters = "foo")
+    tcpMsg("Move Stage", stage_x = 0.0, stage_y = 0.0)
+    assert (len(actions) == 2)
+
+    for action in actions[:2]:
+        action.was_handled = True
+        control.actionDone(action)
+    assert (len(actions) == 3)
+    assert actions[2].tcp_message.isType("Set Parameters")
+
+    actions[2].was_handled = True
+    control.actionDone(actions[2])
+    assert (len(actions) == 4)
+    assert (len(server.sent) == 3)
+
+
+def test_tcp_multi_client():
+    """
+    Test that the first client to send a control message gets control
+    and that other clients can only send queries.
+    """
+    app = getApp()
+
+    server = tcpServer.TCPServer(port = 9502, query_messages = ["Query"])
+    server.messageReceived.connect(lambda x: server.sendMessage(x))
+    server.queryReceived.connect(lambda x: server.sendMessage(x))
+
+    clients = []
+    for i in range(2):
+        clients.append(tcpClient.TCPClient(port = 9502))
+        assert clients[-1].startCommunication()
+    waitFor(app, lambda : (server.getNumberOfClients() == 2))
+
+    responses = {}
+    def sendMessage(client, message_type):
+        message = tcpMessage.TCPMessage(message_type = message_type)
+        client.sendMessage(message,
+                           response_fn = lambda x: responses.__setitem__(x.getID(), x))
+        waitFor(app, lambda : (message.getID() in responses))
+        return responses[message.getID()]
+
+    # Queries from either client work.
+    assert not sendMessage(clients[1], "Query").hasError()
+    assert not sendMessage(clients[0], "Query").hasError()
+
+    # The first client to send a control message is in control.
+    assert not sendMessage(clients[0], "Control").hasError()
+    assert sendMessage(clients[1], "Control").hasError()
+    assert not sendMessage(clients[1], "Query").hasError()
+
+    # Until it disconnects.
+    clients[0].stopCommunication()
+    waitFor(app, lambda : (server.getNumberOfClients() == 1))
+    assert not sendMessage(clients[1], "Control").hasError()
+
+    clients[1].stopCommunication()
+    server.close()
+
+
+def test_tcp_binary():
+    """
+    Test sending binary data, mixed with messages that don't have any.
+    """
+    app = getApp()
+
+    def addFrame(message):
+        if message.isType("Frame"):
+            message.addBinaryData("frame", numpy.arange(20000, dtype = numpy.uint16).reshape((100, 200)))
+        server.sendMessage(message)
+        
+    server = tcpServer.TCPServer(port = 9503)
+    server.messageReceived.connect(addFrame)
+
+    client = tcpClient.TCPClient(port = 9503)
+    assert client.startCommunication()
+
+    responses = {}
+    for message_type in ["Frame", "Test", "Frame"]:
+        client.sendMessage(tcpMessage.TCPMessage(message_type = message_type),
+                           response_fn = lambda x: responses.__setitem__(x.getID(), x))
+    waitFor(app, lambda : (len(responses) == 3))
+    assert (len(responses) == 3)
+
+    for response in responses.values():
+        if response.isType("Frame"):
+            data = response.getBinaryData("frame")
+            assert (data.dtype == numpy.uint16)
+            assert (data.shape == (100, 200))
+            assert (data[99,199] == 19999)
+        else:
+            assert (response.getBinaryData("frame") is None)
+
+    client.stopCommunication()
+    server.close()
+
+
+def test_tcp_get_frame():
+    """
+    Test that 'Get Frame' returns the first frame of the last film.
+    """
+    server = FakeServer()
+    control = tcpControl.Controller(server = server, verbose = False)
+
+    def getFrame():
+        tcp_message = tcpMessage.TCPMessage(message_type = "Get Frame")
+        server.queryReceived.emit(tcp_message)
+        return server.sent[-1]
+        
+    # No film yet.
+    assert getFrame().hasError()
+
+    control.setFilming(True)
+    for i in range(3):
+        np_data = numpy.full(12, i, dtype = numpy.uint16)
+        control.handleNewFrame(frame.Frame(np_data, i, 4, 3, "camera1"))
+    assert getFrame().hasError()
+
+    film_parameters = params.StormXMLObject()
+    film_parameters.add(params.ParameterString(name = "foo", value = "bar"))
+    control.setFilming(False)
+    control.setFilmParameters(film_parameters)
+
+    response = getFrame()
+    assert not response.hasError()
+    assert (response.getBinaryData("frame").shape == (3, 4))
+    assert (numpy.max(response.getBinaryData("frame")) == 0)
+    assert ("bar" in response.getResponse("parameters"))
+
+    
+if (__name__ == "__main__"):
+    test_tcp_pipelined()
+    test_tcp_controller()
+    test_tcp_multi_client()
+    test_tcp_binary()
+    test_tcp_get_frame()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Test creation and caching of hardware timed z scan waveforms.
+"""
+import numpy
+
+import storm_control.sc_hardware.baseClasses.daqModule as daqModule
+import storm_control.sc_hardware.baseClasses.lockModule as lockModule
+import storm_control.sc_hardware.baseClasses.voltageZModule as voltageZModule
+import storm_control.sc_library.parameters as params
+
+
+def createZStage(microns_to_volts = 0.1):
+    parameters = params.StormXMLObject()
+    parameters.add(params.ParameterFloat(name = "center", value = 50.0))
+    parameters.add(params.ParameterFloat(name = "maximum", value = 100.0))
+    parameters.add(params.ParameterFloat(name = "minimum", value = 0.0))
+    return voltageZModule.VoltageZFunctionality(ao_fn = daqModule.DaqFunctionality(source = "ao0"),
+                                                microns_to_volts = microns_to_volts,
+                                                parameters = parameters)
+
+
+def test_z_scan_waveform_1():
+    """
+    Test that the waveform has the right values.
+    """
+    daqModule.getWaveformCache().clear()
+    z_stage = createZStage()
+
+    daq_waveform = z_stage.getZScanWaveform([-1.0, 0.0, 1.0], frames_per_step = 2)
+    assert(daq_waveform.getSource() == "ao0")
+    assert(numpy.allclose(daq_waveform.getWaveform(),
+                          numpy.array([4.9, 4.9, 5.0, 5.0, 5.1, 5.1])))
+
+
+def test_z_scan_waveform_2():
+    """
+    Test that the waveform is re-used.
+    """
+    cache = daqModule.getWaveformCache()
+    cache.clear()
+    z_stage = createZStage()
+
+    w1 = z_stage.getZScanWaveform([-1.0, 0.0, 1.0])
+    w2 = z_stage.getZScanWaveform([-1.0, 0.0, 1.0])
+    assert(w1 is w2)
+
+    # Different position, same scan profile.
+    z_stage.goAbsolute(40.0)
+    w3 = z_stage.getZScanWaveform([-1.0, 0.0, 1.0])
+    assert(w3 is not w1)
+    assert(w3.getKey() != w1.getKey())
+    assert(numpy.allclose(w3.getWaveform(), numpy.array([3.9, 4.0, 4.1])))
+
+    # Different calibration.
+    z_stage = createZStage(microns_to_volts = 0.2)
+    w4 = z_stage.getZScanWaveform([-1.0, 0.0, 1.0])
+    assert(numpy.allclose(w4.getWaveform(), numpy.array([9.8, 10.0, 10.2])))
+
+
+def test_z_scan_waveform_3():
+    """
+    Test that scans that don't fit in the stage range are rejected.
+    """
+    z_stage = createZStage()
+    try:
+        z_stage.getZScanWaveform([-60.0, 60.0])
+    except lockModule.ZStageException:
+        return
+    assert False
+
+
+def test_daq_waveform_cache():
+    """
+    Test least recently used cache behavior.
+    """
+    cache = daqModule.DaqWaveformCache(max_size = 2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert(cache.get("a") == 1)
+    cache.put("c", 3)
+    assert(cache.get("b") is None)
+    assert(cache.get("a") == 1)
+    assert(cache.get("c") == 3)
+
+
+if (__name__ == "__main__"):
+    test_z_scan_waveform_1()
+    test_z_scan_waveform_2()
+    test_z_scan_waveform_3()
+    test_daq_waveform_cache()